@@ -0,0 +1,140 @@
+"""
+benchmarks/eventsub_intake.py
+────────────────────────────────────────────────────────────────
+Micro-benchmark for the EventSub webhook intake path.
+
+Drives the aiohttp app built by services.eventsub_server.create_app
+through a real local socket and reports requests/sec for three kinds
+of payload:
+
+  valid   — correctly signed, fresh, unique message ids (full path:
+            HMAC, dedup claim, orjson parse, dispatcher submit)
+  stale   — correctly signed but 15 minutes old (rejected at step 2)
+  forged  — fresh timestamp, wrong signature (rejected at step 4)
+
+The dispatcher runs with a no-op handler, so only intake cost is
+measured — not Twitch/Discord work. With --journal, valid payloads are
+also appended (group-committed) to an EventSubJournal in a temp dir.
+
+Usage:
+    python -m benchmarks.eventsub_intake [--requests 5000] [--concurrency 64] [--journal]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import orjson
+from aiohttp import ClientSession, TCPConnector, web
+
+from services import eventsub_server
+from services.eventsub_dedup import MessageDeduplicator
+from services.eventsub_dispatcher import EventSubDispatcher
+from services.eventsub_journal import EventSubJournal
+from services.state import AppState
+
+SECRET = eventsub_server.SECRET.encode()
+
+BODY = orjson.dumps({
+    "subscription": {"type": "stream.online", "version": "1"},
+    "event": {
+        "id":                     "9001",
+        "broadcaster_user_id":    "1337",
+        "broadcaster_user_login": "benchmark",
+        "broadcaster_user_name":  "Benchmark",
+        "type":                   "live",
+        "started_at":             "2020-10-11T10:11:12.123Z",
+    },
+})
+
+
+def _ts(offset: timedelta = timedelta()) -> str:
+    return (datetime.now(timezone.utc) + offset).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _headers(kind: str) -> dict:
+    msg_id = str(uuid.uuid4())
+    ts     = _ts(timedelta(minutes=-15) if kind == "stale" else timedelta())
+    sig    = hmac.new(SECRET, msg_id.encode() + ts.encode() + BODY, hashlib.sha256).hexdigest()
+    if kind == "forged":
+        sig = "0" * 64
+    return {
+        "Twitch-Eventsub-Message-Id":        msg_id,
+        "Twitch-Eventsub-Message-Timestamp": ts,
+        "Twitch-Eventsub-Message-Type":      "notification",
+        "Twitch-Eventsub-Message-Signature": f"sha256={sig}",
+        "Content-Type":                      "application/json",
+    }
+
+
+async def _noop(bot, event: dict) -> None:
+    return None
+
+
+async def _run_kind(session: ClientSession, url: str, kind: str, total: int, concurrency: int) -> tuple[float, dict]:
+    # Headers are signed up front so the client side doesn't skew the numbers
+    prepared = [_headers(kind) for _ in range(total)]
+    statuses: dict[int, int] = {}
+    it = iter(prepared)
+
+    async def _client():
+        for headers in it:
+            async with session.post(url, data=BODY, headers=headers) as resp:
+                await resp.read()
+                statuses[resp.status] = statuses.get(resp.status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return total / elapsed, statuses
+
+
+async def main(total: int, concurrency: int, journal: bool) -> None:
+    app_state = AppState()
+    app_state.eventsub_dedup = MessageDeduplicator(redis=None)
+    if journal:
+        app_state.eventsub_journal = EventSubJournal(tempfile.mkdtemp(prefix="eventsub-journal-"))
+        await app_state.eventsub_journal.open()
+    app_state.eventsub_dispatcher = EventSubDispatcher(
+        None,
+        {sub_type: _noop for sub_type in eventsub_server.NOTIFICATION_HANDLERS},
+        max_queue=total * 2,
+        journal=app_state.eventsub_journal,
+    )
+    app_state.eventsub_dispatcher.start()
+
+    app    = await eventsub_server.create_app(None, app_state)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    port = int(os.getenv("BENCH_PORT", "18080"))
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+    url = f"http://127.0.0.1:{port}/twitch/eventsub"
+
+    try:
+        async with ClientSession(connector=TCPConnector(limit=concurrency)) as session:
+            await _run_kind(session, url, "valid", min(total, 200), concurrency)   # warm-up
+            print(f"{'payload':<8} {'req/s':>10}   statuses")
+            for kind in ("valid", "stale", "forged"):
+                rps, statuses = await _run_kind(session, url, kind, total, concurrency)
+                print(f"{kind:<8} {rps:>10.0f}   {statuses}")
+    finally:
+        await app_state.eventsub_dispatcher.drain(timeout=5)
+        if app_state.eventsub_journal:
+            await app_state.eventsub_journal.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests",    type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--journal",     action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.journal))
@@ -0,0 +1,112 @@
+"""
+benchmarks/leader_failover.py
+────────────────────────────────────────────────────────────────
+Failover timing for services.leader_election.LeaderElector.
+
+Runs two electors ("a" and "b") in one process against a real Redis
+(a local redis-server is enough) and measures how long the cluster is
+without a leader when the leader:
+
+  graceful  — stops cleanly (lease released by compare-and-delete)
+  crash     — vanishes without releasing (lease has to expire)
+
+and checks that exactly one elector leads at any time and that every
+new leader's fencing token is larger than the last one.
+
+Usage:
+    python -m benchmarks.leader_failover [--redis-url redis://localhost:6379/15] [--ttl 3] [--rounds 3]
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+import redis.asyncio as aioredis
+
+from services.leader_election import LeaderElector
+
+
+class _Node:
+    def __init__(self, name: str, redis, key: str, ttl: float, events: list):
+        self.name   = name
+        self.events = events
+        self.elector = LeaderElector(
+            redis, key, ttl,
+            on_elected=self._elected, on_demoted=self._demoted,
+            instance_id=name, retry_interval=0.1,
+        )
+
+    async def _elected(self) -> None:
+        self.events.append(("elected", self.name, time.monotonic(), self.elector.token))
+
+    async def _demoted(self) -> None:
+        self.events.append(("demoted", self.name, time.monotonic(), None))
+
+    def crash(self) -> None:
+        # No demotion, no release — the process just went away
+        self.elector._task.cancel()
+        self.elector._task = None
+
+
+async def _wait_for_leader(nodes: list, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        leaders = [n for n in nodes if n.elector.is_leader]
+        assert len(leaders) <= 1, f"split brain: {[n.name for n in leaders]}"
+        if leaders:
+            return leaders[0]
+        await asyncio.sleep(0.01)
+    raise TimeoutError("no leader elected")
+
+
+async def _round(redis, kind: str, ttl: float) -> tuple[float, int, int]:
+    key    = f"bench:leader:{uuid.uuid4().hex[:8]}"
+    events: list = []
+    nodes  = [_Node(name, redis, key, ttl, events) for name in ("a", "b")]
+    for node in nodes:
+        node.elector.start()
+
+    try:
+        first = await _wait_for_leader(nodes, ttl * 2)
+        old_token = first.elector.token
+        await asyncio.sleep(ttl / 2)
+
+        stopped_at = time.monotonic()
+        if kind == "graceful":
+            await first.elector.stop()
+        else:
+            first.crash()
+        rest = [n for n in nodes if n is not first]
+        second = await _wait_for_leader(rest, ttl * 3)
+        gap = time.monotonic() - stopped_at
+        new_token = second.elector.token
+        assert new_token > old_token, f"fencing token went {old_token} → {new_token}"
+        assert not await first.elector.fence_ok(), "deposed leader still passes the fence"
+        return gap, old_token, new_token
+    finally:
+        for node in nodes:
+            await node.elector.stop()
+        await redis.delete(key, f"{key}:fence")
+
+
+async def main(redis_url: str, ttl: float, rounds: int) -> None:
+    redis = aioredis.from_url(redis_url)
+    try:
+        await redis.ping()
+        print(f"{'mode':<9} {'round':>5} {'gap ms':>9}   tokens")
+        for kind in ("graceful", "crash"):
+            for i in range(rounds):
+                gap, old, new = await _round(redis, kind, ttl)
+                print(f"{kind:<9} {i + 1:>5} {gap * 1000:>9.0f}   {old} → {new}")
+    finally:
+        await redis.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--ttl",       type=float, default=3.0)
+    parser.add_argument("--rounds",    type=int,   default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.redis_url, args.ttl, args.rounds))
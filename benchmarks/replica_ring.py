@@ -0,0 +1,65 @@
+"""
+benchmarks/replica_ring.py
+────────────────────────────────────────────────────────────────
+Shard balance and key movement for services.replica_ring.
+
+For ring sizes 1..N reports, over a set of synthetic broadcaster ids:
+
+  max/min   largest and smallest shard relative to an even split
+  moved     fraction of ids that change owner when one replica joins
+            (ideal: 1 / new size) and when one leaves (ideal: 1 / old size)
+  owner/s   rendezvous lookups per second at that size
+
+No Redis needed — the assignment is a pure function of the membership.
+
+Usage:
+    python -m benchmarks.replica_ring [--keys 20000] [--replicas 8]
+"""
+
+import argparse
+import time
+from collections import Counter
+
+from services.replica_ring import owner
+
+
+def _assign(keys: list[str], members: list[str]) -> dict[str, str]:
+    return {k: owner(k, members) for k in keys}
+
+
+def main(total: int, replicas: int) -> None:
+    keys    = [str(10_000_000 + i) for i in range(total)]
+    members = [f"replica-{i}" for i in range(replicas + 1)]
+
+    print(f"{'size':>4} {'max':>6} {'min':>6} {'join moved':>11} {'ideal':>6} "
+          f"{'leave moved':>12} {'ideal':>6} {'owner/s':>10}")
+    for size in range(1, replicas + 1):
+        current = members[:size]
+        started = time.perf_counter()
+        before  = _assign(keys, current)
+        rate    = total / (time.perf_counter() - started)
+
+        shards = Counter(before.values())
+        even   = total / size
+        joined = _assign(keys, members[:size + 1])
+        moved_join = sum(before[k] != joined[k] for k in keys) / total
+
+        if size > 1:
+            left = _assign(keys, current[1:])
+            moved_leave = sum(before[k] != left[k] for k in keys) / total
+            leave = f"{moved_leave:>12.3f} {1 / size:>6.3f}"
+        else:
+            leave = f"{'—':>12} {'—':>6}"
+
+        print(
+            f"{size:>4} {max(shards.values()) / even:>6.2f} {min(shards.values()) / even:>6.2f} "
+            f"{moved_join:>11.3f} {1 / (size + 1):>6.3f} {leave} {rate:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys",     type=int, default=20000)
+    parser.add_argument("--replicas", type=int, default=8)
+    args = parser.parse_args()
+    main(args.keys, args.replicas)
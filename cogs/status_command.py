@@ -4,7 +4,8 @@ cogs/status_command.py
 /status <streamer>
 
 Shows whether a Twitch streamer is currently live.
-Checks Redis flag first, falls back to Twitch API directly.
+Tracked streamers are answered from the shared live snapshot
+(services/live_snapshot); anyone else is looked up on Twitch directly.
 Response is ephemeral — only the requesting user sees it.
 """
 
@@ -15,15 +16,23 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 
-# services.event_router yerine, Redis'e doğrudan bağlanıp durumu çekiyoruz
-from services.redis_client import redis_client
+logger = logging.getLogger("status_command")
 
-async def get_stream_status(login: str) -> str:
-    # Redis'teki "stream:status:{login}" key'ini kontrol et
-    status = await redis_client.get(f"stream:status:{login.lower()}")
-    return "live" if status == "live" else "offline"
+SNAPSHOT_MAX_AGE = 90   # seconds
 
-logger = logging.getLogger("status_command")
+
+async def get_stream_status(app_state, login: str) -> dict | None:
+    """The Helix stream object if `login` is live, else None."""
+    live_snapshot = getattr(app_state, "live_snapshot", None)
+    if live_snapshot is not None:
+        snap   = await live_snapshot.get(max_age=SNAPSHOT_MAX_AGE)
+        stream = snap.get(login)
+        if stream is not None:
+            return stream
+        user = await app_state.twitch_api.get_user_by_login(login)
+        if user and user["id"] in snap.tracked:
+            return None   # tracked and not in the snapshot — offline
+    return await app_state.twitch_api.get_stream_metadata(login)
 
 
 class StatusCommand(commands.Cog):
@@ -49,7 +58,7 @@ class StatusCommand(commands.Cog):
             return
 
         try:
-            stream = await get_stream_status(user_login)
+            stream = await get_stream_status(self.bot.app_state, user_login)
         except Exception as e:
             logger.error(f"/status error for {user_login}: {e}")
             await interaction.followup.send(
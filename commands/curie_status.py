@@ -48,9 +48,15 @@ async def register(bot, app_state, session):
         db_status     = "🟢 Connected"   if db_ok    else "🔴 Offline"
         redis_status  = "🟢 Active"      if redis_ok  else "🟡 In-Memory"
         twitch_status = "🟢 Ready"       if twitch_ok else "🔴 Error"
+        if twitch_ok and hasattr(app_state.twitch_api, "stats"):
+            h = app_state.twitch_api.stats()
+            twitch_status += f"\n{h['sent']} sent · {h['coalesced']} coalesced"
+            if h["remaining"] is not None:
+                twitch_status += f"\n{h['remaining']}/{h['limit']} points left"
 
         eventsub_status = (
-            "🟢 Active"    if eventsub and eventsub.callback_url else
+            f"🟢 Active ({eventsub.transport})" if eventsub and eventsub.can_subscribe else
+            "🟡 No WebSocket session" if eventsub and eventsub.transport == "websocket" else
             "🟡 No callback URL" if eventsub else
             "🔴 Not configured"
         )
@@ -70,12 +76,29 @@ async def register(bot, app_state, session):
         except Exception:
             pass
 
-        if monitor and hasattr(monitor, "_state"):
-            live_count = sum(1 for st in monitor._state.values() if st.get("live"))
+        live_snapshot = getattr(app_state, "live_snapshot", None)
+        if live_snapshot and live_snapshot.snapshot:
+            live_count = len(live_snapshot.snapshot.streams)
 
         # ── EventSub callback URL ──────────────────────────────────────────
         callback_url = getattr(eventsub, "callback_url", None) or "—"
 
+        # ── EventSub intake queue ──────────────────────────────────────────
+        dispatcher = getattr(app_state, "eventsub_dispatcher", None)
+        if dispatcher:
+            q = dispatcher.stats()
+            intake_str = (
+                f"{q['depth']}/{q['max_queue']} queued · {q['workers']} workers\n"
+                f"wait avg {q['wait_avg_s'] * 1000:.0f}ms · max {q['wait_max_s'] * 1000:.0f}ms\n"
+                f"{q['processed']} done · {q['failed']} failed · {q['rejected']} rejected"
+            )
+            dedup = getattr(app_state, "eventsub_dedup", None)
+            if dedup:
+                d = dedup.stats()
+                intake_str += f"\n{d['hits']} retries deduped · {d['misses']} new"
+        else:
+            intake_str = "—"
+
         # ── Build embed ────────────────────────────────────────────────────
         all_ok = db_ok and redis_ok and twitch_ok and bool(eventsub)
         embed = discord.Embed(
@@ -108,6 +131,7 @@ async def register(bot, app_state, session):
             value=f"{streamer_count} total · {live_count} live now",
             inline=True,
         )
+        embed.add_field(name="📥 EventSub intake", value=intake_str, inline=True)
         embed.add_field(
             name="🔗 EventSub callback",
             value=f"`{callback_url}`" if callback_url != "—" else "—",
@@ -8,6 +8,9 @@ import os
 import aiohttp
 from datetime import datetime, timezone
 
+from services import discord_outbox, message_handles
+from services.live_snapshot import note_stream_event
+
 # Migration to 'google-genai'
 try:
     from google import genai
@@ -45,6 +48,29 @@ KNOWN_STREAMERS: dict[str, str] = {
 }
 
 
+# How stale the shared live snapshot (services/live_snapshot) may be
+LIST_SNAPSHOT_MAX_AGE  = 90   # /live list — display only
+STATS_SNAPSHOT_MAX_AGE = 0    # /live stats — "scan right now": always re-polls
+
+
+async def _live_streams_for(app_state, user_ids: list[str], max_age: float) -> list[dict]:
+    """
+    Live streams among `user_ids`, read from the shared live snapshot.
+    Ids it doesn't cover yet (added since the last poll) are fetched
+    directly; without a snapshot service everything is.
+    """
+    live_snapshot = getattr(app_state, "live_snapshot", None)
+    if live_snapshot is None:
+        return await app_state.twitch_api.get_streams_by_ids(user_ids)
+
+    snap    = await live_snapshot.get(max_age=max_age)
+    streams = [snap.by_id[uid] for uid in user_ids if uid in snap.by_id]
+    missing = [uid for uid in user_ids if uid not in snap.tracked]
+    if missing:
+        streams += await app_state.twitch_api.get_streams_by_ids(missing)
+    return streams
+
+
 async def seed_known_streamers(db_pool) -> None:
     """
     Ensures every entry in KNOWN_STREAMERS exists in the DB.
@@ -331,11 +357,6 @@ class LiveCommandsCog(commands.Cog):
                 return
             guild_id = row["guild_id"]
 
-            msg_key = f"stream:msg:{login}:{guild_id}"
-            msg_id = await self.bot.app_state.redis.get(msg_key)
-            if not msg_id:
-                return
-
             from db.guild_settings import get_guild_config
             try:
                 cfg = await get_guild_config(guild_id)
@@ -343,20 +364,29 @@ class LiveCommandsCog(commands.Cog):
             except Exception:
                 announce_channel_id = ANNOUNCE_CHANNEL_ID
 
-            channel = self.bot.get_channel(announce_channel_id)
-            if not channel:
+            handles = self.bot.app_state.message_handles
+            msg_key = message_handles.live_key(login, guild_id)
+            handle  = await handles.get(msg_key, channel_id=announce_channel_id)
+            if not handle:
                 return
 
-            try:
-                message = await channel.fetch_message(int(msg_id))
-            except (discord.NotFound, discord.HTTPException):
-                return
-
-            if not message.embeds:
-                return
-            embed = message.embeds[0]
+            # The stored payload is what the announcement shows — no fetch
+            embed = handle.embed_object()
+            if embed is None:
+                # Handle written by an older build: no payload, read it once
+                channel = self.bot.get_channel(handle.channel_id)
+                if not channel:
+                    return
+                try:
+                    message = await channel.get_partial_message(handle.message_id).fetch()
+                except (discord.NotFound, discord.HTTPException):
+                    return
+                if not message.embeds:
+                    return
+                embed = message.embeds[0]
             embed.add_field(name="First follower this stream", value=follower_name, inline=False)
-            await message.edit(embed=embed)
+            if not await handles.edit(msg_key, discord_outbox.REFRESH, embed=embed):
+                return
 
             await self.bot.app_state.redis.set(guard_key, "1", ttl=21600)
             logger.info(f"record_first_follower: shoutout added for {login} -> {follower_name}")
@@ -366,14 +396,22 @@ class LiveCommandsCog(commands.Cog):
     async def _title_change_loop(self):
         """Periodically checks currently-live streamers for title/game changes and edits their embed."""
         await self.bot.wait_until_ready()
+        version = 0
         while True:
+            live_snapshot = self.bot.app_state.live_snapshot
             try:
+                if live_snapshot is not None:
+                    # Runs once per shared snapshot — no Twitch calls of its own
+                    snap = await live_snapshot.wait_for_update(version)
+                    version = snap.version
+                    await self._check_title_changes(snap)
+                    continue
                 await self._check_title_changes()
             except Exception as e:
                 logger.error(f"_title_change_loop: cycle failed: {e}", exc_info=True)
             await asyncio.sleep(120)  # every 2 minutes
 
-    async def _check_title_changes(self):
+    async def _check_title_changes(self, snapshot=None):
         pool = self.bot.app_state.db.pool
         async with pool.acquire() as conn:
             rows = await conn.fetch(
@@ -387,12 +425,15 @@ class LiveCommandsCog(commands.Cog):
         if not user_ids:
             return
 
-        try:
-            live_streams = await twitch_api.get_streams_by_ids(user_ids)
-        except Exception as e:
-            logger.error(f"_check_title_changes: get_streams_by_ids failed: {e}")
-            return
-        live_map = {s["user_login"].lower(): s for s in live_streams}
+        if snapshot is not None:
+            live_map = snapshot.streams
+        else:
+            try:
+                live_streams = await twitch_api.get_streams_by_ids(user_ids)
+            except Exception as e:
+                logger.error(f"_check_title_changes: get_streams_by_ids failed: {e}")
+                return
+            live_map = {s["user_login"].lower(): s for s in live_streams}
 
         for row in rows:
             login = row["twitch_login"]
@@ -409,11 +450,6 @@ class LiveCommandsCog(commands.Cog):
                 continue  # nothing changed
 
             guild_id = row["guild_id"]
-            msg_key = f"stream:msg:{login}:{guild_id}"
-            msg_id = await self.bot.app_state.redis.get(msg_key)
-            if not msg_id:
-                continue  # no tracked message to edit
-
             try:
                 from db.guild_settings import get_guild_config
                 cfg = await get_guild_config(guild_id)
@@ -421,14 +457,10 @@ class LiveCommandsCog(commands.Cog):
             except Exception:
                 announce_channel_id = ANNOUNCE_CHANNEL_ID
 
-            channel = self.bot.get_channel(announce_channel_id)
-            if not channel:
-                continue
-
-            try:
-                message = await channel.fetch_message(int(msg_id))
-            except (discord.NotFound, discord.HTTPException):
-                continue
+            handles = self.bot.app_state.message_handles
+            msg_key = message_handles.live_key(login, guild_id)
+            if not await handles.get(msg_key, channel_id=announce_channel_id):
+                continue  # no tracked message to edit
 
             user_data = {}
             try:
@@ -442,7 +474,8 @@ class LiveCommandsCog(commands.Cog):
 
             updated_embed = build_live_embed(stream, user_data)
             try:
-                await message.edit(embed=updated_embed)
+                # Deleted announcement while still live: post it again
+                await handles.edit(msg_key, discord_outbox.REFRESH, resend=True, embed=updated_embed)
                 logger.info(f"_check_title_changes: updated embed for {login} (title/game changed)")
             except Exception as e:
                 logger.warning(f"_check_title_changes: failed to edit message for {login}: {e}")
@@ -537,14 +570,15 @@ class LiveCommandsCog(commands.Cog):
                 logger.warning(f"on_stream_online: announce channel {announce_channel_id} not found for {login}")
                 return
 
-            sent_msg = await channel.send(embed=embed)
-
-            # ── Update Redis: message id + live status ───────────────
-            msg_key    = f"stream:msg:{login}:{guild_id}"
+            # ── Post, and keep a handle for later edits + live status ─
+            msg_key    = message_handles.live_key(login, guild_id)
+            await self.bot.app_state.message_handles.send(
+                msg_key, channel, discord_outbox.GO_LIVE, embed=embed,
+            )
             status_key = f"stream:status:{login}"
             stream_id  = stream_data.get("id", "live")
-            await self.bot.app_state.redis.set(msg_key, str(sent_msg.id))
             await self.bot.app_state.redis.set(status_key, stream_id, ttl=21600)
+            await note_stream_event(self.bot.app_state, user_id, live=True)
 
             # ── Update DB: mark streamer as live ──────────────────────
             try:
@@ -596,14 +630,14 @@ class LiveCommandsCog(commands.Cog):
             # re-edits the message a handful of times over ~6 minutes to
             # give it several chances to catch a properly-rendered image.
             asyncio.create_task(
-                self._refresh_live_embed_loop(sent_msg, user_id, login)
+                self._refresh_live_embed_loop(msg_key, user_id, login)
             )
 
         except Exception as e:
             logger.error(f"on_stream_online failed for {login}: {e}", exc_info=True)
 
     async def _refresh_live_embed_loop(
-        self, message: discord.Message, user_id: str, login: str,
+        self, msg_key: str, user_id: str, login: str,
         attempts: int = 6, interval: int = 90,
     ):
         """
@@ -641,11 +675,13 @@ class LiveCommandsCog(commands.Cog):
                     user_data = users.get(login)
 
                 refreshed_embed = build_live_embed(stream_data, user_data or {})
-                await message.edit(embed=refreshed_embed)
+                edited = await self.bot.app_state.message_handles.edit(
+                    msg_key, discord_outbox.REFRESH, embed=refreshed_embed,
+                )
+                if not edited:
+                    return  # message deleted, or the stream ended and dropped the handle
                 logger.info(f"on_stream_online: thumbnail confirmed and updated for {login} (check {attempt + 1}/{attempts})")
                 return  # got a real thumbnail — stop retrying
-            except discord.NotFound:
-                return  # message was deleted — stop retrying
             except Exception as e:
                 logger.warning(
                     f"on_stream_online: thumbnail refresh check {attempt + 1} failed for {login}: {e}"
@@ -653,9 +689,20 @@ class LiveCommandsCog(commands.Cog):
 
     @commands.Cog.listener()
     async def on_stream_offline(self, user_id: str, login: str, display_name: str, duration_mins: int, guild_id: int):
-        """Handles the stream offline event, fetches VOD, and clears cache."""
-        await asyncio.sleep(15) 
-        
+        """
+        Handles the stream offline event, fetches VOD, and clears cache.
+
+        No fixed delay up front. The watchdog's missed-offline recovery
+        (monitor.TwitchMonitor._recover_offline) runs this through the
+        broadcaster's lane in services/eventsub_dispatcher.py, in arrival
+        order with that streamer's stream.online / channel.raid
+        notifications on this replica — so a raid recorded just before is
+        already in Redis here, and a concurrent go-live can't interleave.
+        Only the bot.dispatch("stream_offline") fallback (no dispatcher
+        in the process) is unordered. A VOD that isn't published yet is
+        picked up by _refresh_vod_later.
+        """
+        await note_stream_event(self.bot.app_state, user_id, live=False)
         vod_url = await self._fetch_vod_url(user_id, login)
 
         # ── Fetch the last-known stream title before it's cleared ─
@@ -700,6 +747,7 @@ class LiveCommandsCog(commands.Cog):
         )
 
         sent_msg = None
+        offline_msg_key = message_handles.offline_key(login, guild_id)
         try:
             from db.guild_settings import get_guild_config
             config = await get_guild_config(guild_id)
@@ -708,7 +756,9 @@ class LiveCommandsCog(commands.Cog):
             )
             channel = self.bot.get_channel(announce_channel_id)
             if channel:
-                sent_msg = await channel.send(embed=embed)
+                sent_msg = await self.bot.app_state.message_handles.send(
+                    offline_msg_key, channel, discord_outbox.OFFLINE, embed=embed,
+                )
             else:
                 logger.warning(f"Announce channel {announce_channel_id} not found for {login}")
         except Exception as e:
@@ -720,7 +770,7 @@ class LiveCommandsCog(commands.Cog):
         if not vod_url and sent_msg:
             asyncio.create_task(
                 self._refresh_vod_later(
-                    sent_msg, user_id, login, display_name, duration_mins, last_title, user_info, raid_target,
+                    offline_msg_key, user_id, login, display_name, duration_mins, last_title, user_info, raid_target,
                 )
             )
 
@@ -755,10 +805,9 @@ class LiveCommandsCog(commands.Cog):
             logger.error(f"Failed to close stream_history row for {login}: {e}")
 
         # ── Clear Redis keys ─────────────────────────────────────
-        msg_key    = f"stream:msg:{login}:{guild_id}"
         status_key = f"stream:status:{login}"
         try:
-            await self.bot.app_state.redis.delete(msg_key)
+            await self.bot.app_state.message_handles.forget(message_handles.live_key(login, guild_id))
             await self.bot.app_state.redis.delete(status_key)
             logger.info(f"Cleared Redis cache for {login} in guild {guild_id}.")
         except Exception as e:
@@ -801,7 +850,7 @@ class LiveCommandsCog(commands.Cog):
 
     async def _refresh_vod_later(
         self,
-        message: discord.Message,
+        msg_key: str,
         user_id: str,
         login: str,
         display_name: str,
@@ -826,10 +875,11 @@ class LiveCommandsCog(commands.Cog):
                         login=login, display_name=display_name, duration_mins=duration_mins,
                         vod_url=vod_url, title=title, user_info=user_info, raided_login=raid_target,
                     )
-                    await message.edit(embed=refreshed_embed)
-                    logger.info(f"_refresh_vod_later: VOD link added for {login} after {attempt + 1} attempt(s)")
-                except discord.NotFound:
-                    pass  # message was deleted in the meantime
+                    edited = await self.bot.app_state.message_handles.edit(
+                        msg_key, discord_outbox.REFRESH, embed=refreshed_embed,
+                    )
+                    if edited:
+                        logger.info(f"_refresh_vod_later: VOD link added for {login} after {attempt + 1} attempt(s)")
                 except Exception as e:
                     logger.warning(f"_refresh_vod_later: failed to edit message for {login}: {e}")
                 return
@@ -875,6 +925,11 @@ class LiveCommandsCog(commands.Cog):
                         guild_id, twitch_user_id, username_clean,
                     )
 
+            # Write-through; the NOTIFY trigger tells the other replicas
+            index = getattr(self.bot.app_state, "streamer_index", None)
+            if index is not None:
+                await index.add(guild_id, username_clean, twitch_user_id)
+
             # Trigger EventSub subscription for the new streamer
             from core.event_bus import event_bus
             await event_bus.publish("streamer_added", {
@@ -900,10 +955,14 @@ class LiveCommandsCog(commands.Cog):
                     "DELETE FROM streamers WHERE twitch_login = $1 AND guild_id = $2",
                     username_clean, interaction.guild_id,
                 )
+            index = getattr(self.bot.app_state, "streamer_index", None)
+            if index is not None:
+                index.remove(interaction.guild_id, username_clean)
             
-            msg_key = f"stream:msg:{username_clean}:{interaction.guild_id}"
             status_key = f"stream:status:{username_clean}"
-            await self.bot.app_state.redis.delete(msg_key)
+            await self.bot.app_state.message_handles.forget(
+                message_handles.live_key(username_clean, interaction.guild_id)
+            )
             await self.bot.app_state.redis.delete(status_key)
 
             await interaction.followup.send(f"🗑️ Removed `{username_clean}` from tracked profiles and cleared related server caches.")
@@ -934,8 +993,7 @@ class LiveCommandsCog(commands.Cog):
             user_ids = [str(r["twitch_user_id"]) for r in rows if r["twitch_user_id"]]
             if user_ids:
                 try:
-                    twitch_api = self.bot.app_state.twitch_api
-                    live_streams = await twitch_api.get_streams_by_ids(user_ids)
+                    live_streams = await _live_streams_for(self.bot.app_state, user_ids, LIST_SNAPSHOT_MAX_AGE)
                     live_logins = {s["user_login"].lower() for s in live_streams}
                 except Exception as e:
                     logger.warning(f"live_list: Twitch API check failed, falling back to DB flags: {e}")
@@ -1017,14 +1075,14 @@ class LiveCommandsCog(commands.Cog):
                 await interaction.followup.send(f"❌ Could not find announce channel ({announce_channel_id}).")
                 return
 
-            sent_msg = await channel.send(embed=embed)
-
-            # Update Redis: message id + live status
+            # Post + keep a handle for later edits; update live status
             guild_id   = interaction.guild_id or GUILD_ID
-            msg_key    = f"stream:msg:{username_clean}:{guild_id}"
+            msg_key    = message_handles.live_key(username_clean, guild_id)
+            await self.bot.app_state.message_handles.send(
+                msg_key, channel, discord_outbox.GO_LIVE, embed=embed,
+            )
             status_key = f"stream:status:{username_clean}"
             stream_id  = stream_data.get("id", "live")
-            await self.bot.app_state.redis.set(msg_key, str(sent_msg.id))
             await self.bot.app_state.redis.set(status_key, stream_id, ttl=21600)
 
             # Update DB: mark streamer as live
@@ -1170,9 +1228,10 @@ class LiveCommandsCog(commands.Cog):
                 await interaction.followup.send("📭 No streamers tracked yet.")
                 return
 
-            # Ask Twitch who is actually live right now using the IDs mapping
+            # Ask Twitch who is actually live right now using the IDs mapping —
+            # via the shared snapshot, re-polled unless it is only seconds old
             twitch_api   = self.bot.app_state.twitch_api
-            live_streams = await twitch_api.get_streams_by_ids(all_user_ids)
+            live_streams = await _live_streams_for(self.bot.app_state, all_user_ids, STATS_SNAPSHOT_MAX_AGE)
             live_map     = {s["user_login"].lower(): s for s in live_streams}
 
             # Channel lookup with fallback
@@ -1187,10 +1246,10 @@ class LiveCommandsCog(commands.Cog):
 
             recovered = 0
             for login, stream in live_map.items():
-                msg_key    = f"stream:msg:{login}:{guild_id}"
+                msg_key    = message_handles.live_key(login, guild_id)
                 status_key = f"stream:status:{login}"
 
-                already_posted = await self.bot.app_state.redis.get(msg_key)
+                already_posted = await self.bot.app_state.message_handles.get(msg_key)
                 if already_posted:
                     continue  # notification already sent this session
 
@@ -1205,8 +1264,9 @@ class LiveCommandsCog(commands.Cog):
 
                 embed = build_live_embed(stream, user_data)
                 if channel:
-                    sent_msg = await channel.send(embed=embed)
-                    await self.bot.app_state.redis.set(msg_key, str(sent_msg.id))
+                    await self.bot.app_state.message_handles.send(
+                        msg_key, channel, discord_outbox.GO_LIVE, embed=embed,
+                    )
                     await self.bot.app_state.redis.set(status_key, stream.get("id", "live"), ttl=21600)
 
                 # Persist live state to DB
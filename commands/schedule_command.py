@@ -11,6 +11,8 @@ from datetime import datetime, timezone
 import discord
 from discord import app_commands
 
+from services import helix_ratelimit
+
 logger = logging.getLogger("schedule-command")
 
 
@@ -273,13 +275,16 @@ async def register(bot, app_state, session):
             )
             return
 
+        # One schedule call per streamer — background priority, so a big
+        # server's fan-out never eats the budget of live notifications
         all_segments = []
-        for row in rows:
-            login    = row["twitch_login"]
-            user     = await api.get_user_by_login(login)
-            segments = await _fetch_schedule(api, login)
-            name     = user.get("display_name", login) if user else login
-            all_segments.append((login, name, segments))
+        with helix_ratelimit.priority(helix_ratelimit.BACKGROUND):
+            for row in rows:
+                login    = row["twitch_login"]
+                user     = await api.get_user_by_login(login)
+                segments = await _fetch_schedule(api, login)
+                name     = user.get("display_name", login) if user else login
+                all_segments.append((login, name, segments))
 
         # Sort by next stream time
         def next_start(entry):
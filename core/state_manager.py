@@ -12,6 +12,7 @@ Improvements over original:
 - Added get_redis() accessor with the same guard pattern as get_db_pool()
 - Added set_bot() / get_bot() so cogs can reach the bot instance via state
 - Added is_ready() for startup health checks
+- Added set_twitch_auth() / get_twitch_auth() for the shared token service
 - Docstring explains relationship with container.py to avoid confusion
 """
 
@@ -33,6 +34,7 @@ class AppState:
         self._db_pool: Optional[asyncpg.Pool] = None
         self._redis:   Optional[Any]           = None
         self._bot:     Optional[Any]           = None
+        self._twitch_auth: Optional[Any]       = None
 
     # ──────────────────────────────────────────────────────────
     # DB POOL
@@ -78,6 +80,21 @@ class AppState:
             )
         return self._bot
 
+    # ──────────────────────────────────────────────────────────
+    # TWITCH AUTH
+    # ──────────────────────────────────────────────────────────
+
+    def set_twitch_auth(self, auth: Any) -> None:
+        self._twitch_auth = auth
+
+    def get_twitch_auth(self) -> Any:
+        if not self._twitch_auth:
+            raise RuntimeError(
+                "Twitch auth not initialised — call state.set_twitch_auth() "
+                "from main.py before making Twitch API calls."
+            )
+        return self._twitch_auth
+
     # ──────────────────────────────────────────────────────────
     # HEALTH
     # ──────────────────────────────────────────────────────────
@@ -8,15 +8,46 @@ Improvements over original:
   which guilds still need migrating
 - upsert_guild_config validates that at least one field is provided
 - All public functions are typed clearly
+
+Config cache:
+get_guild_config runs on every event for every guild, and used to cost
+one or two queries each time. load_guild_configs() now reads both
+tables once at startup into immutable per-guild records
+(MappingProxyType), and get_guild_config becomes a dict lookup.
+
+  write-through   upsert_guild_config re-reads the row it wrote
+  invalidation    a trigger on guild_configs / guild_settings (see
+                  db/migrations) NOTIFYs GUILD_CONFIG_CHANNEL with the
+                  guild id on every change — from any replica, a
+                  migration or a manual edit — and each replica's
+                  listener re-reads that guild
+
+Before the load, or once the listener connection is lost, lookups go
+to the database as before.
+
+Callbacks registered with add_config_listener() run after every cached
+change, with the guild id and its new config (None if it was removed);
+the streamer index (services/streamer_index) rebuilds a guild's
+subscriptions from them.
 """
 
+import asyncio
 import logging
-from typing import Optional, Dict
+from types import MappingProxyType
+from typing import Callable, Mapping, Optional, Dict
 
 logger = logging.getLogger("db.guild_settings")
 
+GUILD_CONFIG_CHANNEL = "guild_config_changed"
+
 _db = None
 
+_configs: Dict[int, Mapping] = {}
+_loaded   = False
+_listener = None          # dedicated asyncpg connection while listening
+_refreshes: set = set()   # in-flight refresh tasks (keeps references)
+_config_listeners: list[Callable[[int, Optional[Mapping]], None]] = []
+
 
 # ──────────────────────────────────────────────────────────────
 # DB INJECTION
@@ -39,67 +70,80 @@ def _get_db():
 # READ
 # ──────────────────────────────────────────────────────────────
 
-async def get_guild_config(guild_id: int) -> Optional[Dict]:
+_PRIMARY_COLUMNS = """
+    guild_id,
+    announce_channel_id,
+    games_channel_id,
+    ping_role_id,
+    live_role_id,
+    notify_enabled,
+    enable_ping,
+    enable_epic,
+    enable_gog,
+    enable_steam
+"""
+
+
+def _record(row) -> Mapping:
+    d = dict(row)
+    if not d.get("games_channel_id"):
+        d["games_channel_id"] = d.get("announce_channel_id")
+    return MappingProxyType(d)
+
+
+async def get_guild_config(guild_id: int) -> Optional[Mapping]:
     """
-    Returns guild config dict, or None if the guild is not configured.
+    Returns the guild's config (read-only mapping), or None if the guild
+    is not configured.
 
     Channel fields:
       announce_channel_id  — stream live / offline notifications
       games_channel_id     — free games, deals, Luna posts
                              falls back to announce_channel_id if not set
     """
+    if _loaded:
+        return _configs.get(guild_id)
+    return await _fetch_guild_config(guild_id)
+
+
+async def _query_guild_config(guild_id: int) -> Optional[Mapping]:
+    """Reads one guild from the tables; None only if neither has a row. Raises on query errors."""
     db = _get_db()
 
-    try:
-        # ── Primary table ───────────────────────────────────────
-        row = await db.fetchrow(
-            """
-            SELECT guild_id,
-                   announce_channel_id,
-                   games_channel_id,
-                   ping_role_id,
-                   live_role_id,
-                   notify_enabled,
-                   enable_ping,
-                   enable_epic,
-                   enable_gog,
-                   enable_steam
-            FROM guild_configs
-            WHERE guild_id = $1
-            """,
-            guild_id,
-        )
+    # ── Primary table ───────────────────────────────────────────
+    row = await db.fetchrow(
+        f"SELECT {_PRIMARY_COLUMNS} FROM guild_configs WHERE guild_id = $1",
+        guild_id,
+    )
 
-        if row:
-            d = dict(row)
-            if not d.get("games_channel_id"):
-                d["games_channel_id"] = d.get("announce_channel_id")
-            return d
-
-        # ── Legacy table fallback ───────────────────────────────
-        row = await db.fetchrow(
-            """
-            SELECT guild_id,
-                   announce_channel_id,
-                   games_channel_id
-            FROM guild_settings
-            WHERE guild_id = $1
-            """,
-            guild_id,
+    if row:
+        return _record(row)
+
+    # ── Legacy table fallback ───────────────────────────────────
+    row = await db.fetchrow(
+        """
+        SELECT guild_id,
+               announce_channel_id,
+               games_channel_id
+        FROM guild_settings
+        WHERE guild_id = $1
+        """,
+        guild_id,
+    )
+
+    if row:
+        logger.warning(
+            "Guild is using legacy guild_settings table — please migrate to guild_configs",
+            extra={"extra_data": {"guild_id": guild_id}},
         )
+        return _record(row)
 
-        if row:
-            logger.warning(
-                "Guild is using legacy guild_settings table — please migrate to guild_configs",
-                extra={"extra_data": {"guild_id": guild_id}},
-            )
-            d = dict(row)
-            if not d.get("games_channel_id"):
-                d["games_channel_id"] = d.get("announce_channel_id")
-            return d
+    return None
 
-        return None
 
+async def _fetch_guild_config(guild_id: int) -> Optional[Mapping]:
+    try:
+        return await _query_guild_config(guild_id)
     except Exception as e:
         logger.error(
             "get_guild_config failed — table may not exist yet (run migrations)",
@@ -108,6 +152,135 @@ async def get_guild_config(guild_id: int) -> Optional[Dict]:
         return None
 
 
+# ──────────────────────────────────────────────────────────────
+# CACHE
+# ──────────────────────────────────────────────────────────────
+
+async def load_guild_configs() -> int:
+    """
+    Loads every configured guild into the cache and serves reads from
+    it from now on. Returns the number of guilds loaded.
+    """
+    global _configs, _loaded
+    db = _get_db()
+
+    configs: Dict[int, Mapping] = {}
+    for row in await db.fetch(f"SELECT {_PRIMARY_COLUMNS} FROM guild_configs"):
+        configs[row["guild_id"]] = _record(row)
+
+    legacy = await db.fetch(
+        "SELECT guild_id, announce_channel_id, games_channel_id FROM guild_settings"
+    )
+    for row in legacy:
+        if row["guild_id"] in configs:
+            continue
+        logger.warning(
+            "Guild is using legacy guild_settings table — please migrate to guild_configs",
+            extra={"extra_data": {"guild_id": row["guild_id"]}},
+        )
+        configs[row["guild_id"]] = _record(row)
+
+    changed = {
+        guild_id for guild_id in configs.keys() | _configs.keys()
+        if configs.get(guild_id) != _configs.get(guild_id)
+    }
+    _configs = configs
+    _loaded  = True
+    for guild_id in changed:
+        _changed(guild_id, configs.get(guild_id))
+    logger.info(
+        "Guild configs cached",
+        extra={"extra_data": {"guilds": len(configs)}},
+    )
+    return len(configs)
+
+
+async def refresh_guild_config(guild_id: int) -> None:
+    """
+    Re-reads one guild into the cache, or drops it if neither table has
+    a row any more. A failed read keeps the cached record.
+    """
+    if not _loaded:
+        return
+    try:
+        config = await _query_guild_config(guild_id)
+    except Exception as e:
+        logger.warning(
+            "Guild config refresh failed — keeping the cached record",
+            extra={"extra_data": {"guild_id": guild_id, "error": str(e)}},
+        )
+        return
+    if config is None:
+        _configs.pop(guild_id, None)
+    else:
+        _configs[guild_id] = config
+    _changed(guild_id, config)
+
+
+def add_config_listener(callback: Callable[[int, Optional[Mapping]], None]) -> None:
+    """callback(guild_id, config) runs after each cached config change."""
+    _config_listeners.append(callback)
+
+
+def _changed(guild_id: int, config: Optional[Mapping]) -> None:
+    for callback in _config_listeners:
+        try:
+            callback(guild_id, config)
+        except Exception as e:
+            logger.error(f"Guild config listener failed for guild {guild_id}: {e}")
+
+
+async def start_invalidation_listener() -> None:
+    """LISTENs for GUILD_CONFIG_CHANNEL so changes made anywhere reach this cache."""
+    global _listener
+    if _listener is not None:
+        return
+    _listener = await _get_db().listen(GUILD_CONFIG_CHANNEL, _on_notify, _on_listener_lost)
+
+
+async def stop_invalidation_listener() -> None:
+    global _listener
+    if _listener is not None:
+        conn, _listener = _listener, None
+        await conn.close()
+
+
+def _on_notify(conn, pid, channel, payload) -> None:
+    try:
+        guild_id = int(payload)
+    except (TypeError, ValueError):
+        return
+    task = asyncio.get_running_loop().create_task(refresh_guild_config(guild_id))
+    _refreshes.add(task)
+    task.add_done_callback(_refreshes.discard)
+
+
+def _on_listener_lost(conn) -> None:
+    # Without notifications the cache can go stale — read through instead
+    global _loaded, _listener
+    if _listener is conn:
+        _listener = None
+        _loaded   = False
+        logger.warning("Guild config listener lost — reading configs from the database")
+        task = asyncio.get_running_loop().create_task(_resume())
+        _refreshes.add(task)
+        task.add_done_callback(_refreshes.discard)
+
+
+async def _resume(delay: float = 5.0) -> None:
+    """Re-LISTENs and reloads, backing off until the database is back."""
+    while True:
+        await asyncio.sleep(delay)
+        try:
+            await start_invalidation_listener()
+            await load_guild_configs()
+            logger.info("Guild config listener restored")
+            return
+        except Exception as e:
+            logger.warning(f"Guild config listener reconnect failed: {e}")
+            delay = min(delay * 2, 300)
+
+
 # ──────────────────────────────────────────────────────────────
 # WRITE
 # ──────────────────────────────────────────────────────────────
@@ -160,6 +333,9 @@ async def upsert_guild_config(
         live_role_id,
     )
 
+    # Write-through; the NOTIFY trigger tells the other replicas
+    await refresh_guild_config(guild_id)
+
     logger.info(
         "Guild config upserted",
         extra={"extra_data": {"guild_id": guild_id}},
@@ -36,6 +36,8 @@ async def run_migrations(db) -> None:
         await _create_tables(db)
         await _fix_column_names(db)
         await _add_missing_columns(db)
+        await _add_guild_config_notify(db)
+        await _add_streamers_notify(db)
         await _seed_guild_config(db)
         logger.info("✅ Database migrations complete")
     except Exception as e:
@@ -252,6 +254,72 @@ async def _add_missing_columns(db) -> None:
     logger.info("Columns verified/added")
 
 
+async def _add_guild_config_notify(db) -> None:
+    """
+    NOTIFY guild_config_changed with the guild id on every change to
+    either config table — every replica's guild config cache listens
+    (db/guild_settings).
+    """
+    try:
+        await db.execute("""
+            CREATE OR REPLACE FUNCTION notify_guild_config_changed() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify(
+                    'guild_config_changed',
+                    (CASE WHEN TG_OP = 'DELETE' THEN OLD.guild_id ELSE NEW.guild_id END)::text
+                );
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+
+        for table in ("guild_configs", "guild_settings"):
+            await db.execute(f"DROP TRIGGER IF EXISTS trg_{table}_notify ON {table}")
+            await db.execute(f"""
+                CREATE TRIGGER trg_{table}_notify
+                    AFTER INSERT OR UPDATE OR DELETE ON {table}
+                    FOR EACH ROW EXECUTE FUNCTION notify_guild_config_changed()
+            """)
+        logger.info("Guild config change notifications installed")
+    except Exception as e:
+        # Another replica may be installing them right now
+        logger.warning(f"Guild config notify trigger skipped: {e}")
+
+
+async def _add_streamers_notify(db) -> None:
+    """
+    NOTIFY streamers_changed with the guild id whenever a guild's
+    tracked streamers change — every replica's streamer index listens
+    (services/streamer_index).
+    """
+    try:
+        await db.execute("""
+            CREATE OR REPLACE FUNCTION notify_streamers_changed() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    PERFORM pg_notify('streamers_changed', OLD.guild_id::text);
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    PERFORM pg_notify('streamers_changed', NEW.guild_id::text);
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+
+        # Live-state updates don't move a streamer between guilds
+        await db.execute("DROP TRIGGER IF EXISTS trg_streamers_notify ON streamers")
+        await db.execute("""
+            CREATE TRIGGER trg_streamers_notify
+                AFTER INSERT OR DELETE OR UPDATE OF guild_id, twitch_user_id, twitch_login, target_channel_id
+                ON streamers
+                FOR EACH ROW EXECUTE FUNCTION notify_streamers_changed()
+        """)
+        logger.info("Streamer change notifications installed")
+    except Exception as e:
+        logger.warning(f"Streamers notify trigger skipped: {e}")
+
+
 async def _seed_guild_config(db) -> None:
     """
     Writes the known guild config to both config tables.
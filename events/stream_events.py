@@ -3,6 +3,10 @@ events/stream_events.py
 ────────────────────────────────────────────────────────────────
 Handles all Twitch EventSub events (online, offline, channel.update).
 Merged community routing, API delay fallbacks, and DB sync.
+
+Events fan out only to the guilds tracking the broadcaster, looked up in
+the streamer index (services/streamer_index); until it has loaded they
+fall back to checking every guild the bot is in.
 """
 
 import asyncio
@@ -15,7 +19,10 @@ import discord
 
 from db.guild_settings import get_guild_config
 from db.streamer_queries import upsert_streamer, set_stream_offline
+from services import discord_outbox, message_handles
+from services.live_snapshot import note_stream_event
 from services.redis_client import redis_client
+from services.streamer_index import Subscription
 from services.twitch_cache import get_cached_stream
 from utils.stream_diff import detect_changes
 
@@ -59,21 +66,37 @@ KEVKEVVY_CHANNEL_ID = 1446562544612540645
 # Redis key helpers
 def _meta_key(login: str) -> str:   return f"stream:meta:{login}"
 def _status_key(login: str) -> str: return f"stream:status:{login}"
-def _msg_key(login: str, guild_id: int) -> str: return f"stream:msg:{login}:{guild_id}"
 def _start_key(login: str) -> str:  return f"stream:start:{login}"
 
 
-def _get_target_channel(guild: discord.Guild, config: dict, login: str) -> Optional[discord.TextChannel]:
+def _get_target_channel(guild: discord.Guild, sub: Subscription, login: str) -> Optional[discord.TextChannel]:
     """Returns the correct announcement channel based on streamer login."""
-    if not config:
-        return None
-        
     if login == KEVKEVVY_LOGIN:
         ch = guild.get_channel(KEVKEVVY_CHANNEL_ID)
         if ch:
             return ch
-    ch_id = config.get("announce_channel_id")
-    return guild.get_channel(ch_id) if ch_id else None
+    return guild.get_channel(sub.channel_id) if sub.channel_id else None
+
+
+async def _subscribed_guilds(bot, b_id: Optional[str], login: str) -> list[tuple[discord.Guild, Subscription]]:
+    """The guilds to notify about this broadcaster, with their subscription."""
+    index = getattr(bot.app_state, "streamer_index", None)
+    if index is not None and index.loaded:
+        subs = index.lookup(b_id, login)
+    else:
+        # Index not loaded (or its listener is down) — check every guild
+        subs = []
+        for guild in bot.guilds:
+            config = await get_guild_config(guild.id)
+            if config:
+                subs.append(Subscription.build(guild.id, login, b_id, config))
+
+    targets = []
+    for sub in subs:
+        guild = bot.get_guild(sub.guild_id)
+        if guild is not None and sub.notify_enabled:
+            targets.append((guild, sub))
+    return targets
 
 
 # ──────────────────────────────────────────────────────────────
@@ -171,6 +194,7 @@ def _offline_embed(login: str, user_name: str, start_ts: Optional[float]) -> dis
 # ──────────────────────────────────────────────────────────────
 
 async def _send_or_edit(
+    bot,
     channel: discord.TextChannel,
     login: str,
     guild_id: int,
@@ -178,20 +202,21 @@ async def _send_or_edit(
     embed: discord.Embed,
 ) -> None:
     """
-    Edits the existing live message if it's still tracked in Redis,
-    otherwise sends a new one.
+    Edits the existing live message if we still hold a handle to it
+    (re-sending if it was deleted), otherwise sends a new one.
     """
-    msg_key = _msg_key(login, guild_id)
-    stored  = await redis_client.get(msg_key)
-    if stored:
-        try:
-            msg = await channel.fetch_message(int(stored))
-            await msg.edit(content=content, embed=embed)
+    handles = bot.app_state.message_handles
+    msg_key = message_handles.live_key(login, guild_id)
+    try:
+        edited = await handles.edit(
+            msg_key, discord_outbox.GO_LIVE, resend=True, channel_id=channel.id,
+            content=content, embed=embed,
+        )
+        if edited:
             return
-        except Exception:
-            pass  # Message was deleted or no longer reachable — send new
-    msg = await channel.send(content=content, embed=embed)
-    await redis_client.set(msg_key, str(msg.id), ttl=LIVE_TTL)
+    except Exception:
+        pass  # No longer reachable — send new
+    await handles.send(msg_key, channel, discord_outbox.GO_LIVE, content=content, embed=embed)
 
 
 # ──────────────────────────────────────────────────────────────
@@ -216,6 +241,7 @@ async def handle_stream_online(bot, event: dict) -> None:
 
     await redis_client.set(_status_key(login), stream_id,        ttl=LIVE_TTL)
     await redis_client.set(_start_key(login),  str(time.time()), ttl=LIVE_TTL)
+    await note_stream_event(bot.app_state, b_id, live=True)
 
     # Twitch API sometimes lags slightly behind the online event
     new_stream = await get_cached_stream(login)
@@ -227,24 +253,22 @@ async def handle_stream_online(bot, event: dict) -> None:
     if not new_stream:
         new_stream = {"title": "Live!", "game_name": "Unknown"}
 
-    # Send announcement to all relevant guilds
-    for guild in bot.guilds:
-        config = await get_guild_config(guild.id)
-        if not config:
-            continue
-
-        if b_id:
+    # Send announcement to the guilds tracking this streamer
+    for guild, sub in await _subscribed_guilds(bot, b_id, login):
+        # Backfill a missing id / follow a rename — only when the row is stale
+        if b_id and (sub.twitch_user_id != b_id or sub.login != login):
             await upsert_streamer(b_id, login, guild.id)
+            index = getattr(bot.app_state, "streamer_index", None)
+            if index is not None:
+                if sub.login != login:
+                    index.remove(guild.id, sub.login)
+                await index.add(guild.id, login, b_id)
 
-        channel = _get_target_channel(guild, config, login)
+        channel = _get_target_channel(guild, sub, login)
         if channel:
-            role = (
-                guild.get_role(config.get("ping_role_id"))
-                if config.get("enable_ping")
-                else None
-            )
+            role = guild.get_role(sub.ping_role_id) if sub.enable_ping and sub.ping_role_id else None
             await _send_or_edit(
-                channel, login, guild.id,
+                bot, channel, login, guild.id,
                 role.mention if role else None,
                 _live_embed(login, user_name, new_stream),
             )
@@ -261,6 +285,7 @@ async def handle_stream_offline(bot, event: dict) -> None:
 
     if b_id:
         await set_stream_offline(b_id)
+    await note_stream_event(bot.app_state, b_id, live=False)
 
     # Retrieve start time before deleting keys
     start_ts = float(await redis_client.get(_start_key(login)) or 0)
@@ -268,16 +293,14 @@ async def handle_stream_offline(bot, event: dict) -> None:
 
     embed = _offline_embed(login, user_name, start_ts if start_ts > 0 else None)
 
-    for guild in bot.guilds:
-        config = await get_guild_config(guild.id)
-        if not config:
-            continue
-            
-        ch = _get_target_channel(guild, config, login)
+    for guild, sub in await _subscribed_guilds(bot, b_id, login):
+        ch = _get_target_channel(guild, sub, login)
         if ch:
-            await redis_client.delete(_msg_key(login, guild.id))
+            await bot.app_state.message_handles.forget(message_handles.live_key(login, guild.id))
             try:
-                await ch.send(embed=embed)
+                await bot.app_state.message_handles.send(
+                    message_handles.offline_key(login, guild.id), ch, discord_outbox.OFFLINE, embed=embed,
+                )
             except Exception as e:
                 logger.error(f"Failed to send offline notification to guild {guild.id}: {e}")
 
@@ -289,6 +312,7 @@ async def handle_channel_update(bot, event: dict) -> None:
     """
     login     = event["broadcaster_user_login"].lower()
     user_name = event.get("broadcaster_user_name", login)
+    b_id      = event.get("broadcaster_user_id")
 
     # Ignore updates if the streamer is currently offline
     if not await redis_client.get(_status_key(login)):
@@ -301,11 +325,7 @@ async def handle_channel_update(bot, event: dict) -> None:
     changes = detect_changes(old_stream, new_stream) if old_stream else {}
     if changes:
         await redis_client.set(_meta_key(login), json.dumps(new_stream), ttl=META_TTL)
-        for guild in bot.guilds:
-            config = await get_guild_config(guild.id)
-            if not config:
-                continue
-                
-            ch = _get_target_channel(guild, config, login)
+        for guild, sub in await _subscribed_guilds(bot, b_id, login):
+            ch = _get_target_channel(guild, sub, login)
             if ch:
-                await ch.send(embed=_change_embed(login, user_name, changes))
+                await discord_outbox.send(bot, ch, discord_outbox.REFRESH, embed=_change_embed(login, user_name, changes))
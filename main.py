@@ -71,14 +71,12 @@ def _setup_event_handlers() -> None:
     register_notifier(bot)
 
     async def _on_streamer_added(payload: dict) -> None:
-        eventsub = getattr(app_state, "eventsub_manager", None)
-        if not eventsub: return
+        reconciler = getattr(app_state, "eventsub_reconciler", None)
+        if not reconciler: return
         twitch_user_id = payload.get("twitch_user_id")
         if not twitch_user_id: return
-        callback_url = eventsub.callback_url
-        if not callback_url: return
         try:
-            await eventsub.ensure_subscriptions(str(twitch_user_id), callback_url)
+            await reconciler.reconcile([str(twitch_user_id)])
         except Exception as e:
             logger.error(f"EventSub subscription error: {e}", exc_info=True)
 
@@ -95,6 +93,16 @@ async def _free_games_loop(session: ClientSession, cache) -> None:
             logger.error(f"Free games loop error: {e}")
             await asyncio.sleep(300)
 
+async def _subscribe_tracked_streamers(session_id: str) -> None:
+    # A fresh EventSub WebSocket session starts with no subscriptions
+    summary = await app_state.eventsub_reconciler.reconcile()
+    logger.info(f"EventSub WebSocket session {session_id}: {summary}")
+
+async def _replay_eventsub_journal(entries) -> None:
+    # Handlers fan out over bot.guilds, so wait for the gateway first
+    await bot.wait_until_ready()
+    await eventsub_server.replay_journal(app_state, entries)
+
 @bot.event
 async def on_ready() -> None:
     bot.start_time = discord.utils.utcnow()
@@ -114,6 +122,16 @@ async def on_ready() -> None:
     app_state.mark_ready()
     global_state.set_bot(bot)
 
+def _uncovered_broadcasters() -> set[str]:
+    """Broadcasters EventSub isn't covering: revoked, or failed to subscribe."""
+    ids = set()
+    if app_state.eventsub_revocations is not None:
+        ids |= app_state.eventsub_revocations.polling_only
+    reconciler = app_state.eventsub_reconciler
+    if reconciler is not None and reconciler.last_summary is not None:
+        ids |= reconciler.last_summary.failed_ids
+    return ids
+
 async def _start_web_server(bot, app_state) -> web.AppRunner:
     webhook_app = await create_webhook_app(bot, app_state)
     main_app = await eventsub_server.create_app(bot, app_state)
@@ -136,8 +154,25 @@ async def main() -> None:
     from db.migrations import run_migrations
     await run_migrations(app_state.db)
 
+    # Guild configs: read once, then kept fresh by LISTEN/NOTIFY
+    try:
+        await guild_settings_module.start_invalidation_listener()
+        await guild_settings_module.load_guild_configs()
+    except Exception as e:
+        logger.warning(f"Guild config cache unavailable, reading per call: {e}")
+
+    # Streamer → guild index: events notify only the guilds tracking them
+    from services.streamer_index import StreamerIndex
+    app_state.streamer_index = StreamerIndex(app_state.db)
+    try:
+        await app_state.streamer_index.start_listener()
+        await app_state.streamer_index.load()
+    except Exception as e:
+        logger.warning(f"Streamer index unavailable, scanning guilds per event: {e}")
+
     # Redis
     cache = None
+    raw_redis = None
     if REDIS_URL and config.redis.enabled:
         import redis.asyncio as aioredis
         raw_redis = aioredis.from_url(REDIS_URL)
@@ -149,16 +184,90 @@ async def main() -> None:
 
     async with ClientSession(timeout=ClientTimeout(total=15)) as session:
         app_state.session = session
+        # One proactively refreshed app token for every Twitch caller
+        from services.twitch_auth import TwitchAuth
+        app_state.twitch_auth = TwitchAuth(session)
+        await app_state.twitch_auth.start()
+        global_state.set_twitch_auth(app_state.twitch_auth)
+
         from services.twitch_api import TwitchAPI
-        app_state.twitch_api = TwitchAPI(session)
+        app_state.twitch_api = TwitchAPI(session, auth=app_state.twitch_auth)
+
+        # Profiles: LRU → Redis → Helix; warmed from the streamers table
+        from services.user_cache import UserCache
+        app_state.user_cache = UserCache(app_state.twitch_api, app_state.redis)
+        app_state.twitch_api.user_cache = app_state.user_cache
+        try:
+            await app_state.user_cache.warm(app_state.db)
+        except Exception as e:
+            logger.warning(f"User cache warm-up failed: {e}")
+
+        # Every Discord send / edit goes through per-channel, prioritised lanes
+        from services.discord_outbox import DiscordOutbox
+        app_state.discord_outbox = DiscordOutbox()
+        # Edits go straight to a PartialMessage — no fetch_message first
+        from services.message_handles import MessageHandleStore
+        app_state.message_handles = MessageHandleStore(bot, app_state.redis)
 
         # EventSub Manager
         from services.eventsub_manager import EventSubManager
-        app_state.eventsub_manager = EventSubManager(session)
+        app_state.eventsub_manager = EventSubManager(
+            session,
+            auth=app_state.twitch_auth,
+            ratelimit=app_state.twitch_api.ratelimit,
+        )
+
+        from services.eventsub_reconciler import SubscriptionReconciler
+        app_state.eventsub_reconciler = SubscriptionReconciler(
+            app_state.eventsub_manager, app_state.db
+        )
+
+        # One /streams poll per cycle, shared by the watchdog, the title
+        # tracker, /live list, /live stats and /status
+        # — polled per broadcaster on an adaptive schedule
+        from services.live_snapshot import LiveSnapshotService
+        from services.poll_scheduler import PollScheduler
+        app_state.live_snapshot = LiveSnapshotService(
+            app_state.twitch_api, app_state.db,
+            scheduler=PollScheduler(uncovered=_uncovered_broadcasters),
+            redis=app_state.redis,
+        )
+
+        # Every replica takes EventSub intake and runs the watchdog over its
+        # own shard; the snapshot poller and the poster loops run only on
+        # the elected leader
+        from monitor import TwitchMonitor
+        from services.leader_election import INSTANCE_ID, LeaderElector
+        from services.replica_ring import ReplicaRing
+        app_state.replica_ring = ReplicaRing(raw_redis, INSTANCE_ID)
+        leader_tasks: list[asyncio.Task] = []
+
+        async def _on_elected() -> None:
+            app_state.live_snapshot.start()
+            leader_tasks[:] = [
+                asyncio.create_task(_free_games_loop(session, cache)),
+                asyncio.create_task(luna_poster_loop(bot, session, cache)),
+                asyncio.create_task(steam_poster_loop(bot, session, cache)),
+                asyncio.create_task(badge_fetcher_loop(app_state)),
+            ]
+
+        async def _on_demoted() -> None:
+            for task in leader_tasks:
+                task.cancel()
+            await asyncio.gather(*leader_tasks, return_exceptions=True)
+            leader_tasks.clear()
+            await app_state.live_snapshot.stop()
+
+        app_state.leader = LeaderElector(
+            raw_redis,
+            TwitchMonitor.LEADER_LOCK_KEY,
+            TwitchMonitor.LEADER_LOCK_TTL,
+            on_elected=_on_elected,
+            on_demoted=_on_demoted,
+        )
 
         # Twitch Monitor Initialisation
         try:
-            from monitor import TwitchMonitor
             from services import notifier
             
             app_state.monitor = TwitchMonitor(
@@ -167,9 +276,10 @@ async def main() -> None:
                 db_pool=app_state.db.pool,
                 redis=app_state.redis,
                 bot=bot,
-                notifier=notifier
+                notifier=notifier,
+                live_snapshot=app_state.live_snapshot,
+                ring=app_state.replica_ring,
             )
-            await app_state.monitor.start()
             logger.info("TwitchMonitor initialized.")
         except Exception as e:
             logger.error(f"Monitor init failed: {e}", exc_info=True)
@@ -182,11 +292,41 @@ async def main() -> None:
         _setup_event_handlers()
         await load_all_commands(bot, app_state, session)
 
-        free_task = asyncio.create_task(_free_games_loop(session, cache))
-        luna_task = asyncio.create_task(luna_poster_loop(bot, session, cache))
-        steam_task = asyncio.create_task(steam_poster_loop(bot, session, cache))
-        badge_task = asyncio.create_task(badge_fetcher_loop(app_state))
-        
+        # EventSub intake — bounded worker pool instead of a task per webhook,
+        # backed by an on-disk journal so accepted notifications survive a crash
+        from services.eventsub_journal import EventSubJournal
+        from services.eventsub_dispatcher import EventSubDispatcher
+        app_state.eventsub_journal = EventSubJournal()
+        journal_backlog = await app_state.eventsub_journal.open()
+        app_state.eventsub_dispatcher = EventSubDispatcher(
+            bot, eventsub_server.NOTIFICATION_HANDLERS,
+            journal=app_state.eventsub_journal,
+        )
+        app_state.eventsub_dispatcher.start()
+        replay_task = asyncio.create_task(_replay_eventsub_journal(journal_backlog))
+
+        from services.eventsub_dedup import MessageDeduplicator
+        app_state.eventsub_dedup = MessageDeduplicator(app_state.redis)
+
+        from services.eventsub_revocation import RevocationHandler
+        app_state.eventsub_revocations = RevocationHandler(
+            app_state.eventsub_manager, app_state.redis
+        )
+
+        eventsub_ws = None
+        if app_state.eventsub_manager.transport == "websocket":
+            from services.eventsub_websocket import EventSubWebSocket
+            eventsub_ws = EventSubWebSocket(
+                session, app_state.eventsub_manager, app_state,
+                on_session=_subscribe_tracked_streamers,
+            )
+            eventsub_ws.start()
+
+        app_state.leader.start()
+        await app_state.replica_ring.start()
+        if getattr(app_state, "monitor", None):
+            await app_state.monitor.start()
+
         runner = await _start_web_server(bot, app_state)
         bot_task = asyncio.create_task(bot.start(DISCORD_TOKEN))
 
@@ -195,13 +335,29 @@ async def main() -> None:
             loop.add_signal_handler(sig, shutdown_event.set)
 
         await shutdown_event.wait()
-        
-        if hasattr(app_state, "monitor"):
+        app_state.mark_shutdown()
+
+        # Finish queued notifications while the gateway is still connected;
+        # anything arriving meanwhile gets a 503 and is retried by Twitch.
+        if eventsub_ws:
+            await eventsub_ws.stop()
+        await app_state.eventsub_revocations.stop()
+        await app_state.eventsub_dispatcher.drain()
+        await app_state.discord_outbox.drain()
+        replay_task.cancel()
+        await app_state.eventsub_journal.close()
+
+        # Stops the leader-only work and releases the lease for a fast handover
+        await app_state.leader.stop()
+        if getattr(app_state, "monitor", None):
             await app_state.monitor.stop()
+        await app_state.replica_ring.stop()
 
-        for task in (free_task, luna_task, steam_task, badge_task, bot_task):
-            task.cancel()
+        bot_task.cancel()
         await runner.cleanup()
+        await app_state.twitch_auth.stop()
+        await app_state.streamer_index.stop_listener()
+        await guild_settings_module.stop_invalidation_listener()
         await app_state.db.close()
 
 if __name__ == "__main__":
@@ -2,6 +2,17 @@
 Production TwitchMonitor — leader-elected, self-healing cycle.
 Includes Watchdog mechanism for state reconciliation.
 
+Every replica runs the cycle over its own shard of the tracked
+broadcasters (services.replica_ring.ReplicaRing); ownership is checked
+again right before a recovery is posted, so an id handed to another
+replica mid-pass is left to it. Without a ring, only the replica
+holding LEADER_LOCK_KEY should run the cycle — recoveries then check the
+LeaderElector's fencing token instead.
+
+Live status comes from the leader's live snapshot: the leader reads
+its own, the other replicas the copy it publishes to Redis — they never
+poll Helix for their shard.
+
 Self-contained: does NOT depend on services.notifier (that module's
 interface has been unreliable/undocumented). Instead reuses the same
 embed-building and posting logic already proven to work in
@@ -9,19 +20,26 @@ commands/live_commands.py.
 """
 import asyncio
 import logging
+import time
 from datetime import datetime, timezone
 
 from commands.live_commands import KNOWN_STREAMERS
+from services import discord_outbox, message_handles
 
 logger = logging.getLogger("twitch-monitor")
 
 
 class TwitchMonitor:
     LEADER_LOCK_KEY = "twitch-monitor:leader"
-    LEADER_LOCK_TTL = 60
+    LEADER_LOCK_TTL = 15    # seconds; bounds failover when the leader dies
+    SNAPSHOT_MAX_AGE = 90   # older than this and the watchdog polls itself
+    STATUS_TTL = 21600      # every stream:status writer sets this TTL — its age is TTL - remaining
 
-    def __init__(self, twitch_api, eventsub_manager, db_pool, redis, bot, notifier=None):
+    def __init__(self, twitch_api, eventsub_manager, db_pool, redis, bot, notifier=None, live_snapshot=None, leader=None, ring=None):
         self.twitch_api = twitch_api
+        self.live_snapshot = live_snapshot  # services.live_snapshot.LiveSnapshotService
+        self.leader = leader                # services.leader_election.LeaderElector
+        self.ring = ring                    # services.replica_ring.ReplicaRing
         self.eventsub = eventsub_manager
         self.db = db_pool
         self.redis = redis
@@ -65,12 +83,12 @@ class TwitchMonitor:
             logger.warning(f"[Watchdog] Could not fetch user data for {login}: {e}")
 
         embed = build_live_embed(stream, user_data)
-        sent_msg = await channel.send(embed=embed)
+        await self.bot.app_state.message_handles.send(
+            message_handles.live_key(login, guild_id), channel, discord_outbox.GO_LIVE, embed=embed,
+        )
 
-        msg_key    = f"stream:msg:{login}:{guild_id}"
         status_key = f"stream:status:{login}"
         stream_id  = stream.get("id", "live")
-        await self.redis.set(msg_key, str(sent_msg.id))
         await self.redis.set(status_key, stream_id, ttl=21600)
 
         try:
@@ -101,8 +119,9 @@ class TwitchMonitor:
 
         Rather than duplicate the offline-handling logic (VOD lookup,
         stream_history closing, dashboard update, raid field, etc.) this
-        just dispatches the same event on_stream_offline already listens
-        for in commands/live_commands.py, reusing that flow entirely.
+        reuses on_stream_offline in commands/live_commands.py. It is
+        submitted to the broadcaster's EventSub dispatcher lane, so it
+        cannot race a stream.online for the same streamer arriving now.
         """
         display_name = login
         try:
@@ -137,16 +156,93 @@ class TwitchMonitor:
         except Exception as e:
             logger.warning(f"[Watchdog] Could not compute duration for {login}: {e}")
 
-        self.bot.dispatch("stream_offline", user_id, login, display_name, duration_mins, guild_id)
+        dispatcher = getattr(getattr(self.bot, "app_state", None), "eventsub_dispatcher", None)
+        if dispatcher is None:
+            # No EventSub intake in this process, so nothing to order against
+            self.bot.dispatch("stream_offline", user_id, login, display_name, duration_mins, guild_id)
+        else:
+            from services.eventsub_server import WATCHDOG_OFFLINE
+            submitted = dispatcher.submit(WATCHDOG_OFFLINE, {
+                "broadcaster_user_id":    user_id,
+                "broadcaster_user_login": login,
+                "broadcaster_user_name":  display_name,
+                "duration_mins":          duration_mins,
+                "guild_id":               guild_id,
+            })
+            if not submitted:
+                # Queue full or shutting down — nothing changed, the next pass retries
+                logger.warning(f"[Watchdog] Dispatcher busy — offline reconciliation of {login} deferred")
+                return
         logger.info(f"[Watchdog] Dispatched stream_offline for {login} (missed event reconciliation)")
 
-    async def run_safety_check(self):
+    async def _live_streams(
+        self, user_ids: list[str],
+    ) -> tuple[list[dict], set[str], dict[str, float]] | None:
+        """
+        (live streams, ids nobody checked, user id -> when it was polled)
+        for `user_ids`, read from the shared live snapshot. On the polling
+        replica, ids it doesn't cover yet (just added) go to Twitch
+        directly; elsewhere they are left unchecked until the leader
+        picks them up. None if another replica polls and hasn't
+        published lately.
+        """
+        if self.live_snapshot is None:
+            started = time.time()
+            streams = await self.twitch_api.get_streams_by_ids(user_ids)
+            return streams, set(), dict.fromkeys(user_ids, started)
+
+        if not self.live_snapshot.polling:
+            # Another replica leads: read its published snapshot, never Helix
+            snap = await self.live_snapshot.published(max_age=self.SNAPSHOT_MAX_AGE)
+            if snap is None:
+                return None
+            streams = [snap.by_id[uid] for uid in user_ids if uid in snap.by_id]
+            return streams, {uid for uid in user_ids if uid not in snap.tracked}, dict(snap.polled_at)
+
+        snap = await self.live_snapshot.get(max_age=self.SNAPSHOT_MAX_AGE)
+        streams   = [snap.by_id[uid] for uid in user_ids if uid in snap.by_id]
+        polled_at = dict(snap.polled_at)
+        missing   = [uid for uid in user_ids if uid not in snap.tracked]
+        if missing:
+            started = time.time()
+            streams.extend(await self.twitch_api.get_streams_by_ids(missing))
+            polled_at.update(dict.fromkeys(missing, started))
+        return streams, set(), polled_at
+
+    async def _status_written_at(self, status_key: str) -> float | None:
+        """When `status_key` was last set, from its remaining TTL; None if unknown."""
+        remaining = await self.redis.ttl(status_key)
+        if remaining < 0:
+            return None
+        return time.time() - (self.STATUS_TTL - remaining)
+
+    async def _fenced(self, login: str, user_id: str) -> bool:
+        """False if `user_id` has moved to another replica since the pass began."""
+        if self.ring is not None:
+            if self.ring.owns(user_id):
+                return True
+            logger.info(f"[Watchdog] {login} handed to another replica — skipping recovery")
+            return False
+        if self.leader is None or await self.leader.fence_ok():
+            return True
+        logger.warning(f"[Watchdog] Lost leadership — skipping recovery of {login}")
+        return False
+
+    def _polling_only(self) -> set[str]:
+        """Broadcaster ids whose EventSub subscription is currently revoked."""
+        revocations = getattr(getattr(self.bot, "app_state", None), "eventsub_revocations", None)
+        return revocations.polling_only if revocations else set()
+
+    async def run_safety_check(self, only_user_ids: set[str] | None = None):
         """
         [Watchdog] Periodically verifies live status against Twitch API.
         If an EventSub notification was missed, posts it directly.
         Also catches the reverse case — a missed stream.offline event
         leaving is_live stuck as TRUE — and reconciles it the same way.
 
+        `only_user_ids` limits the check to those broadcasters — used for
+        the extra per-cycle pass over polling-only streamers.
+
         NOTE: TwitchAPI in this codebase only exposes get_streams_by_ids —
         there is no get_streams_by_logins method. All lookups must go
         through numeric Twitch user IDs, not logins.
@@ -171,13 +267,35 @@ class TwitchMonitor:
                 if login not in tracked and uid:
                     tracked[login] = (str(uid), GUILD_ID)
 
+            if only_user_ids is not None:
+                tracked = {
+                    login: entry for login, entry in tracked.items()
+                    if entry[0] in only_user_ids
+                }
+
+            if self.ring is not None:
+                tracked = {
+                    login: entry for login, entry in tracked.items()
+                    if self.ring.owns(entry[0])
+                }
+
             if not tracked:
                 return
 
             user_ids = [uid for uid, _ in tracked.values()]
 
-            # ── 3. Batch-fetch live status from Twitch API ────────────────────
-            live_streams = await self.twitch_api.get_streams_by_ids(user_ids)
+            # ── 3. Live status — shared snapshot, Twitch API as fallback ──────
+            result = await self._live_streams(user_ids)
+            if result is None:
+                logger.warning("[Watchdog] No recent live snapshot from the leader — skipping this pass")
+                return
+            live_streams, unchecked, polled_at = result
+            if unchecked:
+                # Unknown live state — must not read as "offline" in step 5
+                tracked = {
+                    login: entry for login, entry in tracked.items()
+                    if entry[0] not in unchecked
+                }
             live_now = {s["user_login"].lower() for s in live_streams}
 
             # ── 4. Recovery: post notifications for any missed EventSub events ─
@@ -185,7 +303,7 @@ class TwitchMonitor:
                 login = stream["user_login"].lower()
                 if login not in tracked:
                     continue
-                _, guild_id = tracked[login]
+                user_id, guild_id = tracked[login]
 
                 status_key = f"stream:status:{login}"
                 already_tracked = await self.redis.get(status_key)
@@ -196,6 +314,8 @@ class TwitchMonitor:
                     f"[Watchdog] {login} is live but not in Redis — "
                     f"EventSub may have been missed. Recovering."
                 )
+                if not await self._fenced(login, user_id):
+                    continue
                 try:
                     await self._recover_stream(login, guild_id, stream)
                 except Exception as e:
@@ -204,10 +324,15 @@ class TwitchMonitor:
             # ── 5. Reconciliation: catch missed OFFLINE events too ────────────
             # Symmetric to step 4 — if the DB thinks a streamer is live but
             # Twitch says they're not, the offline event was likely missed.
+            # The snapshot may be up to SNAPSHOT_MAX_AGE old (a dormant entry
+            # far older), so it only picks the candidates: one whose status
+            # was written after its entry was polled went live since, and
+            # the rest are confirmed against Helix first.
             try:
                 stale_rows = await self.db.fetch(
                     "SELECT twitch_login, twitch_user_id, guild_id FROM streamers WHERE is_live = TRUE"
                 )
+                candidates = []
                 for row in stale_rows:
                     login = row["twitch_login"]
                     if login in live_now or login not in tracked:
@@ -218,13 +343,30 @@ class TwitchMonitor:
                     if not still_marked_live:
                         continue  # already reconciled elsewhere (e.g. /live list self-heal)
 
-                    guild_id = row["guild_id"]
                     user_id = str(row["twitch_user_id"]) if row["twitch_user_id"] else tracked[login][0]
+                    written_at = await self._status_written_at(status_key)
+                    if written_at is None or written_at >= polled_at.get(user_id, 0.0):
+                        logger.info(f"[Watchdog] {login} went live after its last poll — not reconciling")
+                        continue
+                    candidates.append((login, user_id, row["guild_id"]))
+
+                confirmed_live = set()
+                if candidates:
+                    # Raises if Helix is unavailable — then nothing is reconciled this pass
+                    fresh = await self.twitch_api.get_streams_by_ids(list({uid for _, uid, _ in candidates}))
+                    confirmed_live = {str(s["user_id"]) for s in fresh}
+
+                for login, user_id, guild_id in candidates:
+                    if user_id in confirmed_live:
+                        logger.info(f"[Watchdog] {login} went live after the snapshot — not reconciling")
+                        continue
 
                     logger.warning(
                         f"[Watchdog] {login} is marked live in DB but Twitch says offline — "
                         f"the stream.offline event was likely missed. Reconciling."
                     )
+                    if not await self._fenced(login, user_id):
+                        continue
                     try:
                         await self._recover_offline(login, user_id, guild_id)
                     except Exception as e:
@@ -242,9 +384,16 @@ class TwitchMonitor:
 
             # Run safety check every 2 cycles (~2 minutes) — catches missed
             # EventSub deliveries quickly instead of leaving streams unposted
-            # for up to 5 minutes.
+            # for up to 5 minutes. How often each streamer is actually asked
+            # about on Twitch is up to the live snapshot's PollScheduler.
             if self.monitor_cycles_total % 2 == 0:
                 await self.run_safety_check()
+            else:
+                # Streamers whose subscription was revoked get no EventSub
+                # at all until it is restored — poll them every cycle
+                polling_only = self._polling_only()
+                if polling_only:
+                    await self.run_safety_check(only_user_ids=polling_only)
 
             await asyncio.sleep(60)
 
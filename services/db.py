@@ -141,6 +141,23 @@ class Database:
         async with self.pool.acquire() as conn:
             await conn.executemany(query, args_list)
 
+    # ==================================================
+    # LISTEN / NOTIFY
+    # ==================================================
+
+    async def listen(self, channel: str, callback, on_lost=None) -> asyncpg.Connection:
+        """
+        LISTENs on `channel` over a dedicated connection (a pooled one
+        would be handed to other callers). callback(conn, pid, channel,
+        payload) runs for every NOTIFY; on_lost(conn) when the connection
+        drops. Close the returned connection to stop.
+        """
+        conn = await asyncpg.connect(self.dsn)
+        if on_lost is not None:
+            conn.add_termination_listener(on_lost)
+        await conn.add_listener(channel, callback)
+        return conn
+
     # ==================================================
     # POOL ACCESS (kept for backward compat)
     # ==================================================
@@ -0,0 +1,397 @@
+"""
+services/discord_outbox.py
+────────────────────────────────────────────────────────────────
+Outbound Discord send / edit scheduler.
+
+Go-live posts, offline posts, embed refreshes, watchdog recoveries and
+deal posts all used to call channel.send / message.edit directly, so in
+a burst discord.py's rate limiter released them in whatever order they
+happened to queue — a free-games fan-out could hold up a go-live.
+
+DiscordOutbox runs every call through:
+
+  lanes       one queue per channel, worked one call at a time —
+              Discord rate-limits per channel, and a lane keeps its
+              channel's messages in priority order
+  priorities  GO_LIVE < OFFLINE < REFRESH < DEALS; FIFO within a class.
+              A lane picks its most urgent job, and a global gate of
+              DISCORD_OUTBOX_CONCURRENCY slots hands free slots to the
+              most urgent waiting lane
+  coalescing  an edit to a message that already has an edit queued
+              merges into it — only the newest embed is sent, and every
+              caller gets the same result. REFRESH and DEALS edits wait
+              DISCORD_EDIT_WINDOW before queueing, so a burst of refreshes
+              to one message becomes a single call; a GO_LIVE / OFFLINE
+              edit merging into one that is still waiting queues it at once
+  no-op skip  the outbox remembers a fingerprint of what each message
+              last showed (content, embeds). An edit that would show the
+              same thing is not sent. The fingerprint ignores the embed
+              timestamp and the cache-busting ?v= on image URLs, so the
+              refresh loops' re-renders of an unchanged stream cost nothing
+
+Callers await the outcome as if they had called Discord themselves:
+send() returns the Message, and discord exceptions (NotFound,
+Forbidden, ...) are raised to the caller.
+
+    from services import discord_outbox
+    msg = await discord_outbox.send(bot, channel, discord_outbox.GO_LIVE, embed=embed)
+
+The module-level send / edit fall back to direct calls when the bot has
+no outbox (scripts, benchmarks).
+
+Metrics: discord_outbox_wait_seconds_{class} (queue latency),
+discord_outbox_{send,edit}_seconds, discord_outbox_pending,
+discord_outbox_coalesced, discord_outbox_skipped, discord_outbox_errors.
+
+Env:
+  DISCORD_OUTBOX_CONCURRENCY   calls in flight across all channels (default 8)
+  DISCORD_EDIT_WINDOW          seconds a REFRESH edit waits for more (default 2)
+"""
+
+import asyncio
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from services import metrics
+
+logger = logging.getLogger("discord-outbox")
+
+OUTBOX_CONCURRENCY = int(os.getenv("DISCORD_OUTBOX_CONCURRENCY", "8"))
+EDIT_WINDOW        = float(os.getenv("DISCORD_EDIT_WINDOW", "2"))
+RENDER_CACHE_MAX   = 2048        # messages whose last render is remembered
+
+# Priority classes — lower goes first
+GO_LIVE = 0
+OFFLINE = 1
+REFRESH = 2
+DEALS   = 3
+
+CLASS_NAMES = {GO_LIVE: "go_live", OFFLINE: "offline", REFRESH: "refresh", DEALS: "deals"}
+
+# send / edit kwargs the render cache understands; anything else (files,
+# attachments, views) always goes out
+_RENDERED_FIELDS = ("content", "embed", "embeds")
+_VOLATILE_PARAMS = {"v"}         # cache-busting query params on image URLs
+
+
+# ──────────────────────────────────────────────────────────────
+# FINGERPRINTS
+# ──────────────────────────────────────────────────────────────
+
+def _canonical_url(url: Optional[str]) -> Optional[str]:
+    if not url:
+        return url
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k not in _VOLATILE_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def embed_fingerprint(embed) -> str:
+    """
+    Hash of what a discord.Embed shows, ignoring its timestamp, cache
+    busters on image URLs and the proxy / size data Discord adds to
+    fetched embeds — a built embed and the same embed read back from
+    the message fingerprint alike.
+    """
+    data = embed.to_dict()
+    for volatile in ("timestamp", "type", "video", "provider"):
+        data.pop(volatile, None)
+    for part in ("image", "thumbnail"):
+        if part in data:
+            data[part] = {"url": _canonical_url(data[part].get("url"))}
+    if "author" in data:
+        author = data["author"]
+        data["author"] = {
+            "name": author.get("name"), "url": author.get("url"),
+            "icon_url": _canonical_url(author.get("icon_url")),
+        }
+    if "footer" in data:
+        footer = data["footer"]
+        data["footer"] = {"text": footer.get("text"), "icon_url": _canonical_url(footer.get("icon_url"))}
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=12).hexdigest()
+
+
+def _render(kwargs: dict) -> Optional[dict]:
+    """{field: fingerprint} for send / edit kwargs, or None if not comparable."""
+    if any(key not in _RENDERED_FIELDS for key in kwargs):
+        return None
+    rendered = {}
+    for key, value in kwargs.items():
+        if key == "embed":
+            rendered[key] = embed_fingerprint(value) if value is not None else None
+        elif key == "embeds":
+            rendered[key] = tuple(embed_fingerprint(e) for e in value or ())
+        else:
+            rendered[key] = value
+    return rendered
+
+
+@dataclass(eq=False)
+class _Job:
+    kind:     str                 # "send" | "edit"
+    target:   Any                 # channel for send, message for edit
+    kwargs:   dict
+    priority: int
+    enqueued: float = field(default_factory=time.monotonic)
+    queued:   bool = False        # pushed to its lane (edits wait out EDIT_WINDOW first)
+    futures:  list = field(default_factory=list)
+    started:  bool = False
+    timer:    Optional[asyncio.TimerHandle] = None   # pending EDIT_WINDOW enqueue
+
+
+class _PriorityGate:
+    """A semaphore that wakes the most urgent waiter first."""
+
+    def __init__(self, limit: int):
+        self._free    = limit
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq     = itertools.count()
+
+    @asynccontextmanager
+    async def slot(self, priority: int):
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+        else:
+            fut = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    self._release()     # slot was handed to us — pass it on
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)    # slot moves straight to the waiter
+                return
+        self._free += 1
+
+
+class DiscordOutbox:
+
+    def __init__(self, concurrency: int = OUTBOX_CONCURRENCY, edit_window: float = EDIT_WINDOW):
+        self.edit_window = edit_window
+        self._gate    = _PriorityGate(concurrency)
+        self._seq     = itertools.count()
+        self._lanes:   dict[int, list[tuple[int, int, _Job]]] = {}
+        self._workers: dict[int, asyncio.Task] = {}
+        self._edits:   dict[int, _Job] = {}      # message id -> queued edit
+        self._rendered: OrderedDict[int, dict] = OrderedDict()   # message id -> last render
+        self._pending = 0
+
+    # ──────────────────────────────────────────────────────────
+    # PUBLIC API
+    # ──────────────────────────────────────────────────────────
+
+    async def send(self, channel, priority: int = GO_LIVE, **kwargs):
+        """channel.send(**kwargs), scheduled. Returns the sent Message."""
+        job = _Job("send", channel, kwargs, priority)
+        return await self._submit(channel.id, job)
+
+    async def edit(self, message, priority: int = REFRESH, **kwargs):
+        """message.edit(**kwargs), scheduled and coalesced per message."""
+        queued = self._edits.get(message.id)
+        if queued is not None and not queued.started:
+            # embed= and embeds= are exclusive — the newer one wins
+            if "embed" in kwargs:
+                queued.kwargs.pop("embeds", None)
+            if "embeds" in kwargs:
+                queued.kwargs.pop("embed", None)
+            queued.kwargs.update(kwargs)
+            metrics.inc("discord_outbox_coalesced")
+            if priority < queued.priority:
+                queued.priority = priority
+                if queued.queued:
+                    self._push(message.channel.id, queued)   # stale entry is skipped
+                elif priority < REFRESH:
+                    # Urgent now — stop waiting out the edit window
+                    queued.timer.cancel()
+                    self._enqueue(message.channel.id, queued)
+            return await self._wait(queued)
+
+        if self._unchanged(message.id, kwargs):
+            metrics.inc("discord_outbox_skipped")
+            return message
+
+        job = _Job("edit", message, kwargs, priority)
+        self._edits[message.id] = job
+        if priority >= REFRESH and self.edit_window > 0:
+            # Let the rest of a refresh burst merge in before queueing
+            return await self._submit(message.channel.id, job, delay=self.edit_window)
+        return await self._submit(message.channel.id, job)
+
+    def prime(self, message_id: int, **kwargs) -> None:
+        """Records what a message shows without sending — e.g. after a restart."""
+        if message_id not in self._rendered:
+            self._remember(message_id, kwargs)
+
+    def stats(self) -> dict:
+        return {"pending": self._pending, "lanes": len(self._workers)}
+
+    async def drain(self, timeout: float = 10.0) -> None:
+        """Waits for queued calls to go out; cancels what is left after `timeout`."""
+        if any(not job.queued for job in self._edits.values()):
+            await asyncio.sleep(self.edit_window)    # let windowed edits reach their lanes
+        workers = list(self._workers.values())
+        if not workers:
+            return
+        done, pending = await asyncio.wait(workers, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"Discord outbox drain timed out — {self._pending} call(s) dropped")
+
+    # ──────────────────────────────────────────────────────────
+    # RENDER CACHE
+    # ──────────────────────────────────────────────────────────
+
+    def _unchanged(self, message_id: int, kwargs: dict) -> bool:
+        """True if `kwargs` would leave the message looking as it does now."""
+        last = self._rendered.get(message_id)
+        rendered = _render(kwargs)
+        if last is None or rendered is None:
+            return False
+        return all(key in last and last[key] == value for key, value in rendered.items())
+
+    def _remember(self, message_id: int, kwargs: dict) -> None:
+        rendered = _render(kwargs)
+        if rendered is None:
+            self._rendered.pop(message_id, None)
+            return
+        last = self._rendered.pop(message_id, {})
+        if "embed" in rendered:
+            last.pop("embeds", None)
+        if "embeds" in rendered:
+            last.pop("embed", None)
+        last.update(rendered)
+        self._rendered[message_id] = last
+        while len(self._rendered) > RENDER_CACHE_MAX:
+            self._rendered.popitem(last=False)
+
+    # ──────────────────────────────────────────────────────────
+    # LANES
+    # ──────────────────────────────────────────────────────────
+
+    async def _submit(self, channel_id: int, job: _Job, delay: float = 0.0):
+        self._pending += 1
+        metrics.set_gauge("discord_outbox_pending", self._pending)
+        if delay:
+            job.timer = asyncio.get_running_loop().call_later(delay, self._enqueue, channel_id, job)
+        else:
+            self._enqueue(channel_id, job)
+        return await self._wait(job)
+
+    def _enqueue(self, channel_id: int, job: _Job) -> None:
+        job.queued = True
+        job.timer  = None
+        self._push(channel_id, job)
+        if channel_id not in self._workers:
+            self._workers[channel_id] = asyncio.create_task(
+                self._run_lane(channel_id), name=f"discord-outbox-{channel_id}"
+            )
+
+    async def _wait(self, job: _Job):
+        fut = asyncio.get_running_loop().create_future()
+        job.futures.append(fut)
+        return await fut
+
+    def _push(self, channel_id: int, job: _Job) -> None:
+        lane = self._lanes.setdefault(channel_id, [])
+        heapq.heappush(lane, (job.priority, next(self._seq), job))
+
+    async def _run_lane(self, channel_id: int) -> None:
+        lane = self._lanes[channel_id]
+        try:
+            while lane:
+                _, _, job = heapq.heappop(lane)
+                if job.started:
+                    continue
+                async with self._gate.slot(job.priority):
+                    await self._execute(job)
+        finally:
+            self._workers.pop(channel_id, None)
+            if not lane:
+                self._lanes.pop(channel_id, None)
+
+    async def _execute(self, job: _Job) -> None:
+        # Edits keep coalescing until here, so this sends the newest kwargs
+        job.started = True
+        if job.kind == "edit":
+            self._edits.pop(job.target.id, None)
+        self._pending -= 1
+        metrics.set_gauge("discord_outbox_pending", self._pending)
+
+        started = time.monotonic()
+        metrics.observe(
+            f"discord_outbox_wait_seconds_{CLASS_NAMES.get(job.priority, job.priority)}",
+            started - job.enqueued,
+        )
+        if job.kind == "edit" and self._unchanged(job.target.id, job.kwargs):
+            # Merged edits can end up back at what the message already shows
+            metrics.inc("discord_outbox_skipped")
+            for fut in job.futures:
+                if not fut.done():
+                    fut.set_result(job.target)
+            return
+        try:
+            call = job.target.send if job.kind == "send" else job.target.edit
+            result = await call(**job.kwargs)
+        except asyncio.CancelledError:
+            for fut in job.futures:
+                fut.cancel()
+            raise
+        except Exception as e:
+            metrics.inc("discord_outbox_errors")
+            for fut in job.futures:
+                if not fut.done():
+                    fut.set_exception(e)
+        else:
+            message_id = result.id if job.kind == "send" and result is not None else job.target.id
+            self._remember(message_id, job.kwargs)
+            for fut in job.futures:
+                if not fut.done():
+                    fut.set_result(result)
+        finally:
+            metrics.observe(f"discord_outbox_{job.kind}_seconds", time.monotonic() - started)
+
+
+# ──────────────────────────────────────────────────────────────
+# CALLER HELPERS
+# ──────────────────────────────────────────────────────────────
+
+def _outbox(bot) -> Optional[DiscordOutbox]:
+    return getattr(getattr(bot, "app_state", None), "discord_outbox", None)
+
+
+async def send(bot, channel, priority: int, **kwargs):
+    """channel.send through the bot's outbox, or directly without one."""
+    outbox = _outbox(bot)
+    if outbox is None:
+        return await channel.send(**kwargs)
+    return await outbox.send(channel, priority, **kwargs)
+
+
+async def edit(bot, message, priority: int, **kwargs):
+    """message.edit through the bot's outbox, or directly without one."""
+    outbox = _outbox(bot)
+    if outbox is None:
+        return await message.edit(**kwargs)
+    return await outbox.edit(message, priority, **kwargs)
@@ -1,19 +1,121 @@
+"""
+services/distributed_lock.py
+────────────────────────────────────────────────────────────────
+Redis lease lock with renewal, fencing tokens and safe release.
+
+The original lock was SET NX EX on acquire and a bare DEL on release:
+no way to extend it, and a holder that stalled past the TTL would
+delete the NEXT holder's lock on release.
+
+Now:
+  acquire()   SET key <nonce> NX PX ttl and, in the same script, INCR
+              key:fence — the returned fencing token grows with every
+              new holder, so work stamped with an older token can be
+              recognised as coming from a deposed holder
+  renew()     PEXPIRE only if the key still holds our nonce
+  release()   DEL only if the key still holds our nonce
+              (Lua compare-and-delete)
+
+All three are single Lua scripts, so each check-and-act is atomic on
+the Redis side. `redis` is a raw redis.asyncio client — RedisClient
+swallows errors, and a lock must tell "not acquired" from "Redis down".
+"""
+
+import logging
+import time
+import uuid
+from typing import Optional
+
+logger = logging.getLogger("distributed-lock")
+
+_ACQUIRE = """
+if redis.call('set', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return redis.call('incr', KEYS[2])
+end
+return 0
+"""
+
+_RENEW = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
 class DistributedLock:
 
-    def __init__(self, redis):
-        self.redis = redis
+    def __init__(self, redis, key: str, ttl: float = 60, owner: Optional[str] = None):
+        """
+        redis: redis.asyncio client
+        key:   lock key; the fencing counter lives at `{key}:fence`
+        ttl:   lease length in seconds
+        owner: human-readable holder id, stored in the key for debugging
+        """
+        self.redis     = redis
+        self.key       = key
+        self.fence_key = f"{key}:fence"
+        self.ttl       = ttl
+        self.owner     = owner or uuid.uuid4().hex[:12]
+
+        self.token: Optional[int] = None      # fencing token while held
+        self.valid_until = 0.0                # monotonic; lease end as seen locally
+        self._nonce: Optional[str] = None
+
+    @property
+    def held(self) -> bool:
+        """True while we hold an unexpired lease (by our own clock)."""
+        return self.token is not None and time.monotonic() < self.valid_until
 
-    async def acquire(self, key, ttl=60):
+    async def acquire(self) -> Optional[int]:
+        """The fencing token if acquired, None if someone else holds it."""
+        nonce   = f"{self.owner}:{uuid.uuid4().hex}"
+        started = time.monotonic()
+        token   = int(await self.redis.eval(
+            _ACQUIRE, 2, self.key, self.fence_key, nonce, int(self.ttl * 1000)
+        ))
+        if not token:
+            return None
+        self._nonce      = nonce
+        self.token       = token
+        # Measured from before the call: the lease can't outlive that
+        self.valid_until = started + self.ttl
+        return token
 
-        result = await self.redis.set(
-            key,
-            "1",
-            nx=True,
-            ex=ttl
-        )
+    async def renew(self) -> bool:
+        """Extends the lease. False means it was lost — stop acting on it."""
+        if self._nonce is None:
+            return False
+        started = time.monotonic()
+        ok = await self.redis.eval(_RENEW, 1, self.key, self._nonce, int(self.ttl * 1000))
+        if ok:
+            self.valid_until = started + self.ttl
+            return True
+        logger.warning(f"Lease {self.key} lost (token {self.token})")
+        self._forget()
+        return False
 
-        return result is True
+    async def release(self) -> bool:
+        """Deletes the lock if it is still ours. Safe to call when not held."""
+        if self._nonce is None:
+            return False
+        nonce = self._nonce
+        self._forget()
+        return bool(await self.redis.eval(_RELEASE, 1, self.key, nonce))
 
-    async def release(self, key):
+    async def current_token(self) -> Optional[int]:
+        """The newest fencing token handed out for this key."""
+        value = await self.redis.get(self.fence_key)
+        return int(value) if value is not None else None
 
-        await self.redis.delete(key)
+    def _forget(self) -> None:
+        self._nonce      = None
+        self.token       = None
+        self.valid_until = 0.0
@@ -0,0 +1,138 @@
+"""
+services/eventsub_dedup.py
+────────────────────────────────────────────────────────────────
+EventSub message-id deduplication.
+
+Twitch delivers at-least-once and retries any webhook it didn't see a
+timely 2xx for, so the same Twitch-Eventsub-Message-Id can arrive more
+than once. A retry must be acked without re-running the handler (and
+its Twitch API + Discord calls).
+
+Two tiers:
+  1. In-process LRU with TTL — O(1), bounded size, answers most
+     retries without leaving the event loop.
+  2. Redis SET NX EX — shared across replicas, so a retry that lands
+     on a different instance is still recognised.
+
+Redis errors fail open (treated as "new") — a rare duplicate post is
+better than dropping a go-live.
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from services import metrics
+
+logger = logging.getLogger("eventsub-dedup")
+
+DEDUP_TTL      = 600      # 10 minutes — matches Twitch's replay window
+DEDUP_MAX_SIZE = 10_000   # local entries before the oldest are evicted
+
+
+def _redis_key(msg_id: str) -> str:
+    return f"eventsub:msg:{msg_id}"
+
+
+class MessageDeduplicator:
+
+    def __init__(
+        self,
+        redis=None,
+        ttl: int = DEDUP_TTL,
+        max_size: int = DEDUP_MAX_SIZE,
+    ):
+        """
+        redis: services.redis_client.RedisClient, or None for local-only.
+        """
+        self.redis    = redis
+        self.ttl      = ttl
+        self.max_size = max_size
+
+        # msg_id -> expiry (monotonic). Insertion order == expiry order
+        # because the TTL is constant, so the oldest entry is always first.
+        self._seen: OrderedDict[str, float] = OrderedDict()
+
+        self.hits   = 0
+        self.misses = 0
+
+    # ──────────────────────────────────────────────────────────
+    # LOCAL TIER
+    # ──────────────────────────────────────────────────────────
+
+    def _evict(self, now: float) -> None:
+        seen = self._seen
+        while seen:
+            msg_id, expiry = next(iter(seen.items()))
+            if expiry > now and len(seen) <= self.max_size:
+                break
+            seen.popitem(last=False)
+
+    def _seen_locally(self, msg_id: str, now: float) -> bool:
+        expiry = self._seen.get(msg_id)
+        return expiry is not None and expiry > now
+
+    def _remember(self, msg_id: str, now: float) -> None:
+        self._seen[msg_id] = now + self.ttl
+        self._seen.move_to_end(msg_id)
+        self._evict(now)
+
+    # ──────────────────────────────────────────────────────────
+    # PUBLIC API
+    # ──────────────────────────────────────────────────────────
+
+    def seen_recently(self, msg_id: str) -> bool:
+        """
+        Local-tier lookup only — no I/O, and it never records the id, so
+        it is safe to call before the request's signature is verified.
+        """
+        if self._seen_locally(msg_id, time.monotonic()):
+            self._hit()
+            return True
+        return False
+
+    async def claim(self, msg_id: str) -> bool:
+        """
+        Returns True the first time a message id is seen (caller should
+        process it), False for a duplicate (caller should just ack).
+        """
+        now = time.monotonic()
+
+        if self._seen_locally(msg_id, now):
+            self._hit()
+            return False
+
+        self._remember(msg_id, now)
+
+        if self.redis:
+            created: Optional[bool] = await self.redis.set_nx(
+                _redis_key(msg_id), "1", ttl=self.ttl
+            )
+            if created is False:
+                self._hit()
+                return False
+
+        self.misses += 1
+        metrics.inc("eventsub_dedup_misses")
+        return True
+
+    async def forget(self, msg_id: str) -> None:
+        """
+        Un-claims a message id — used when we answered non-2xx after
+        claiming it (e.g. queue full), so Twitch's retry is processed.
+        """
+        self._seen.pop(msg_id, None)
+        if self.redis:
+            await self.redis.delete(_redis_key(msg_id))
+
+    def _hit(self) -> None:
+        self.hits += 1
+        metrics.inc("eventsub_dedup_hits")
+
+    def stats(self) -> dict:
+        return {
+            "hits":   self.hits,
+            "misses": self.misses,
+            "size":   len(self._seen),
+        }
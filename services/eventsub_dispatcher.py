@@ -0,0 +1,288 @@
+"""
+services/eventsub_dispatcher.py
+────────────────────────────────────────────────────────────────
+Bounded worker pool for EventSub notifications.
+
+handle_eventsub used to call loop.create_task() for every
+notification, with no upper bound. A burst of go-lives (or Twitch
+redelivering a backlog after an outage) piled up unbounded tasks,
+each doing HTTP, Redis and DB work, and starved the gateway heartbeat.
+
+Now the webhook only enqueues. A fixed number of workers drain the
+queue, and when the queue is full submit() returns False so the
+caller can answer 503 — Twitch retries the delivery later.
+
+Ordering: every broadcaster gets a serial lane. A worker that picks
+up a notification for a broadcaster whose lane is already busy parks
+it on that lane instead of running it, and the lane owner runs it
+next. So online → offline → online flaps and raid → offline pairs for
+one streamer execute in arrival order, while different streamers
+still run in parallel. A lane is dropped as soon as it drains, so
+memory is bounded by the number of broadcasters with work in flight.
+
+Durability: jobs may carry a journal offset (services.eventsub_journal).
+The offset is acked once the handler has run — successfully or not —
+so the journal checkpoint only moves past work that actually finished.
+Jobs dropped on shutdown are never acked and are replayed next start.
+
+Env:
+  EVENTSUB_WORKERS      number of worker tasks (default 4)
+  EVENTSUB_QUEUE_SIZE   max queued notifications (default 500)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+
+from services import helix_ratelimit, metrics
+
+logger = logging.getLogger("eventsub-dispatcher")
+
+DEFAULT_WORKERS    = int(os.getenv("EVENTSUB_WORKERS", "4"))
+DEFAULT_QUEUE_SIZE = int(os.getenv("EVENTSUB_QUEUE_SIZE", "500"))
+
+# handler(bot, event) — same signature as events/stream_events handlers
+Handler = Callable[[object, dict], Awaitable[None]]
+
+
+@dataclass
+class _Job:
+    sub_type:    str
+    event:       dict
+    offset:      Optional[int] = None   # journal offset, if journaled
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def lane_key(self) -> str:
+        # channel.raid is subscribed as the FROM broadcaster, so it shares
+        # a lane with that streamer's online/offline events
+        return str(
+            self.event.get("broadcaster_user_id")
+            or self.event.get("from_broadcaster_user_id")
+            or self.event.get("broadcaster_user_login")
+            or ""
+        )
+
+
+class EventSubDispatcher:
+
+    def __init__(
+        self,
+        bot,
+        handlers: dict[str, Handler],
+        workers: int = DEFAULT_WORKERS,
+        max_queue: int = DEFAULT_QUEUE_SIZE,
+        journal=None,
+    ):
+        """
+        journal: services.eventsub_journal.EventSubJournal to ack
+                 offsets against, or None.
+        """
+        self.bot       = bot
+        self.handlers  = handlers
+        self.workers   = max(1, workers)
+        self.max_queue = max_queue
+        self.journal   = journal
+
+        # The queue itself is unbounded — the bound is enforced on
+        # _pending, which also counts jobs parked on a busy lane.
+        self._queue: asyncio.Queue[_Job]   = asyncio.Queue()
+        self._lanes: dict[str, deque[_Job]] = {}
+        self._tasks: list[asyncio.Task]    = []
+        self._pending   = 0
+        self._idle      = asyncio.Event()
+        self._idle.set()
+        self._accepting = False
+
+    # ──────────────────────────────────────────────────────────
+    # LIFECYCLE
+    # ──────────────────────────────────────────────────────────
+
+    def start(self) -> None:
+        if self._tasks:
+            logger.warning("EventSubDispatcher already running — ignoring start()")
+            return
+
+        self._accepting = True
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"eventsub-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(
+            "EventSubDispatcher started",
+            extra={"extra_data": {
+                "workers":   self.workers,
+                "max_queue": self.max_queue,
+            }},
+        )
+
+    async def drain(self, timeout: float = 20.0) -> None:
+        """
+        Stops accepting new notifications, waits (up to `timeout`) for
+        the queued ones to finish, then cancels the workers.
+        Called from the SIGTERM path in main.main.
+        """
+        self._accepting = False
+        pending = self._pending
+
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "EventSubDispatcher drain timed out — dropping remaining notifications",
+                extra={"extra_data": {"remaining": self._pending}},
+            )
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        logger.info(
+            "EventSubDispatcher drained",
+            extra={"extra_data": {"pending_at_shutdown": pending}},
+        )
+
+    # ──────────────────────────────────────────────────────────
+    # INTAKE
+    # ──────────────────────────────────────────────────────────
+
+    def has_capacity(self) -> bool:
+        """
+        True if submit() would currently accept a notification. Lets the
+        webhook answer 503 before spending an fsync on the journal.
+        """
+        return self._accepting and self._pending < self.max_queue
+
+    def submit(self, sub_type: str, event: dict, offset: Optional[int] = None) -> bool:
+        """
+        Enqueues a notification without blocking.
+        Returns False if the dispatcher is shutting down or the queue
+        is full — the webhook should then answer 503 so Twitch retries.
+        """
+        if not self._accepting:
+            metrics.inc("eventsub_dispatch_rejected")
+            return False
+
+        if sub_type not in self.handlers:
+            logger.debug(f"No handler registered for {sub_type} — ignoring")
+            self._ack(offset)
+            return True
+
+        if self._pending >= self.max_queue:
+            metrics.inc("eventsub_dispatch_rejected")
+            logger.warning(
+                "EventSub queue full — rejecting notification",
+                extra={"extra_data": {
+                    "type":  sub_type,
+                    "depth": self._pending,
+                }},
+            )
+            return False
+
+        self._pending += 1
+        self._idle.clear()
+        self._queue.put_nowait(_Job(sub_type, event, offset))
+
+        metrics.inc("eventsub_dispatch_accepted")
+        metrics.set_gauge("eventsub_queue_depth", self._pending)
+        return True
+
+    # ──────────────────────────────────────────────────────────
+    # WORKERS
+    # ──────────────────────────────────────────────────────────
+
+    async def _worker(self, idx: int) -> None:
+        while True:
+            job  = await self._queue.get()
+            key  = job.lane_key
+            lane = self._lanes.get(key)
+
+            if lane is not None:
+                # Another worker is running this broadcaster — queue
+                # behind it so its events stay in arrival order.
+                lane.append(job)
+                metrics.set_gauge("eventsub_lanes_active", len(self._lanes))
+                continue
+
+            self._lanes[key] = lane = deque([job])
+            metrics.set_gauge("eventsub_lanes_active", len(self._lanes))
+            try:
+                while lane:
+                    await self._run(lane.popleft())
+            finally:
+                # Evict the idle lane; anything still parked on it (only
+                # possible on cancellation) is dropped with it.
+                self._done(len(lane))
+                del self._lanes[key]
+                metrics.set_gauge("eventsub_lanes_active", len(self._lanes))
+
+    def _done(self, count: int = 1) -> None:
+        self._pending -= count
+        metrics.set_gauge("eventsub_queue_depth", self._pending)
+        if self._pending <= 0:
+            self._idle.set()
+
+    def _ack(self, offset: Optional[int]) -> None:
+        if self.journal is not None and offset is not None:
+            self.journal.ack(offset)
+
+    async def _run(self, job: _Job) -> None:
+        metrics.observe(
+            "eventsub_queue_wait_seconds",
+            time.monotonic() - job.enqueued_at,
+        )
+        handler = self.handlers[job.sub_type]
+        started = time.monotonic()
+        try:
+            # Go-live posts outrank background jobs for Helix budget
+            with helix_ratelimit.priority(helix_ratelimit.LIVE):
+                await handler(self.bot, job.event)
+            metrics.inc("eventsub_dispatch_processed")
+        except asyncio.CancelledError:
+            # Not acked — the journal replays it on the next start
+            raise
+        except Exception as e:
+            metrics.inc("eventsub_dispatch_failed")
+            login = (
+                job.event.get("broadcaster_user_login")
+                or job.event.get("from_broadcaster_user_login", "unknown")
+            )
+            logger.error(
+                f"Dispatch error for {login}: {e}",
+                extra={"extra_data": {"type": job.sub_type}},
+                exc_info=True,
+            )
+        finally:
+            self._done()
+            metrics.observe(
+                "eventsub_handler_seconds",
+                time.monotonic() - started,
+            )
+        # Reached for success and handler errors alike — a failing event
+        # is not retried forever on every restart
+        self._ack(job.offset)
+
+    # ──────────────────────────────────────────────────────────
+    # INTROSPECTION
+    # ──────────────────────────────────────────────────────────
+
+    def stats(self) -> dict:
+        snapshot = metrics.get_metrics()
+        waits    = snapshot.get("eventsub_queue_wait_seconds_count", 0)
+        return {
+            "depth":         self._pending,
+            "max_queue":     self.max_queue,
+            "workers":       self.workers,
+            "lanes":         len(self._lanes),
+            "accepted":      snapshot.get("eventsub_dispatch_accepted", 0),
+            "rejected":      snapshot.get("eventsub_dispatch_rejected", 0),
+            "processed":     snapshot.get("eventsub_dispatch_processed", 0),
+            "failed":        snapshot.get("eventsub_dispatch_failed", 0),
+            "wait_avg_s":    (snapshot.get("eventsub_queue_wait_seconds_sum", 0.0) / waits) if waits else 0.0,
+            "wait_max_s":    snapshot.get("eventsub_queue_wait_seconds_max", 0.0),
+        }
@@ -10,26 +10,81 @@ Improvements over original:
 - Config validated once at construction, not inside every method
 - Also subscribes to channel.raid (as the FROM broadcaster) so raids can
   be surfaced in that streamer's "stream ended" post
+
+Transport (EVENTSUB_TRANSPORT):
+  webhook    (default) Twitch POSTs to callback_url / eventsub_server
+  websocket  subscriptions are bound to the session id held by
+             services/eventsub_websocket.EventSubWebSocket. Twitch only
+             accepts WebSocket subscriptions made with a USER access
+             token, so TWITCH_ACCESS_TOKEN must be one in this mode.
+
+Tokens: webhook mode uses the shared app token from
+services/twitch_auth.TwitchAuth (AppState.twitch_auth); websocket mode
+uses the static user token from TWITCH_ACCESS_TOKEN.
 """
 
+import asyncio
 import logging
 import os
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 import aiohttp
+import orjson
+
+from services import metrics
+from services.helix_ratelimit import HelixRateLimiter
+from services.twitch_auth import TwitchAuth
 
 logger = logging.getLogger("eventsub")
 
 TWITCH_EVENTSUB_URL = "https://api.twitch.tv/helix/eventsub/subscriptions"
+TRANSPORTS          = ("webhook", "websocket")
+
+SUBSCRIBE_CONCURRENCY = int(os.getenv("EVENTSUB_SUBSCRIBE_CONCURRENCY", "10"))
+RATE_LIMIT_RETRIES    = 3      # 429s tolerated per request before giving up
+COST_WARN_RATIO       = 0.9    # warn when total_cost reaches 90% of the cap
+
+
+class SubscriptionListError(RuntimeError):
+    """A page of GET /eventsub/subscriptions could not be fetched."""
 
 
 class EventSubManager:
 
-    def __init__(self, session: aiohttp.ClientSession):
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        auth: Optional[TwitchAuth] = None,
+        ratelimit: Optional[HelixRateLimiter] = None,
+    ):
+        """
+        auth:      shared app token service (webhook transport)
+        ratelimit: the limiter of TwitchAPI, shared when both spend the
+                   same app token's bucket. Ignored for websocket, whose
+                   user token has a bucket of its own.
+        """
+        shared_token   = auth is not None
         self.session   = session
         self.client_id = os.getenv("TWITCH_CLIENT_ID")
         self.token     = os.getenv("TWITCH_ACCESS_TOKEN")
         self.secret    = os.getenv("TWITCH_EVENTSUB_SECRET", "supersecret")
+        self.transport = os.getenv("EVENTSUB_TRANSPORT", "webhook").strip().lower()
+
+        # App token for webhooks; WebSocket subscriptions need the user token
+        if self.transport == "webhook" and auth is None and os.getenv("TWITCH_CLIENT_SECRET"):
+            auth = TwitchAuth(session, client_id=self.client_id)
+        self.auth = auth if self.transport == "webhook" else None
+
+        # Set by EventSubWebSocket on session_welcome (websocket transport)
+        self.ws_session_id: Optional[str] = None
+
+        # Helix budget + subscription cost, from response headers/bodies
+        self.ratelimit      = (
+            ratelimit if ratelimit is not None and shared_token and self.auth is not None
+            else HelixRateLimiter("eventsub")
+        )
+        self.total_cost     = 0
+        self.max_total_cost = 0
 
         # Derive callback URL — used by monitor.py
         self.callback_url = (
@@ -44,97 +99,116 @@ class EventSubManager:
             )
         )
 
-        if not self.client_id or not self.token:
+        if not self.client_id or not (self.token or self.auth):
             raise RuntimeError(
-                "TWITCH_CLIENT_ID and TWITCH_ACCESS_TOKEN must be set "
-                "before creating EventSubManager"
+                "TWITCH_CLIENT_ID and TWITCH_ACCESS_TOKEN (or TWITCH_CLIENT_SECRET) "
+                "must be set before creating EventSubManager"
             )
 
+        if self.transport not in TRANSPORTS:
+            raise RuntimeError(
+                f"EVENTSUB_TRANSPORT must be one of {TRANSPORTS}, got {self.transport!r}"
+            )
+
+    @property
+    def can_subscribe(self) -> bool:
+        """
+        True once subscriptions can be created: a callback URL for
+        webhooks, a live session for WebSocket.
+        """
+        if self.transport == "websocket":
+            return self.ws_session_id is not None
+        return bool(self.callback_url)
+
     # ──────────────────────────────────────────────────────────
     # INTERNAL HELPERS
     # ──────────────────────────────────────────────────────────
 
-    @property
-    def _headers(self) -> dict:
+    async def _auth_headers(self) -> dict:
+        if self.auth:
+            self.token = await self.auth.get_token()
         return {
             "Client-ID":     self.client_id,
             "Authorization": f"Bearer {self.token}",
             "Content-Type":  "application/json",
         }
 
-    async def _existing_subscriptions(self, broadcaster_id: str, _retry: bool = True) -> list[str]:
+    def _transport_payload(self, callback_url: Optional[str]) -> dict:
+        if self.transport == "websocket":
+            return {"method": "websocket", "session_id": self.ws_session_id}
+        return {
+            "method":   "webhook",
+            "callback": callback_url or self.callback_url,
+            "secret":   self.secret,
+        }
+
+    def matches_transport(self, sub: dict) -> bool:
+        # A webhook subscription does not deliver to our socket (and vice
+        # versa), nor does one bound to a previous WebSocket session
+        transport = sub.get("transport", {})
+        if transport.get("method", "webhook") != self.transport:
+            return False
+        if self.transport == "websocket":
+            return transport.get("session_id") == self.ws_session_id
+        return True
+
+    @staticmethod
+    def wanted_conditions(broadcaster_user_id: str) -> dict[str, Optional[dict]]:
         """
-        Returns a list of subscription types already active for this broadcaster.
-        Prevents duplicate subscriptions. Auto-refreshes token on 401.
+        event_type -> condition override (None = default broadcaster_user_id)
+        for everything we subscribe per streamer.
         """
-        try:
-            async with self.session.get(
-                TWITCH_EVENTSUB_URL,
-                headers=self._headers,
-                params={"broadcaster_user_id": broadcaster_id},
-            ) as resp:
-                if resp.status == 401 and _retry:
-                    logger.warning("Got 401 on existing_subscriptions — refreshing token")
-                    if await self._refresh_token():
-                        return await self._existing_subscriptions(broadcaster_id, _retry=False)
-
-                if resp.status != 200:
-                    body = await resp.text()
-                    logger.warning(
-                        f"Could not fetch existing subscriptions — "
-                        f"HTTP {resp.status}: {body[:200]}"
-                    )
-                    return []
+        return {
+            "stream.online":  None,
+            "stream.offline": None,
+            "channel.update": None,
+            "channel.raid":   {"from_broadcaster_user_id": broadcaster_user_id},
+        }
 
-                data = await resp.json()
-                return [
-                    sub["type"]
-                    for sub in data.get("data", [])
-                    if sub.get("status") in ("enabled", "webhook_callback_verification_pending")
-                ]
+    def is_active(self, sub: dict) -> bool:
+        """
+        True for a subscription that delivers to THIS bot's current
+        endpoint — right transport, and for webhooks the current callback.
+        """
+        if sub.get("status") not in ("enabled", "webhook_callback_verification_pending"):
+            return False
+        if not self.matches_transport(sub):
+            return False
+        if self.transport == "webhook" and self.callback_url:
+            return sub.get("transport", {}).get("callback") == self.callback_url
+        return True
 
-        except Exception as e:
-            logger.exception(f"Error fetching existing subscriptions: {e}")
+    async def _existing_subscriptions(self, broadcaster_id: str) -> list[str]:
+        """
+        Returns a list of subscription types already active for this broadcaster.
+        Prevents duplicate subscriptions.
+        """
+        try:
+            return [
+                sub["type"]
+                async for sub in self.iter_subscriptions(user_id=broadcaster_id)
+                if sub.get("status") in ("enabled", "webhook_callback_verification_pending")
+                and self.matches_transport(sub)
+            ]
+        except SubscriptionListError as e:
+            logger.warning(f"Could not fetch existing subscriptions — {e}")
             return []
 
     async def _refresh_token(self) -> bool:
         """
-        Fetches a new App Access Token using client credentials.
-        Called automatically when a 401 is received.
-        Returns True if token was refreshed successfully.
+        Replaces a token Twitch rejected with 401. The shared TwitchAuth
+        refreshes once no matter how many requests saw the same 401.
+        Returns True if there is a new token to retry with.
         """
-        client_secret = os.getenv("TWITCH_CLIENT_SECRET")
-        if not self.client_id or not client_secret:
+        if not self.auth:
             logger.error(
-                "Cannot refresh token — TWITCH_CLIENT_ID or "
-                "TWITCH_CLIENT_SECRET not set"
+                "EventSub token rejected — the static TWITCH_ACCESS_TOKEN "
+                "cannot be refreshed automatically"
             )
             return False
-
         try:
-            async with self.session.post(
-                "https://id.twitch.tv/oauth2/token",
-                params={
-                    "client_id":     self.client_id,
-                    "client_secret": client_secret,
-                    "grant_type":    "client_credentials",
-                },
-            ) as resp:
-                if resp.status != 200:
-                    body = await resp.text()
-                    logger.error(f"Token refresh failed — HTTP {resp.status}: {body[:200]}")
-                    return False
-
-                data  = await resp.json()
-                token = data.get("access_token")
-                if not token:
-                    logger.error("Token refresh returned no access_token")
-                    return False
-
-                self.token = token
-                logger.info("✅ Twitch App Access Token refreshed automatically")
-                return True
-
+            self.token = await self.auth.invalidate(self.token)
+            return True
         except Exception as e:
             logger.exception(f"Token refresh error: {e}")
             return False
@@ -143,117 +217,274 @@ class EventSubManager:
         self,
         event_type: str,
         broadcaster_user_id: str,
-        callback_url: str,
+        callback_url: Optional[str],
         condition: Optional[dict] = None,
         _retry: bool = True,
     ) -> bool:
         """
         Creates a single EventSub subscription.
-        Automatically refreshes token on 401 and retries once.
+        Automatically refreshes token on 401 and retries once; waits for
+        the rate-limit reset and retries on 429. A 409 (already exists)
+        counts as success.
         `condition` overrides the default {"broadcaster_user_id": ...} —
         needed for event types like channel.raid that key off a
         differently-named condition field.
         Returns True on success.
         """
+        if not self.can_subscribe:
+            logger.warning(
+                f"EventSub subscribe skipped — no {self.transport} endpoint yet "
+                f"(type={event_type} broadcaster={broadcaster_user_id})"
+            )
+            return False
+
         payload = {
             "type":    event_type,
             "version": "1",
             "condition": condition or {"broadcaster_user_id": broadcaster_user_id},
-            "transport": {
-                "method":   "webhook",
-                "callback": callback_url,
-                "secret":   self.secret,
-            },
+            "transport": self._transport_payload(callback_url),
         }
 
         try:
-            async with self.session.post(
-                TWITCH_EVENTSUB_URL,
-                headers=self._headers,
-                json=payload,
-            ) as resp:
-                text = await resp.text()
-
-                # Auto-refresh token on 401 and retry once
-                if resp.status == 401 and _retry:
-                    logger.warning("Got 401 on subscribe — refreshing token and retrying")
-                    if await self._refresh_token():
-                        return await self._subscribe(
-                            event_type, broadcaster_user_id, callback_url,
-                            condition=condition, _retry=False,
+            for _ in range(RATE_LIMIT_RETRIES + 1):
+                await self.ratelimit.acquire()
+                async with self.session.post(
+                    TWITCH_EVENTSUB_URL,
+                    headers=await self._auth_headers(),
+                    json=payload,
+                ) as resp:
+                    self.ratelimit.update(resp.headers)
+                    text = await resp.text()
+
+                    if resp.status == 429:
+                        self.ratelimit.exhausted()
+                        logger.warning(f"Got 429 on subscribe ({event_type}) — waiting for reset")
+                        continue
+
+                    # Auto-refresh token on 401 and retry once
+                    if resp.status == 401 and _retry:
+                        logger.warning("Got 401 on subscribe — refreshing token and retrying")
+                        if await self._refresh_token():
+                            return await self._subscribe(
+                                event_type, broadcaster_user_id, callback_url,
+                                condition=condition, _retry=False,
+                            )
+
+                    if resp.status == 409:
+                        logger.info(
+                            f"EventSub subscription already exists — "
+                            f"type={event_type} broadcaster={broadcaster_user_id}"
                         )
+                        return True
 
-                if resp.status >= 300:
-                    logger.error(
-                        f"EventSub subscribe failed — "
-                        f"type={event_type} broadcaster={broadcaster_user_id} "
-                        f"HTTP {resp.status}: {text[:300]}"
+                    if resp.status >= 300:
+                        logger.error(
+                            f"EventSub subscribe failed — "
+                            f"type={event_type} broadcaster={broadcaster_user_id} "
+                            f"HTTP {resp.status}: {text[:300]}"
+                        )
+                        return False
+
+                    self._track_cost(orjson.loads(text))
+                    logger.info(
+                        "EventSub subscribed",
+                        extra={"extra_data": {
+                            "type":        event_type,
+                            "broadcaster": broadcaster_user_id,
+                            "total_cost":  self.total_cost,
+                        }},
                     )
-                    return False
+                    return True
 
-                logger.info(
-                    "EventSub subscribed",
-                    extra={"extra_data": {
-                        "type":        event_type,
-                        "broadcaster": broadcaster_user_id,
-                    }},
-                )
-                return True
+            logger.error(f"EventSub subscribe gave up after repeated 429s ({event_type})")
+            return False
 
         except Exception as e:
             logger.exception(f"EventSub request error ({event_type}): {e}")
             return False
 
+    def _track_cost(self, data: dict) -> None:
+        """
+        Records total_cost / max_total_cost from a subscriptions response.
+        Creating subscriptions starts failing once the cap is reached.
+        """
+        if "total_cost" not in data:
+            return
+        self.total_cost     = data.get("total_cost", 0)
+        self.max_total_cost = data.get("max_total_cost", self.max_total_cost)
+        metrics.set_gauge("eventsub_total_cost", self.total_cost)
+        metrics.set_gauge("eventsub_max_total_cost", self.max_total_cost)
+        if self.max_total_cost and self.total_cost >= COST_WARN_RATIO * self.max_total_cost:
+            logger.warning(
+                "EventSub subscription cost close to cap",
+                extra={"extra_data": {
+                    "total_cost":     self.total_cost,
+                    "max_total_cost": self.max_total_cost,
+                }},
+            )
+
     # ──────────────────────────────────────────────────────────
     # PUBLIC API
     # ──────────────────────────────────────────────────────────
 
-    async def list_subscriptions(self) -> list:
+    async def iter_subscriptions(
+        self,
+        status: Optional[str] = None,
+        type: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> AsyncIterator[dict]:
         """
-        Returns all active EventSub subscriptions from Twitch.
-        Used by monitor.py to audit which broadcasters are subscribed.
+        Yields every subscription on the account, one page (≤100) at a
+        time, following pagination.cursor — memory stays flat however
+        many there are.
+
+        Helix accepts only ONE filter per request, so the most selective
+        one given (user_id, then type, then status) is sent to Twitch and
+        any others are applied here.
+
+        Raises SubscriptionListError if a page cannot be fetched, so
+        callers never mistake a truncated listing for the full one.
+        """
+        server_filter = (
+            {"user_id": user_id} if user_id else
+            {"type": type}       if type else
+            {"status": status}   if status else
+            {}
+        )
+        params    = dict(server_filter)
+        refreshed = False
+        throttled = 0
+
+        while True:
+            await self.ratelimit.acquire()
+            try:
+                async with self.session.get(
+                    TWITCH_EVENTSUB_URL,
+                    headers=await self._auth_headers(),
+                    params=params,
+                ) as resp:
+                    self.ratelimit.update(resp.headers)
+                    if resp.status == 429 and throttled < RATE_LIMIT_RETRIES:
+                        throttled += 1
+                        self.ratelimit.exhausted()
+                        continue
+                    if resp.status == 401 and not refreshed:
+                        refreshed = True
+                        if await self._refresh_token():
+                            continue
+                    if resp.status != 200:
+                        body = await resp.text()
+                        raise SubscriptionListError(f"HTTP {resp.status}: {body[:200]}")
+                    data = await resp.json()
+            except aiohttp.ClientError as e:
+                raise SubscriptionListError(str(e)) from e
+
+            self._track_cost(data)
+            for sub in data.get("data", []):
+                if status and sub.get("status") != status:
+                    continue
+                if type and sub.get("type") != type:
+                    continue
+                if user_id and user_id not in (sub.get("condition") or {}).values():
+                    continue
+                yield sub
+
+            cursor = (data.get("pagination") or {}).get("cursor")
+            if not cursor:
+                return
+            params = {**server_filter, "after": cursor}
+
+    async def list_subscriptions(self, status: Optional[str] = None) -> list:
+        """
+        Returns all EventSub subscriptions from Twitch (every page), or
+        [] if the listing fails.
         """
         try:
-            async with self.session.get(
-                TWITCH_EVENTSUB_URL,
-                headers=self._headers,
-            ) as resp:
-                if resp.status != 200:
-                    body = await resp.text()
-                    logger.warning(
-                        f"list_subscriptions failed — HTTP {resp.status}: {body[:200]}"
-                    )
-                    return []
-                data = await resp.json()
-                subs = data.get("data", [])
-                logger.info(f"list_subscriptions: {len(subs)} active subscription(s)")
-                return subs
-        except Exception as e:
-            logger.exception(f"list_subscriptions error: {e}")
+            subs = [sub async for sub in self.iter_subscriptions(status=status)]
+        except SubscriptionListError as e:
+            logger.warning(f"list_subscriptions failed — {e}")
             return []
+        logger.info(f"list_subscriptions: {len(subs)} subscription(s)")
+        return subs
+
+    async def subscription_index(self, status: Optional[str] = None) -> dict[str, dict[str, str]]:
+        """
+        broadcaster_id -> {event_type: status}, built in one streaming
+        pass. Where one type has several subscriptions, "enabled" wins.
+        Raises SubscriptionListError like iter_subscriptions.
+        """
+        index: dict[str, dict[str, str]] = {}
+        async for sub in self.iter_subscriptions(status=status):
+            condition = sub.get("condition") or {}
+            uid = condition.get("broadcaster_user_id") or condition.get("from_broadcaster_user_id")
+            if not uid:
+                continue
+            types = index.setdefault(uid, {})
+            if types.get(sub["type"]) != "enabled":
+                types[sub["type"]] = sub.get("status", "")
+        return index
+
+    async def subscribe(
+        self,
+        event_type: str,
+        broadcaster_user_id: str,
+        condition: Optional[dict] = None,
+    ) -> bool:
+        """
+        Creates one subscription on the configured transport.
+        Used by services/eventsub_revocation.py to restore a revoked one.
+        """
+        return await self._subscribe(
+            event_type, broadcaster_user_id, self.callback_url, condition=condition,
+        )
+
+    async def subscribe_many(
+        self,
+        items: list[tuple[str, str, Optional[dict]]],
+        concurrency: int = SUBSCRIBE_CONCURRENCY,
+    ) -> list[bool]:
+        """
+        Creates many subscriptions — (event_type, broadcaster_user_id,
+        condition) each — with at most `concurrency` requests in flight,
+        paced by the Helix rate-limit headers. Results are in input order.
+        """
+        sem = asyncio.Semaphore(concurrency)
+
+        async def _one(event_type: str, broadcaster_user_id: str, condition: Optional[dict]) -> bool:
+            async with sem:
+                return await self.subscribe(event_type, broadcaster_user_id, condition=condition)
+
+        return list(await asyncio.gather(*(_one(*item) for item in items)))
+
+    async def delete_many(
+        self,
+        subscription_ids: list[str],
+        concurrency: int = SUBSCRIBE_CONCURRENCY,
+    ) -> list[bool]:
+        """delete_subscription for many ids, bounded like subscribe_many."""
+        sem = asyncio.Semaphore(concurrency)
+
+        async def _one(subscription_id: str) -> bool:
+            async with sem:
+                return await self.delete_subscription(subscription_id)
+
+        return list(await asyncio.gather(*(_one(i) for i in subscription_ids)))
 
     async def ensure_subscriptions(
         self,
         broadcaster_user_id: str,
-        callback_url: str,
+        callback_url: Optional[str] = None,
     ) -> None:
         """
         Subscribes to stream.online, stream.offline, channel.update, and
         channel.raid for the given broadcaster — skipping any that already
         exist. channel.raid is subscribed as the FROM broadcaster (we want
         to know who THIS streamer raided, not who raided them).
+        `callback_url` is ignored for the websocket transport.
         """
         existing = await self._existing_subscriptions(broadcaster_user_id)
 
-        # event_type -> condition override (None = default broadcaster_user_id)
-        wanted: dict[str, Optional[dict]] = {
-            "stream.online":  None,
-            "stream.offline": None,
-            "channel.update": None,
-            "channel.raid":   {"from_broadcaster_user_id": broadcaster_user_id},
-        }
-
-        for event_type, condition in wanted.items():
+        for event_type, condition in self.wanted_conditions(broadcaster_user_id).items():
             if event_type in existing:
                 logger.info(
                     f"Subscription already active, skipping",
@@ -266,16 +497,24 @@ class EventSubManager:
 
             await self._subscribe(event_type, broadcaster_user_id, callback_url, condition=condition)
 
-    async def delete_subscription(self, subscription_id: str) -> None:
-        """Removes a specific subscription by ID."""
+    async def delete_subscription(self, subscription_id: str) -> bool:
+        """Removes a specific subscription by ID. Returns True on success."""
         try:
-            async with self.session.delete(
-                f"{TWITCH_EVENTSUB_URL}/{subscription_id}",
-                headers=self._headers,
-            ) as resp:
-                if resp.status == 204:
-                    logger.info(f"Subscription deleted: {subscription_id}")
-                else:
+            for _ in range(RATE_LIMIT_RETRIES + 1):
+                await self.ratelimit.acquire()
+                async with self.session.delete(
+                    f"{TWITCH_EVENTSUB_URL}/{subscription_id}",
+                    headers=await self._auth_headers(),
+                ) as resp:
+                    self.ratelimit.update(resp.headers)
+                    if resp.status == 429:
+                        self.ratelimit.exhausted()
+                        continue
+                    if resp.status in (204, 404):
+                        # 404: already gone — the outcome we wanted
+                        logger.info(f"Subscription deleted: {subscription_id}")
+                        return True
+
                     text = await resp.text()
                     logger.warning(
                         "Delete subscription failed",
@@ -285,5 +524,8 @@ class EventSubManager:
                             "body":   text,
                         }},
                     )
+                    return False
+            return False
         except Exception as e:
             logger.exception(f"Error deleting subscription {subscription_id}: {e}")
+            return False
@@ -0,0 +1,208 @@
+"""
+services/eventsub_reconciler.py
+────────────────────────────────────────────────────────────────
+Desired-state reconciliation for EventSub subscriptions.
+
+startup_sync used to walk guild by guild and streamer by streamer,
+calling EventSubManager.ensure_subscriptions — one GET per streamer
+plus up to four POSTs, all sequential. With hundreds of streamers
+startup took minutes.
+
+Now:
+  1. page through the subscription list ONCE
+  2. build the desired set: (DB streamers + KNOWN_STREAMERS) × the four
+     types in EventSubManager.wanted_conditions
+  3. diff in memory
+  4. create what is missing; delete what is failed or revoked, and
+     our own subscriptions that are orphaned (a streamer nobody tracks
+     any more) or duplicated
+
+Only the event types we manage are ever deleted — anything else on the
+account is left alone. An enabled subscription delivering somewhere
+else (another webhook callback, another WebSocket session) may belong
+to a second deployment sharing the client id — staging, a blue/green
+peer — so it is kept unless EVENTSUB_PRUNE_FOREIGN_CALLBACKS is set.
+
+reconcile(broadcaster_ids) scopes the same diff to a few broadcasters
+(and never prunes outside them). The streamer_added handler in main and
+each fresh EventSub WebSocket session use it.
+
+Env:
+  EVENTSUB_PRUNE_FOREIGN_CALLBACKS   "1" to also delete enabled webhook
+                                     subscriptions with a different
+                                     callback URL — only when this is the
+                                     sole deployment on the client id,
+                                     e.g. after moving the callback
+                                     (default off)
+"""
+
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from services import metrics
+from services.eventsub_manager import EventSubManager, SubscriptionListError
+
+logger = logging.getLogger("eventsub-reconciler")
+
+MANAGED_TYPES = frozenset(EventSubManager.wanted_conditions(""))
+LIVE_STATUSES = frozenset({"enabled", "webhook_callback_verification_pending"})
+
+PRUNE_FOREIGN_CALLBACKS = os.getenv("EVENTSUB_PRUNE_FOREIGN_CALLBACKS", "0") == "1"
+
+
+@dataclass
+class ReconcileSummary:
+    created:   int = 0
+    deleted:   int = 0
+    unchanged: int = 0
+    failed:    int = 0
+    errors:    list[str] = field(default_factory=list)
+    failed_ids: set[str] = field(default_factory=set)   # broadcasters left without a subscription
+
+    def __str__(self) -> str:
+        return (
+            f"created={self.created} deleted={self.deleted} "
+            f"unchanged={self.unchanged} failed={self.failed}"
+        )
+
+
+def _broadcaster_of(sub: dict) -> Optional[str]:
+    condition = sub.get("condition") or {}
+    return condition.get("broadcaster_user_id") or condition.get("from_broadcaster_user_id")
+
+
+class SubscriptionReconciler:
+
+    def __init__(self, manager, db):
+        """
+        manager: services.eventsub_manager.EventSubManager
+        db:      services.db.Database
+        """
+        self.manager = manager
+        self.db      = db
+        self.last_summary: Optional[ReconcileSummary] = None
+
+    async def desired_broadcasters(self) -> set[str]:
+        """DB streamers plus any KNOWN_STREAMERS with a known id."""
+        from commands.live_commands import KNOWN_STREAMERS
+
+        rows = await self.db.fetch("SELECT DISTINCT twitch_user_id FROM streamers")
+        user_ids = {str(r["twitch_user_id"]) for r in rows if r["twitch_user_id"]}
+        user_ids.update(str(uid) for uid in KNOWN_STREAMERS.values() if uid)
+        return user_ids
+
+    async def reconcile(self, broadcaster_ids: Optional[Iterable[str]] = None) -> ReconcileSummary:
+        """
+        Full reconcile when `broadcaster_ids` is None; otherwise only
+        those broadcasters are checked, created and cleaned up.
+        """
+        summary = ReconcileSummary()
+
+        if not self.manager.can_subscribe:
+            summary.errors.append(f"no {self.manager.transport} endpoint")
+            logger.warning(f"EventSub reconcile skipped — no {self.manager.transport} endpoint yet")
+            return summary
+
+        scoped = broadcaster_ids is not None
+        if scoped:
+            desired_ids = {str(b) for b in broadcaster_ids}
+        else:
+            try:
+                desired_ids = await self.desired_broadcasters()
+            except Exception as e:
+                summary.errors.append(f"desired set: {e}")
+                logger.error(f"EventSub reconcile could not load streamers: {e}", exc_info=True)
+                return summary
+
+        desired: dict[tuple[str, str], Optional[dict]] = {
+            (event_type, uid): condition
+            for uid in desired_ids
+            for event_type, condition in self.manager.wanted_conditions(uid).items()
+        }
+
+        # ── Diff (streamed — the listing is never held in memory) ─
+        # A single broadcaster is cheaper to list with the user_id filter
+        listing = self.manager.iter_subscriptions(
+            user_id=next(iter(desired_ids)) if scoped and len(desired_ids) == 1 else None
+        )
+        active:    set[tuple[str, str]] = set()
+        to_delete: list[dict] = []
+        listed = 0
+        try:
+            async for sub in listing:
+                listed += 1
+                self._classify(sub, desired, desired_ids if scoped else None, active, to_delete)
+        except SubscriptionListError as e:
+            summary.errors.append(f"could not list subscriptions: {e}")
+            logger.warning(f"EventSub reconcile aborted — {e}")
+            return summary
+
+        to_create = [key for key in desired if key not in active]
+        summary.unchanged = len(active)
+
+        # ── Apply ────────────────────────────────────────────────
+        # Deletes first: they free subscription cost for the creates
+        for ok in await self.manager.delete_many([sub["id"] for sub in to_delete]):
+            if ok:
+                summary.deleted += 1
+            else:
+                summary.failed += 1
+
+        results = await self.manager.subscribe_many(
+            [(event_type, uid, desired[(event_type, uid)]) for event_type, uid in to_create]
+        )
+        for (event_type, uid), ok in zip(to_create, results):
+            if ok:
+                summary.created += 1
+            else:
+                summary.failed += 1
+                summary.errors.append(f"{event_type}:{uid}")
+                summary.failed_ids.add(uid)
+
+        metrics.inc("eventsub_reconcile_created", summary.created)
+        metrics.inc("eventsub_reconcile_deleted", summary.deleted)
+        metrics.inc("eventsub_reconcile_failed", summary.failed)
+        if not scoped:
+            self.last_summary = summary
+
+        logger.info(
+            f"EventSub reconcile: {summary}",
+            extra={"extra_data": {
+                "broadcasters": len(desired_ids),
+                "scoped":       scoped,
+                "listed":       listed,
+            }},
+        )
+        return summary
+
+    def _classify(
+        self,
+        sub: dict,
+        desired: dict,
+        scope: Optional[set[str]],
+        active: set,
+        to_delete: list,
+    ) -> None:
+        sub_type = sub.get("type")
+        uid      = _broadcaster_of(sub)
+        key      = (sub_type, uid)
+        if sub_type not in MANAGED_TYPES or not uid:
+            return
+        if scope is not None and uid not in scope:
+            return
+
+        if sub.get("status") not in LIVE_STATUSES:
+            to_delete.append(sub)      # failed, revoked or a dead WebSocket session
+        elif not self.manager.is_active(sub):
+            # Delivering to another endpoint — possibly another deployment's
+            if (PRUNE_FOREIGN_CALLBACKS and self.manager.transport == "webhook"
+                    and self.manager.matches_transport(sub)):
+                to_delete.append(sub)
+            else:
+                metrics.inc("eventsub_reconcile_foreign_kept")
+        elif key not in desired or key in active:
+            to_delete.append(sub)      # orphaned or duplicate
+        else:
+            active.add(key)
@@ -0,0 +1,166 @@
+"""
+services/eventsub_revocation.py
+────────────────────────────────────────────────────────────────
+Handles EventSub revocation messages.
+
+When Twitch revokes a subscription (notification_failures_exceeded,
+authorization_revoked, user_removed, ...) it sends one revocation
+message and then goes silent for that streamer. Before this, the
+message was acked and ignored, and the 2-minute watchdog in
+monitor.TwitchMonitor quietly carried that streamer forever.
+
+On revocation we:
+  1. record the reason in Redis   eventsub:revoked:{broadcaster}:{type}
+  2. mark the broadcaster polling-only, so TwitchMonitor polls it every
+     cycle instead of every other one
+  3. re-create the subscription through EventSubManager, retrying with
+     full-jitter exponential backoff until it sticks
+
+Statuses that no resubscribe can fix (user_removed, version_removed)
+are recorded and left polling-only without retrying. WebSocket session
+statuses (websocket_*) are not handled here — a new session re-creates
+everything (see services/eventsub_websocket.py).
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Optional
+
+from services import metrics
+
+logger = logging.getLogger("eventsub-revocation")
+
+RESUBSCRIBE_BASE   = 5         # seconds before the first retry
+RESUBSCRIBE_CAP    = 30 * 60   # longest wait between retries
+REVOCATION_TTL     = 7 * 86400 # how long the reason stays in Redis
+
+# Resubscribing cannot succeed for these — the user or version is gone
+PERMANENT_STATUSES = {"user_removed", "version_removed"}
+
+
+def _redis_key(broadcaster_id: str, sub_type: str) -> str:
+    return f"eventsub:revoked:{broadcaster_id}:{sub_type}"
+
+
+def broadcaster_of(subscription: dict) -> Optional[str]:
+    condition = subscription.get("condition") or {}
+    return (
+        condition.get("broadcaster_user_id")
+        or condition.get("from_broadcaster_user_id")
+        or condition.get("to_broadcaster_user_id")
+    )
+
+
+class RevocationHandler:
+
+    def __init__(self, manager, redis=None):
+        """
+        manager: services.eventsub_manager.EventSubManager
+        redis:   services.redis_client.RedisClient, or None
+        """
+        self.manager = manager
+        self.redis   = redis
+
+        # broadcaster_id -> subscription types currently down
+        self._down: dict[str, set[str]] = {}
+        # (broadcaster_id, type) -> resubscribe task
+        self._retries: dict[tuple[str, str], asyncio.Task] = {}
+
+    # ──────────────────────────────────────────────────────────
+    # PUBLIC API
+    # ──────────────────────────────────────────────────────────
+
+    @property
+    def polling_only(self) -> set[str]:
+        """Broadcaster ids with at least one subscription down."""
+        return set(self._down)
+
+    async def handle(self, subscription: dict) -> None:
+        """Entry point for a revocation message's `subscription` object."""
+        sub_type       = subscription.get("type", "")
+        status         = subscription.get("status", "unknown")
+        broadcaster_id = broadcaster_of(subscription)
+
+        if status.startswith("websocket_"):
+            logger.info(f"Ignoring {status} revocation — handled by the WebSocket session")
+            return
+        if not broadcaster_id or not sub_type:
+            logger.warning(f"Revocation without a broadcaster condition: {subscription}")
+            return
+
+        metrics.inc("eventsub_revocations")
+        logger.warning(
+            "EventSub subscription revoked — switching to polling",
+            extra={"extra_data": {
+                "type":        sub_type,
+                "broadcaster": broadcaster_id,
+                "status":      status,
+            }},
+        )
+
+        self._down.setdefault(broadcaster_id, set()).add(sub_type)
+        if self.redis:
+            await self.redis.set_json(
+                _redis_key(broadcaster_id, sub_type),
+                {"status": status, "revoked_at": int(time.time())},
+                ttl=REVOCATION_TTL,
+            )
+
+        if status in PERMANENT_STATUSES:
+            return
+
+        key = (broadcaster_id, sub_type)
+        if key in self._retries and not self._retries[key].done():
+            return   # duplicate revocation — already retrying
+        self._retries[key] = asyncio.create_task(
+            self._resubscribe(broadcaster_id, sub_type, subscription.get("condition") or {}),
+            name=f"eventsub-resubscribe-{broadcaster_id}-{sub_type}",
+        )
+
+    async def stop(self) -> None:
+        for task in self._retries.values():
+            task.cancel()
+        await asyncio.gather(*self._retries.values(), return_exceptions=True)
+        self._retries.clear()
+
+    # ──────────────────────────────────────────────────────────
+    # RESUBSCRIBE
+    # ──────────────────────────────────────────────────────────
+
+    async def _resubscribe(self, broadcaster_id: str, sub_type: str, condition: dict) -> None:
+        attempt = 0
+        while True:
+            # Full jitter — many revocations at once (e.g. after an outage
+            # of our endpoint) must not come back as one burst
+            delay = random.uniform(0, min(RESUBSCRIBE_CAP, RESUBSCRIBE_BASE * 2 ** attempt))
+            await asyncio.sleep(delay)
+            attempt += 1
+
+            try:
+                ok = await self.manager.subscribe(sub_type, broadcaster_id, condition=condition)
+            except Exception as e:
+                logger.warning(f"Resubscribe {sub_type} for {broadcaster_id} raised: {e}")
+                ok = False
+
+            if ok:
+                break
+            metrics.inc("eventsub_resubscribe_failures")
+
+        down = self._down.get(broadcaster_id, set())
+        down.discard(sub_type)
+        if not down:
+            self._down.pop(broadcaster_id, None)
+        if self.redis:
+            await self.redis.delete(_redis_key(broadcaster_id, sub_type))
+        self._retries.pop((broadcaster_id, sub_type), None)
+
+        logger.info(
+            "EventSub subscription restored",
+            extra={"extra_data": {
+                "type":        sub_type,
+                "broadcaster": broadcaster_id,
+                "attempts":    attempt,
+            }},
+        )
@@ -1,10 +1,12 @@
 import asyncio
+import calendar
 import hashlib
 import hmac
-import json
 import logging
 import os
+import time
 
+import orjson
 from aiohttp import web
 # DÜZELTME: import yolu güncellendi ve fonksiyon isimleri eşlendi
 from events.stream_events import handle_stream_online, handle_stream_offline, handle_channel_update
@@ -40,46 +42,205 @@ async def handle_channel_raid(bot, event: dict) -> None:
         )
 
 
+# Not a Twitch subscription type: the watchdog submits its missed-offline
+# recoveries under this name so they share the broadcaster's lane
+WATCHDOG_OFFLINE = "watchdog.stream_offline"
+
+
+async def handle_watchdog_offline(bot, event: dict) -> None:
+    """
+    Runs LiveCommandsCog.on_stream_offline for a stream.offline the
+    watchdog found missing (monitor.TwitchMonitor._recover_offline).
+    Awaited here rather than bot.dispatch()ed, so it finishes before the
+    next event in the broadcaster's lane starts.
+    """
+    cog = bot.get_cog("LiveCommandsCog")
+    if cog is None:
+        logger.warning(
+            f"handle_watchdog_offline: LiveCommandsCog not found — "
+            f"could not reconcile {event.get('broadcaster_user_login')}"
+        )
+        return
+    await cog.on_stream_offline(
+        event["broadcaster_user_id"],
+        event["broadcaster_user_login"],
+        event.get("broadcaster_user_name") or event["broadcaster_user_login"],
+        event.get("duration_mins", 0),
+        event["guild_id"],
+    )
+
+
+# ──────────────────────────────────────────────────────────────
+# INTAKE FAST PATH
+# ──────────────────────────────────────────────────────────────
+# Checks run cheapest-first so stale, replayed or forged requests are
+# rejected before we pay for the body read, the HMAC or the JSON parse:
+#   1. required headers present and well-formed      → 400
+#   2. timestamp within Twitch's 10-minute window     → 403
+#   3. message id already seen by this process        → 200 (ack retry)
+#   4. HMAC-SHA256 over id + timestamp + body         → 403
+#   5. replica-wide message id claim (Redis)          → 200 (ack retry)
+#   6. orjson parse and dispatch
+
+REPLAY_WINDOW = 600   # seconds — Twitch recommends rejecting anything older
+MESSAGE_TYPES = frozenset({"notification", "webhook_callback_verification", "revocation"})
+
+# Keyed-hash prototype: the secret's inner/outer pads are computed once,
+# each request only copy()s the state and feeds the message through.
+_HMAC_PROTO = hmac.new(SECRET.encode(), digestmod=hashlib.sha256)
+_SIG_PREFIX = "sha256="
+_SIG_LENGTH = len(_SIG_PREFIX) + 64
+
+
+def _parse_timestamp(ts: str) -> float | None:
+    """
+    Parses Twitch's RFC3339 timestamp (e.g. 2019-11-16T10:11:12.634234626Z)
+    to epoch seconds. Fractional seconds are ignored — the window is 10 min.
+    Returns None if malformed.
+    """
+    if len(ts) < 20 or ts[4] != "-" or ts[10] != "T" or ts[13] != ":":
+        return None
+    try:
+        return float(calendar.timegm((
+            int(ts[0:4]), int(ts[5:7]), int(ts[8:10]),
+            int(ts[11:13]), int(ts[14:16]), int(ts[17:19]),
+        )))
+    except ValueError:
+        return None
+
+
+def _signature_ok(msg_id: str, msg_ts: str, raw_body: bytes, signature: str) -> bool:
+    mac = _HMAC_PROTO.copy()
+    mac.update(msg_id.encode())
+    mac.update(msg_ts.encode())
+    mac.update(raw_body)
+    return hmac.compare_digest(mac.hexdigest(), signature[len(_SIG_PREFIX):])
+
+
 async def handle_eventsub(request: web.Request):
-    raw_body  = await request.read()
-    signature = request.headers.get("Twitch-Eventsub-Message-Signature", "")
-    msg_id    = request.headers.get("Twitch-Eventsub-Message-Id", "")
-    msg_ts    = request.headers.get("Twitch-Eventsub-Message-Timestamp", "")
-    msg_type  = request.headers.get("Twitch-Eventsub-Message-Type", "")
+    headers   = request.headers
+    signature = headers.get("Twitch-Eventsub-Message-Signature", "")
+    msg_id    = headers.get("Twitch-Eventsub-Message-Id", "")
+    msg_ts    = headers.get("Twitch-Eventsub-Message-Timestamp", "")
+    msg_type  = headers.get("Twitch-Eventsub-Message-Type", "")
+
+    # 1. Headers
+    if (
+        not msg_id
+        or msg_type not in MESSAGE_TYPES
+        or len(signature) != _SIG_LENGTH
+        or not signature.startswith(_SIG_PREFIX)
+    ):
+        return web.Response(status=400)
+
+    # 2. Replay window
+    sent_at = _parse_timestamp(msg_ts)
+    if sent_at is None:
+        return web.Response(status=400)
+    if abs(time.time() - sent_at) > REPLAY_WINDOW:
+        return web.Response(status=403)
 
-    # Signature verification
-    hmac_message = msg_id.encode() + msg_ts.encode() + raw_body
-    expected     = "sha256=" + hmac.new(SECRET.encode(), hmac_message, hashlib.sha256).hexdigest()
+    app_state = request.app["app_state"]
+    dedup     = app_state.eventsub_dedup
+    dedupe    = msg_type == "notification" and dedup is not None
 
-    if not hmac.compare_digest(expected, signature):
+    # 3. Retry already seen here — ack without touching the body
+    if dedupe and dedup.seen_recently(msg_id):
+        return web.Response(status=200)
+
+    # 4. Signature verification
+    raw_body = await request.read()
+    if not _signature_ok(msg_id, msg_ts, raw_body, signature):
         return web.Response(status=403)
 
-    data = json.loads(raw_body)
-    
+    # 5. Retry seen by another replica
+    if dedupe and not await dedup.claim(msg_id):
+        return web.Response(status=200)
+
+    # 6. Parse + dispatch
+    try:
+        data = orjson.loads(raw_body)
+    except orjson.JSONDecodeError:
+        return web.Response(status=400)
+
     # Twitch Challenge doğrulama
     if msg_type == "webhook_callback_verification":
         return web.Response(text=data["challenge"], content_type="text/plain")
 
+    if msg_type == "revocation":
+        revocations = app_state.eventsub_revocations
+        if revocations is not None:
+            await revocations.handle(data.get("subscription") or {})
+        return web.Response(status=200)
+
     if msg_type == "notification":
         event    = data["event"]
         sub_type = data["subscription"]["type"]
-        login    = event.get("broadcaster_user_login") or event.get("from_broadcaster_user_login", "unknown")
-        bot      = request.app["bot"]
-        loop     = asyncio.get_event_loop()
 
+        if not await accept_notification(app_state, msg_id, sub_type, event):
+            # Queue full or shutting down — Twitch retries non-2xx deliveries,
+            # so release the message id for that retry
+            if dedupe:
+                await dedup.forget(msg_id)
+            return web.Response(status=503)
+
+    return web.Response(status=200)
+
+
+async def accept_notification(app_state, msg_id: str, sub_type: str, event: dict) -> bool:
+    """
+    Journals a verified, de-duplicated notification and hands it to the
+    dispatcher. Shared by the webhook above and the WebSocket transport
+    (services/eventsub_websocket.py).
+    Returns False if the dispatcher cannot take it right now.
+    """
+    dispatcher = app_state.eventsub_dispatcher
+    journal    = app_state.eventsub_journal
+
+    if dispatcher is None or not dispatcher.has_capacity():
+        return False
+
+    offset = None
+    if journal is not None:
         try:
-            if sub_type == "stream.online":
-                loop.create_task(handle_stream_online(bot, event))
-            elif sub_type == "stream.offline":
-                loop.create_task(handle_stream_offline(bot, event))
-            elif sub_type == "channel.update":
-                loop.create_task(handle_channel_update(bot, event)) # Fonksiyon ismi güncellendi
-            elif sub_type == "channel.raid":
-                loop.create_task(handle_channel_raid(bot, event))
+            # Durable before we ack — replayed at startup if we crash
+            offset = await journal.append(msg_id, sub_type, event)
         except Exception as e:
-            logger.error(f"Dispatch error for {login}: {e}")
+            # Disk trouble must not stop go-live posts; run unjournaled
+            logger.error(f"EventSub journal append failed: {e}")
+
+    if not dispatcher.submit(sub_type, event, offset):
+        if journal is not None:
+            journal.ack(offset)
+        return False
+    return True
+
+
+async def replay_journal(app_state, entries) -> None:
+    """
+    Feeds journal entries that were accepted but never processed back
+    through the dispatcher. Waits for queue capacity instead of
+    dropping, since Twitch will not redeliver these.
+    """
+    dispatcher = app_state.eventsub_dispatcher
+    for entry in entries:
+        while not dispatcher.submit(entry.sub_type, entry.event, entry.offset):
+            if app_state.is_shutting_down:
+                return
+            await asyncio.sleep(0.1)
+    if entries:
+        logger.info(f"Replayed {len(entries)} journaled EventSub notification(s)")
+
+
+# subscription type -> handler(bot, event), consumed by EventSubDispatcher
+NOTIFICATION_HANDLERS = {
+    "stream.online":  handle_stream_online,
+    "stream.offline": handle_stream_offline,
+    "channel.update": handle_channel_update,
+    "channel.raid":   handle_channel_raid,
+    WATCHDOG_OFFLINE: handle_watchdog_offline,
+}
 
-    return web.Response(status=200)
 
 async def create_app(bot, app_state):
     app = web.Application()
@@ -0,0 +1,282 @@
+"""
+services/eventsub_websocket.py
+────────────────────────────────────────────────────────────────
+EventSub over WebSocket — the alternative to the webhook ingress in
+eventsub_server.py, selected with EVENTSUB_TRANSPORT=websocket.
+
+One persistent connection replaces the public callback URL, the aiohttp
+listener and the per-message HMAC, so local and staging deployments
+work without a tunnel.
+
+Protocol (https://dev.twitch.tv/docs/eventsub/handling-websocket-events):
+  session_welcome    first frame; carries the session id that
+                     subscriptions must be created with, and the
+                     keepalive timeout
+  session_keepalive  sent when nothing else was sent for that long —
+                     if neither arrives in time the connection is dead
+  session_reconnect  Twitch is moving us: connect to reconnect_url,
+                     wait for its welcome, then drop the old socket.
+                     Subscriptions carry over, and the old socket keeps
+                     delivering until the new one is welcomed.
+  notification       fed through the same dedup → journal → dispatcher
+                     path as the webhook (eventsub_server.accept_notification)
+  revocation         handed to app_state.eventsub_revocations
+
+A fresh session (first connect, or after the connection dropped) has no
+subscriptions, so `on_session(session_id)` is called to recreate them.
+Twitch closes a session that has none within ~10 seconds of the welcome,
+so it runs immediately, alongside the read loop.
+
+Env:
+  EVENTSUB_WS_URL   defaults to Twitch; point it at a local stand-in
+                    server that replays recorded frames for testing
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Optional
+
+import aiohttp
+import orjson
+
+from services import eventsub_server, metrics
+
+logger = logging.getLogger("eventsub-websocket")
+
+EVENTSUB_WS_URL   = os.getenv("EVENTSUB_WS_URL", "wss://eventsub.wss.twitch.tv/ws")
+WELCOME_TIMEOUT   = 10                    # seconds to wait for session_welcome
+KEEPALIVE_GRACE   = 5                     # slack on top of keepalive_timeout_seconds
+RECONNECT_BACKOFF = (1, 2, 5, 10, 30)     # seconds, after a failed/short-lived connection
+STABLE_SESSION    = 60                    # a session this old resets the backoff
+
+OnSession = Callable[[str], Awaitable[None]]
+
+
+class EventSubWebSocket:
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        manager,
+        app_state,
+        on_session: Optional[OnSession] = None,
+        url: str = EVENTSUB_WS_URL,
+    ):
+        """
+        manager:    services.eventsub_manager.EventSubManager — its
+                    ws_session_id is kept in sync with the live session.
+        on_session: called with the id of every fresh session.
+        """
+        self.session    = session
+        self.manager    = manager
+        self.app_state  = app_state
+        self.on_session = on_session
+        self.url        = url
+
+        self.session_id: Optional[str] = None
+        self.keepalive_timeout = 10
+        self.reconnects = 0
+
+        self._task: Optional[asyncio.Task] = None
+        self._session_task: Optional[asyncio.Task] = None
+        self._retiring: Optional[asyncio.Task] = None
+
+    # ──────────────────────────────────────────────────────────
+    # LIFECYCLE
+    # ──────────────────────────────────────────────────────────
+
+    def start(self) -> None:
+        if self._task:
+            logger.warning("EventSubWebSocket already running — ignoring start()")
+            return
+        self._task = asyncio.create_task(self._run(), name="eventsub-websocket")
+
+    async def stop(self) -> None:
+        tasks = [t for t in (self._task, self._session_task, self._retiring) if t]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self.manager.ws_session_id = None
+
+    # ──────────────────────────────────────────────────────────
+    # CONNECTION
+    # ──────────────────────────────────────────────────────────
+
+    async def _run(self) -> None:
+        attempt = 0
+        while True:
+            try:
+                ws, welcome = await self._connect(self.url)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                delay = RECONNECT_BACKOFF[min(attempt, len(RECONNECT_BACKOFF) - 1)]
+                attempt += 1
+                logger.warning(f"EventSub WebSocket connect failed: {e} — retrying in {delay}s")
+                await asyncio.sleep(delay)
+                continue
+
+            started = time.monotonic()
+            self._new_session(welcome)
+            try:
+                await self._serve(ws)
+            except asyncio.CancelledError:
+                await ws.close()
+                raise
+            except Exception as e:
+                logger.error(f"EventSub WebSocket error: {e}", exc_info=True)
+                await ws.close()
+            finally:
+                self.manager.ws_session_id = None
+                self.session_id = None
+
+            metrics.inc("eventsub_ws_disconnects")
+            if time.monotonic() - started >= STABLE_SESSION:
+                attempt = 0
+            delay = RECONNECT_BACKOFF[min(attempt, len(RECONNECT_BACKOFF) - 1)] if attempt else 0
+            attempt += 1
+            logger.warning(f"EventSub WebSocket session lost — reconnecting in {delay}s")
+            await asyncio.sleep(delay)
+
+    async def _connect(self, url: str) -> tuple[aiohttp.ClientWebSocketResponse, dict]:
+        """Opens a socket and waits for its session_welcome."""
+        ws = await self.session.ws_connect(url, heartbeat=None, autoping=True)
+        try:
+            frame = await self._receive(ws, WELCOME_TIMEOUT)
+            if frame is None or frame["metadata"]["message_type"] != "session_welcome":
+                raise ConnectionError(f"expected session_welcome, got {frame and frame['metadata']}")
+        except BaseException:
+            await ws.close()
+            raise
+
+        session = frame["payload"]["session"]
+        self.keepalive_timeout = session.get("keepalive_timeout_seconds") or self.keepalive_timeout
+        return ws, session
+
+    def _new_session(self, session: dict) -> None:
+        self.session_id = self.manager.ws_session_id = session["id"]
+        logger.info(
+            "EventSub WebSocket session started",
+            extra={"extra_data": {
+                "session_id": session["id"],
+                "keepalive":  self.keepalive_timeout,
+            }},
+        )
+        if self.on_session:
+            self._session_task = asyncio.create_task(self._call_on_session(session["id"]))
+
+    async def _call_on_session(self, session_id: str) -> None:
+        try:
+            await self.on_session(session_id)
+        except Exception as e:
+            logger.error(f"EventSub session setup failed: {e}", exc_info=True)
+
+    async def _serve(self, ws: aiohttp.ClientWebSocketResponse) -> None:
+        """
+        Reads frames until the session is lost, following
+        session_reconnect hand-offs along the way.
+        """
+        while True:
+            reconnect_url = await self._pump(ws)
+            if reconnect_url is None:
+                await ws.close()
+                return
+
+            # Keep draining the old socket until the new one is welcomed
+            draining = asyncio.create_task(self._pump(ws))
+            try:
+                new_ws, welcome = await self._connect(reconnect_url)
+            except asyncio.CancelledError:
+                draining.cancel()
+                await ws.close()
+                raise
+            except Exception as e:
+                logger.warning(f"EventSub WebSocket reconnect failed: {e}")
+                await ws.close()
+                await asyncio.gather(draining, return_exceptions=True)
+                return
+
+            # Retire the old socket in the background: closing (rather than
+            # cancelling) lets a notification mid-dispatch on it finish,
+            # while we already read from the new one
+            self._retiring = asyncio.create_task(self._retire(ws, draining))
+
+            ws = new_ws
+            self.session_id = self.manager.ws_session_id = welcome["id"]
+            self.reconnects += 1
+            metrics.inc("eventsub_ws_reconnects")
+            logger.info("EventSub WebSocket moved to reconnect_url")
+
+    async def _retire(self, ws: aiohttp.ClientWebSocketResponse, draining: asyncio.Task) -> None:
+        await ws.close()
+        await asyncio.gather(draining, return_exceptions=True)
+
+    async def _receive(self, ws: aiohttp.ClientWebSocketResponse, timeout: float) -> Optional[dict]:
+        """Next JSON frame, or None once the socket is closed."""
+        while True:
+            msg = await ws.receive(timeout=timeout)
+            if msg.type == aiohttp.WSMsgType.TEXT:
+                return orjson.loads(msg.data)
+            if msg.type in (
+                aiohttp.WSMsgType.CLOSE,
+                aiohttp.WSMsgType.CLOSING,
+                aiohttp.WSMsgType.CLOSED,
+                aiohttp.WSMsgType.ERROR,
+            ):
+                if ws.close_code:
+                    logger.warning(f"EventSub WebSocket closed by server (code {ws.close_code})")
+                return None
+
+    async def _pump(self, ws: aiohttp.ClientWebSocketResponse) -> Optional[str]:
+        """
+        Handles frames from one socket. Returns the reconnect_url when
+        Twitch asks us to move, or None when the socket is dead (closed,
+        or silent for longer than the keepalive timeout).
+        """
+        while True:
+            try:
+                frame = await self._receive(ws, self.keepalive_timeout + KEEPALIVE_GRACE)
+            except asyncio.TimeoutError:
+                logger.warning("EventSub WebSocket keepalive missed")
+                return None
+            if frame is None:
+                return None
+
+            msg_type = frame["metadata"]["message_type"]
+            if msg_type == "notification":
+                await self._on_notification(frame)
+            elif msg_type == "session_reconnect":
+                return frame["payload"]["session"]["reconnect_url"]
+            elif msg_type == "revocation":
+                revocations = self.app_state.eventsub_revocations
+                if revocations is not None:
+                    await revocations.handle(frame["payload"]["subscription"])
+            # session_keepalive: receiving it already reset the timeout
+
+    # ──────────────────────────────────────────────────────────
+    # NOTIFICATIONS
+    # ──────────────────────────────────────────────────────────
+
+    async def _on_notification(self, frame: dict) -> None:
+        msg_id  = frame["metadata"]["message_id"]
+        payload = frame["payload"]
+
+        # Twitch may redeliver on the WebSocket too
+        dedup = self.app_state.eventsub_dedup
+        if dedup is not None and not await dedup.claim(msg_id):
+            return
+
+        sub_type = payload["subscription"]["type"]
+        event    = payload["event"]
+
+        # There is no 503 to answer here — hold the read loop until the
+        # dispatcher has room, which back-pressures the socket instead
+        while not await eventsub_server.accept_notification(self.app_state, msg_id, sub_type, event):
+            if self.app_state.is_shutting_down:
+                return
+            await asyncio.sleep(0.1)
+
+        metrics.inc("eventsub_ws_notifications")
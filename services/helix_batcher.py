@@ -0,0 +1,171 @@
+"""
+services/helix_batcher.py
+────────────────────────────────────────────────────────────────
+DataLoader-style micro-batching for single-key Helix lookups.
+
+/users and /streams take up to 100 login / id / user_id params per call,
+but most callers ask for one: get_user(login) from the stream handlers,
+get_stream_metadata(login) from the refresh loops, get_user_by_login
+from /schedule, /live force and the watchdog. Each of those used to be
+its own round trip and its own rate-limit point.
+
+A HelixBatcher collects the keys asked for within BATCH_WINDOW (or
+until MAX_BATCH are queued), sends ONE request for all of them, and
+resolves every caller's future with its own item — or None when Twitch
+returned nothing for that key (unknown user, offline stream). Callers
+asking for the same key in one window share a slot. If the request
+itself fails (network error, or 429 / 5xx after TwitchAPI's retries)
+every caller gets HelixUnavailable instead, so "Twitch is down" is
+never mistaken for "no such user" or "offline". A response without a
+"data" list (Helix's 400 error body) counts as a failure too — and
+keys that fail `validate` resolve None without being sent, since one
+malformed login makes Helix reject the whole batch.
+
+The batch goes out at the most urgent helix_ratelimit priority among
+its callers, so a live handler's lookup is never held back by the
+background callers it happens to be batched with.
+
+Env:
+  HELIX_BATCH_WINDOW_MS   collection window (default 10)
+"""
+
+import asyncio
+import logging
+import os
+from typing import Callable, Iterable, Optional
+
+from services import helix_ratelimit, metrics
+
+logger = logging.getLogger("helix-batcher")
+
+BATCH_WINDOW = int(os.getenv("HELIX_BATCH_WINDOW_MS", "10")) / 1000
+MAX_BATCH    = 100    # Helix's per-request limit for repeated params
+
+
+class HelixUnavailable(RuntimeError):
+    """The batch request gave up — no answer for any of its keys."""
+
+
+class HelixBatcher:
+
+    def __init__(
+        self,
+        api,
+        endpoint: str,
+        param: str,
+        key_field: str,
+        normalize: Callable[[str], str] = str,
+        validate: Optional[Callable[[str], bool]] = None,
+        extra_params: Iterable[tuple] = (),
+        window: float = BATCH_WINDOW,
+        max_batch: int = MAX_BATCH,
+    ):
+        """
+        api:       services.twitch_api.TwitchAPI — batches go through
+                   api.request, so they are rate-limited and coalesced
+        endpoint:  Helix endpoint, e.g. "users"
+        param:     repeated query param, e.g. "login"
+        key_field: field of each returned item that holds the key
+        normalize: applied to keys on both sides (str.lower for logins)
+        validate:  normalized keys it rejects resolve None without a
+                   request — Twitch can't have an item for them
+        extra_params: fixed params sent with every batch, e.g.
+                   ("first", 100) — /streams returns 20 items by default
+        """
+        self.api       = api
+        self.endpoint  = endpoint
+        self.param     = param
+        self.key_field = key_field
+        self.normalize = normalize
+        self.validate  = validate
+        self.extra_params = list(extra_params)
+        self.window    = window
+        self.max_batch = max_batch
+        self.name      = f"{endpoint}_by_{param}"
+
+        self._pending: dict[str, list[asyncio.Future]] = {}
+        self._levels:  set[str] = set()
+        self._timer:   Optional[asyncio.TimerHandle] = None
+        self._tasks:   set[asyncio.Task] = set()
+
+    # ──────────────────────────────────────────────────────────
+    # PUBLIC API
+    # ──────────────────────────────────────────────────────────
+
+    async def load(self, key) -> Optional[dict]:
+        """The item for `key`, or None if Twitch has none."""
+        key  = self.normalize(str(key))
+        if self.validate is not None and not self.validate(key):
+            metrics.inc(f"helix_batch_{self.name}_invalid")
+            return None
+        loop = asyncio.get_running_loop()
+        fut  = loop.create_future()
+
+        self._pending.setdefault(key, []).append(fut)
+        self._levels.add(helix_ratelimit.current_priority())
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await fut
+
+    async def load_many(self, keys: Iterable) -> dict[str, dict]:
+        """{normalized key: item} for the keys Twitch returned."""
+        keys    = [self.normalize(str(k)) for k in keys]
+        results = await asyncio.gather(*(self.load(k) for k in keys))
+        return {k: item for k, item in zip(keys, results) if item is not None}
+
+    # ──────────────────────────────────────────────────────────
+    # BATCHING
+    # ──────────────────────────────────────────────────────────
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        level = min(self._levels, key=helix_ratelimit.PRIORITIES.index)
+        self._levels = set()
+
+        task = asyncio.create_task(self._dispatch(batch, level))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch: dict[str, list[asyncio.Future]], level: str) -> None:
+        metrics.observe(f"helix_batch_{self.name}_size", len(batch))
+        callers = sum(len(futs) for futs in batch.values())
+        metrics.inc(f"helix_batch_{self.name}_saved", callers - 1)
+
+        try:
+            data = await self.api.request(
+                self.endpoint,
+                params=[(self.param, key) for key in batch] + self.extra_params,
+                priority=level,
+            )
+            if data is None:
+                raise HelixUnavailable(f"Helix {self.endpoint} gave up after retries")
+            if not isinstance(data.get("data"), list):
+                raise HelixUnavailable(
+                    f"Helix {self.endpoint} answered without data: "
+                    f"{data.get('status')} {data.get('message', '')}".rstrip()
+                )
+        except Exception as e:
+            logger.warning(f"Helix batch {self.name} ({len(batch)} keys) failed: {e}")
+            for futs in batch.values():
+                for fut in futs:
+                    if not fut.done():
+                        fut.set_exception(e)
+            return
+
+        found = {
+            self.normalize(str(item.get(self.key_field, ""))): item
+            for item in data["data"]
+        }
+        for key, futs in batch.items():
+            for fut in futs:
+                if not fut.done():       # the caller may have given up
+                    fut.set_result(found.get(key))
@@ -0,0 +1,219 @@
+"""
+services/helix_ratelimit.py
+────────────────────────────────────────────────────────────────
+Client-side view of Twitch's Helix rate limit.
+
+Helix uses a token bucket per client id + token (800 points/minute for
+an app token) and reports its state on every response:
+
+  Ratelimit-Limit       bucket size
+  Ratelimit-Remaining   points left right now
+  Ratelimit-Reset       unix time at which the bucket is full again
+
+HelixRateLimiter keeps a local copy of that bucket:
+  - seeded from Ratelimit-Limit on the first response, and refilled
+    continuously between responses
+  - corrected on every response: Remaining overwrites the local count
+    and the refill rate is re-derived from how long Reset says the
+    bucket needs to fill back up
+  - acquire() spends one point, or sleeps until the refill covers it
+  - a 429 (exhausted()) blocks everyone until Ratelimit-Reset, plus a
+    little jitter so the waiters don't all fire in the same instant
+
+Priority classes decide who may spend the last points. Each class stops
+at a different floor, so background work backs off long before the
+bucket is empty and the live notification path keeps headroom:
+
+  live         (floor 0)           EventSub handlers — go-live posts
+  interactive  (floor `reserve`)   slash commands; the default
+  background   (floor 20% limit)   badge refresh, /schedule fan-out
+
+The class comes from a ContextVar, so a caller sets it once around a
+whole job (`with helix_ratelimit.priority(BACKGROUND): ...`, or
+set_priority() at the top of a loop task) and every Helix request
+underneath inherits it, including from tasks it spawns.
+
+Concurrency is bounded separately by the caller (a semaphore), so this
+only decides WHEN a request may go, not how many are in flight.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import random
+import time
+from typing import Iterator, Mapping, Optional
+
+from services import metrics
+
+logger = logging.getLogger("helix-ratelimit")
+
+LIVE        = "live"
+INTERACTIVE = "interactive"
+BACKGROUND  = "background"
+PRIORITIES  = (LIVE, INTERACTIVE, BACKGROUND)
+
+DEFAULT_RESERVE  = 10     # points only live/interactive calls may spend
+BACKGROUND_SHARE = 0.2    # fraction of the bucket background work leaves alone
+RESET_JITTER     = 1.0    # seconds spread over waiters released by a reset
+MAX_SLEEP        = 5.0    # re-check at least this often while waiting
+
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "helix_priority", default=INTERACTIVE
+)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+@contextlib.contextmanager
+def priority(level: str) -> Iterator[None]:
+    """Runs the block (and tasks created inside it) at `level`."""
+    if level not in PRIORITIES:
+        raise ValueError(f"unknown Helix priority {level!r}")
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def set_priority(level: str) -> None:
+    """
+    Sets `level` for the rest of the current task — for long-lived
+    loops that run in a task of their own.
+    """
+    if level not in PRIORITIES:
+        raise ValueError(f"unknown Helix priority {level!r}")
+    _priority.set(level)
+
+
+class HelixRateLimiter:
+
+    def __init__(self, name: str = "helix", reserve: int = DEFAULT_RESERVE):
+        self.name    = name
+        self.reserve = reserve
+
+        self.limit:    Optional[int]   = None    # unknown until the first response
+        self.tokens:   float           = 0.0
+        self.rate:     float           = 0.0     # points per second
+        self.reset_at: Optional[float] = None    # unix seconds
+
+        self._refilled_at   = time.monotonic()
+        self._blocked_until = 0.0                # unix seconds, after a 429
+
+    # ──────────────────────────────────────────────────────────
+    # SPENDING
+    # ──────────────────────────────────────────────────────────
+
+    async def acquire(self, level: Optional[str] = None) -> None:
+        """
+        Waits until a request at `level` (default: the current context's
+        priority) fits in the budget, then spends one point.
+        """
+        level   = level or current_priority()
+        started = time.monotonic()
+        waited  = False
+
+        while True:
+            delay = self._blocked_until - time.time()
+            if delay <= 0:
+                if self.limit is None:
+                    break        # nothing known yet — the response will tell us
+                self._refill()
+                floor = self._floor(level)
+                if self.tokens - 1 >= floor:
+                    self.tokens -= 1
+                    break
+                delay = (floor + 1 - self.tokens) / self.rate if self.rate else MAX_SLEEP
+
+            if not waited:
+                waited = True
+                metrics.inc(f"{self.name}_ratelimit_waits_{level}")
+                logger.debug(
+                    f"{self.name} rate limit: {level} request waiting {delay:.1f}s",
+                    extra={"extra_data": {"tokens": round(self.tokens, 1)}},
+                )
+            await asyncio.sleep(min(delay, MAX_SLEEP))
+
+        if waited:
+            metrics.observe(f"{self.name}_ratelimit_wait_seconds", time.monotonic() - started)
+
+    def _floor(self, level: str) -> float:
+        if level == LIVE:
+            return 0
+        if level == BACKGROUND:
+            return max(self.reserve, (self.limit or 0) * BACKGROUND_SHARE)
+        return self.reserve
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(float(self.limit), self.tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    # ──────────────────────────────────────────────────────────
+    # FEEDBACK FROM RESPONSES
+    # ──────────────────────────────────────────────────────────
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        """Corrects the local bucket from a Helix response's headers."""
+        try:
+            limit     = int(headers["Ratelimit-Limit"]) if "Ratelimit-Limit" in headers else self.limit
+            remaining = int(headers["Ratelimit-Remaining"]) if "Ratelimit-Remaining" in headers else None
+            reset_at  = float(headers["Ratelimit-Reset"]) if "Ratelimit-Reset" in headers else None
+        except ValueError:
+            return
+        if limit is None:
+            return
+
+        if self.limit is None:
+            self.tokens = float(limit)
+        self.limit = limit
+        self._refill()
+
+        if remaining is not None:
+            self.tokens = float(remaining)
+        if reset_at is not None:
+            self.reset_at = reset_at
+
+        # Twitch refills limit/minute; Reset says how long the current gap
+        # actually takes to refill, which tracks it if the bucket differs
+        until_reset = (self.reset_at or 0) - time.time()
+        if remaining is not None and remaining < limit and until_reset >= 1:
+            self.rate = (limit - remaining) / until_reset
+        else:
+            self.rate = limit / 60
+
+        metrics.set_gauge(f"{self.name}_ratelimit_remaining", int(self.tokens))
+
+    def exhausted(self, reset_at: Optional[str] = None) -> None:
+        """
+        Called on a 429 — nothing may go until the reset. `reset_at` is
+        the response's Ratelimit-Reset, if it carried one.
+        """
+        try:
+            if reset_at is not None:
+                self.reset_at = float(reset_at)
+        except ValueError:
+            pass
+        self.tokens = 0.0
+        self._refilled_at = time.monotonic()
+        resume = self.reset_at if self.reset_at and self.reset_at > time.time() else time.time() + 1
+        self._blocked_until = resume + random.uniform(0, RESET_JITTER)
+        metrics.inc(f"{self.name}_ratelimit_exhausted")
+        logger.warning(
+            f"{self.name} rate limit exhausted — pausing until reset",
+            extra={"extra_data": {"pause_s": round(self._blocked_until - time.time(), 1)}},
+        )
+
+    def stats(self) -> dict:
+        if self.limit is not None:
+            self._refill()
+        return {
+            "limit":     self.limit,
+            "remaining": int(self.tokens) if self.limit is not None else None,
+            "rate":      round(self.rate, 2),
+            "reset_in":  max(0.0, (self.reset_at or 0) - time.time()) if self.reset_at else None,
+        }
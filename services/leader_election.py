@@ -0,0 +1,170 @@
+"""
+services/leader_election.py
+────────────────────────────────────────────────────────────────
+Leader election between bot replicas, on a DistributedLock lease.
+
+Every replica takes webhook / WebSocket intake (Twitch delivers to any
+of them and dedup settles duplicates), but singleton work — the
+watchdog, the live snapshot poller, the free-games and poster loops —
+must run exactly once, or every recovery and every deal is posted
+twice. main wires that work to on_elected / on_demoted.
+
+  candidate   tries to acquire the lease every RETRY_INTERVAL
+  leader      renews every ttl/3; a failed renewal (key gone or taken)
+              or a lease that runs out by our own clock while Redis is
+              unreachable demotes immediately
+  shutdown    stop() releases the lease (compare-and-delete), so a
+              candidate takes over within RETRY_INTERVAL rather than
+              waiting out the TTL
+
+Failover after a crash is bounded by ttl + RETRY_INTERVAL.
+
+Fencing: fence_ok() checks that our token is still the newest one
+handed out. Side effects that must not happen twice (posting a
+recovered notification) check it first, so a leader that stalled past
+its lease and hasn't noticed yet backs off instead of double-posting.
+
+Without Redis there is only one replica: it is always the leader.
+
+Env:
+  INSTANCE_ID   replica name in logs and Redis (default host-pid)
+"""
+
+import asyncio
+import logging
+import os
+import socket
+from typing import Awaitable, Callable, Optional
+
+from services import metrics
+from services.distributed_lock import DistributedLock
+
+logger = logging.getLogger("leader-election")
+
+INSTANCE_ID    = os.getenv("INSTANCE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+RETRY_INTERVAL = 2.0   # seconds between acquire attempts as a candidate
+
+Callback = Callable[[], Awaitable[None]]
+
+
+class LeaderElector:
+
+    def __init__(
+        self,
+        redis,
+        key: str,
+        ttl: float,
+        on_elected: Optional[Callback] = None,
+        on_demoted: Optional[Callback] = None,
+        instance_id: str = INSTANCE_ID,
+        retry_interval: float = RETRY_INTERVAL,
+    ):
+        """
+        redis: raw redis.asyncio client, or None for single-replica mode
+        """
+        self.instance_id    = instance_id
+        self.lock           = DistributedLock(redis, key, ttl, owner=instance_id) if redis else None
+        self.on_elected     = on_elected
+        self.on_demoted     = on_demoted
+        self.renew_interval = ttl / 3
+        self.retry_interval = retry_interval
+
+        self._leader = False
+        self._task: Optional[asyncio.Task] = None
+
+    # ──────────────────────────────────────────────────────────
+    # PUBLIC API
+    # ──────────────────────────────────────────────────────────
+
+    @property
+    def is_leader(self) -> bool:
+        if self.lock is None:
+            return self._leader
+        return self._leader and self.lock.held
+
+    @property
+    def token(self) -> Optional[int]:
+        return self.lock.token if self.lock else None
+
+    async def fence_ok(self) -> bool:
+        """True if we lead and no newer leader has been elected since."""
+        if self.lock is None:
+            return self._leader
+        if not self.is_leader:
+            return False
+        try:
+            return await self.lock.current_token() == self.lock.token
+        except Exception as e:
+            logger.warning(f"Fence check failed: {e}")
+            return False
+
+    # ──────────────────────────────────────────────────────────
+    # LIFECYCLE
+    # ──────────────────────────────────────────────────────────
+
+    def start(self) -> None:
+        if self._task:
+            logger.warning("LeaderElector already running — ignoring start()")
+            return
+        self._task = asyncio.create_task(self._run(), name="leader-election")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._leader:
+            await self._demote(reason="shutdown")
+            if self.lock is not None:
+                try:
+                    await self.lock.release()
+                except Exception as e:
+                    logger.warning(f"Leader lease release failed: {e} — it will expire")
+
+    async def _run(self) -> None:
+        if self.lock is None:
+            await self._elect()
+            return
+
+        while True:
+            try:
+                if self._leader:
+                    if not await self.lock.renew():
+                        await self._demote(reason="lease lost")
+                elif await self.lock.acquire():
+                    await self._elect()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Leader election Redis error: {e}")
+                # Can't renew — step down once the lease ends by our clock
+                if self._leader and not self.lock.held:
+                    await self._demote(reason="lease expired")
+            await asyncio.sleep(self.renew_interval if self._leader else self.retry_interval)
+
+    async def _elect(self) -> None:
+        self._leader = True
+        metrics.inc("leader_elections")
+        metrics.set_gauge("leader", 1)
+        logger.info(
+            "Elected leader",
+            extra={"extra_data": {"instance": self.instance_id, "token": self.token}},
+        )
+        await self._call(self.on_elected)
+
+    async def _demote(self, reason: str) -> None:
+        self._leader = False
+        metrics.set_gauge("leader", 0)
+        logger.warning(
+            f"No longer leader — {reason}",
+            extra={"extra_data": {"instance": self.instance_id}},
+        )
+        await self._call(self.on_demoted)
+
+    async def _call(self, callback: Optional[Callback]) -> None:
+        if callback is None:
+            return
+        try:
+            await callback()
+        except Exception as e:
+            logger.error(f"Leader transition callback failed: {e}", exc_info=True)
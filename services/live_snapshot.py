@@ -0,0 +1,374 @@
+"""
+services/live_snapshot.py
+────────────────────────────────────────────────────────────────
+One shared view of which tracked streamers are live.
+
+The watchdog (TwitchMonitor.run_safety_check), the title tracker
+(LiveCommandsCog._title_change_loop), /live list, /live stats and
+/status each used to read the streamers table and call
+get_streams_by_ids on their own timer or per invocation — the same
+/streams pages fetched three or four times a cycle.
+
+LiveSnapshotService polls once per LIVE_SNAPSHOT_INTERVAL: one DB read
+for the tracked ids (plus KNOWN_STREAMERS), one batched /streams fetch
+(TwitchAPI.fetch_streams), and publishes the result as an immutable
+LiveSnapshot. Consumers either read the latest one —
+
+    snap = await app_state.live_snapshot.get(max_age=30)
+
+— which only hits Twitch if the snapshot is older than `max_age` (and
+then once, however many callers ask), or wait for the next one:
+
+    snap = await app_state.live_snapshot.wait_for_update(snap.version)
+
+With a PollScheduler (services/poll_scheduler) the service polls per
+broadcaster instead: every LIVE_SNAPSHOT_TICK it fetches only the ids
+that are due — live and uncovered streamers every minute, dormant ones
+every 15 — and merges them into a new snapshot; everyone else carries
+over from the previous one. refresh() still polls everything.
+
+Replicas: only the leader runs the poll loop. After every tick it
+publishes the snapshot to Redis (PUBLISHED_KEY); on the other replicas
+get() — and the watchdog, through published() — read that copy
+instead of polling Helix themselves, so /streams traffic and the
+per-streamer schedule stay the same however many replicas run.
+
+EventSub online / offline handlers call note_stream_event(), which
+makes that broadcaster due at once (via DUE_KEY when another replica
+polls), and each entry's polled_at says when it was last confirmed —
+so a dormant streamer's go-live isn't left looking offline for
+minutes.
+
+Env:
+  LIVE_SNAPSHOT_INTERVAL   seconds between full polls, and between
+                           reloads of the tracked list (default 60)
+  LIVE_SNAPSHOT_TICK       scheduler tick in seconds (default 10)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from services import metrics
+from services.poll_scheduler import HINTS_REFRESH
+
+logger = logging.getLogger("live-snapshot")
+
+LIVE_SNAPSHOT_INTERVAL = int(os.getenv("LIVE_SNAPSHOT_INTERVAL", "60"))
+LIVE_SNAPSHOT_TICK     = int(os.getenv("LIVE_SNAPSHOT_TICK", "10"))
+
+PUBLISHED_KEY = "live-snapshot:published"
+DUE_KEY       = "live-snapshot:due"         # ids other replicas saw change, for the poller
+
+
+@dataclass(frozen=True)
+class LiveSnapshot:
+    """Live streams at `fetched_at`. Treat the stream dicts as read-only."""
+    streams:    Mapping[str, dict]          # lowercase login -> Helix stream object
+    tracked:    frozenset = frozenset()     # user ids that were polled
+    version:    int       = 0
+    fetched_at: float     = 0.0             # unix seconds
+    by_id:      Mapping[str, dict] = field(default_factory=lambda: MappingProxyType({}))
+    polled_at:  Mapping[str, float] = field(default_factory=lambda: MappingProxyType({}))  # user id -> poll start
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def is_live(self, login: str) -> bool:
+        return login.lower() in self.streams
+
+    def get(self, login: str) -> Optional[dict]:
+        return self.streams.get(login.lower())
+
+
+async def note_stream_event(app_state, broadcaster_id, live: bool) -> None:
+    """
+    Tells the process's LiveSnapshotService (if any) about an EventSub
+    online / offline. Best-effort: never raises into the event handler.
+    """
+    service = getattr(app_state, "live_snapshot", None)
+    if service is None or not broadcaster_id:
+        return
+    try:
+        await service.note_stream_event(broadcaster_id, live)
+    except Exception as e:
+        logger.warning(f"Live snapshot stream event for {broadcaster_id} not recorded: {e}")
+
+
+class LiveSnapshotService:
+
+    def __init__(self, twitch_api, db, interval: int = LIVE_SNAPSHOT_INTERVAL, scheduler=None, redis=None):
+        """
+        twitch_api: services.twitch_api.TwitchAPI
+        db:         services.db.Database
+        scheduler:  services.poll_scheduler.PollScheduler, or None to
+                    poll everyone every `interval`
+        redis:      services.redis_client.RedisClient to share snapshots
+                    between replicas, or None (single replica)
+        """
+        self.twitch_api = twitch_api
+        self.db         = db
+        self.interval   = interval
+        self.scheduler  = scheduler
+        self.redis      = redis
+
+        self._snapshot: Optional[LiveSnapshot] = None
+        self._updated   = asyncio.Condition()
+        self._poll_lock = asyncio.Lock()
+        self._tracked: set[str] = set()
+        self._synced_at = 0.0
+        self._ticked_at = 0.0
+        self._hints_task: Optional[asyncio.Task] = None
+        self._refreshing: Optional[asyncio.Task] = None
+        self._task:       Optional[asyncio.Task] = None
+        self._remote:     Optional[tuple[tuple, LiveSnapshot]] = None   # last published copy read
+
+    # ──────────────────────────────────────────────────────────
+    # READERS
+    # ──────────────────────────────────────────────────────────
+
+    @property
+    def snapshot(self) -> Optional[LiveSnapshot]:
+        """The latest snapshot without waiting — None before the first poll."""
+        return self._snapshot
+
+    async def get(self, max_age: Optional[float] = None) -> LiveSnapshot:
+        """
+        The latest snapshot, refreshed first if there is none yet or it
+        is older than `max_age` seconds.
+        """
+        if not self.polling and self.redis is not None:
+            published = await self.published(max_age)
+            if published is not None:
+                return published
+            # No leader has published lately — poll here rather than fail
+        snap = self._snapshot
+        if snap is None or (max_age is not None and self._staleness(snap) > max_age):
+            return await self.refresh()
+        metrics.inc("live_snapshot_reads")
+        return snap
+
+    @property
+    def polling(self) -> bool:
+        """True while this process runs the poll loop (see start())."""
+        return self._task is not None
+
+    def _staleness(self, snap: LiveSnapshot) -> float:
+        # Scheduled mode deliberately leaves dormant streamers unpolled for
+        # minutes; the snapshot is current as long as the ticks keep coming
+        if self.scheduler is not None and self._task is not None:
+            return time.time() - self._ticked_at
+        return snap.age
+
+    async def published(self, max_age: Optional[float] = None) -> Optional[LiveSnapshot]:
+        """
+        The snapshot the polling replica last published, or None if
+        there is none or its poll loop hasn't ticked for `max_age`.
+        Never polls Twitch.
+        """
+        if self.redis is None:
+            return None
+        payload = await self.redis.get_json(PUBLISHED_KEY)
+        if not payload:
+            return None
+        if max_age is not None and time.time() - payload["ticked_at"] > max_age:
+            metrics.inc("live_snapshot_published_stale")
+            return None
+
+        ident = (payload["version"], payload["fetched_at"])
+        if self._remote is not None and self._remote[0] == ident:
+            return self._remote[1]
+        by_id = {str(s["user_id"]): s for s in payload["streams"]}
+        snap = LiveSnapshot(
+            streams=MappingProxyType({s["user_login"].lower(): s for s in by_id.values()}),
+            tracked=frozenset(payload["tracked"]),
+            version=payload["version"],
+            fetched_at=payload["fetched_at"],
+            by_id=MappingProxyType(by_id),
+            polled_at=MappingProxyType(payload.get("polled_at") or {}),
+        )
+        self._remote = (ident, snap)
+        metrics.inc("live_snapshot_published_reads")
+        return snap
+
+    async def _publish(self) -> None:
+        snap = self._snapshot
+        if self.redis is None or snap is None:
+            return
+        await self.redis.set_json(
+            PUBLISHED_KEY,
+            {
+                "version":    snap.version,
+                "fetched_at": snap.fetched_at,
+                "ticked_at":  time.time(),
+                "tracked":    sorted(snap.tracked),
+                "streams":    list(snap.by_id.values()),
+                "polled_at":  dict(snap.polled_at),
+            },
+            ttl=max(self.interval, LIVE_SNAPSHOT_TICK) * 5,
+        )
+
+    async def note_stream_event(self, broadcaster_id: str, live: bool) -> None:
+        """
+        An EventSub stream.online / stream.offline arrived. The scheduler
+        may not poll this broadcaster again for up to DORMANT_INTERVAL, so
+        it is made due now — here if this replica polls, otherwise via
+        DUE_KEY for the polling replica's next tick.
+        """
+        bid = str(broadcaster_id)
+        if self.polling:
+            if self.scheduler is not None:
+                self.scheduler.mark(bid, live)
+        elif self.redis is not None:
+            await self.redis.sadd(DUE_KEY, bid)
+        metrics.inc("live_snapshot_stream_events")
+
+    async def wait_for_update(self, after_version: int) -> LiveSnapshot:
+        """Blocks until a snapshot newer than `after_version` is published."""
+        async with self._updated:
+            await self._updated.wait_for(
+                lambda: self._snapshot is not None and self._snapshot.version > after_version
+            )
+            return self._snapshot
+
+    # ──────────────────────────────────────────────────────────
+    # POLLING
+    # ──────────────────────────────────────────────────────────
+
+    def start(self) -> None:
+        if self._task:
+            logger.warning("LiveSnapshotService already running — ignoring start()")
+            return
+        self._task = asyncio.create_task(self._run(), name="live-snapshot")
+
+    async def stop(self) -> None:
+        tasks = [t for t in (self._task, self._hints_task) if t]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if self.scheduler is None:
+                    await self.refresh()
+                else:
+                    await self._tick()
+                await self._publish()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Live snapshot poll failed: {e}", exc_info=True)
+            await asyncio.sleep(self.interval if self.scheduler is None else LIVE_SNAPSHOT_TICK)
+
+    async def _tick(self) -> None:
+        """Scheduled mode: polls only the broadcasters that are due."""
+        now = time.time()
+        if now - self._synced_at >= self.interval:
+            self._tracked = await self._tracked_ids()
+            self.scheduler.sync(self._tracked)
+            self._synced_at = now
+        hints_running = self._hints_task is not None and not self._hints_task.done()
+        if now - self.scheduler.hints_refreshed_at >= HINTS_REFRESH and not hints_running:
+            # Schedule lookups are one call per streamer — never block polling
+            self._hints_task = asyncio.create_task(self._refresh_hints())
+
+        if self.redis is not None:
+            # Broadcasters whose EventSub notifications landed on other replicas
+            for bid in await self.redis.spop(DUE_KEY, 500):
+                self.scheduler.mark(bid)
+
+        due = self.scheduler.due()
+        if due:
+            await self._poll(due)
+        self._ticked_at = time.time()
+
+    async def _refresh_hints(self) -> None:
+        try:
+            await self.scheduler.refresh_hints(self.db, self.twitch_api)
+        except Exception as e:
+            # Retried next round; intervals fall back to live/EventSub state
+            self.scheduler.hints_refreshed_at = time.time()
+            logger.warning(f"Poll scheduler hint refresh failed: {e}")
+
+    async def refresh(self) -> LiveSnapshot:
+        """Polls now. Concurrent callers share one poll."""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._poll())
+        return await asyncio.shield(self._refreshing)
+
+    async def _tracked_ids(self) -> set[str]:
+        from commands.live_commands import KNOWN_STREAMERS
+
+        rows = await self.db.fetch("SELECT DISTINCT twitch_user_id FROM streamers")
+        ids  = {str(r["twitch_user_id"]) for r in rows if r["twitch_user_id"]}
+        ids.update(str(uid) for uid in KNOWN_STREAMERS.values() if uid)
+        return ids
+
+    async def _poll(self, only: Optional[list[str]] = None) -> LiveSnapshot:
+        """
+        Polls `only` those ids (merged over the previous snapshot), or
+        every tracked id when None.
+        """
+        async with self._poll_lock:
+            if only is None:
+                self._tracked = await self._tracked_ids()
+                if self.scheduler is not None:
+                    self.scheduler.sync(self._tracked)
+                polled = set(self._tracked)
+            else:
+                polled = set(only) & self._tracked
+            started = time.time()
+            fetch = await self.twitch_api.fetch_streams(list(polled))
+
+            # Carry over the streams of broadcasters not polled this time
+            previous = self._snapshot.by_id if self._snapshot and only is not None else {}
+            by_id = {
+                uid: stream for uid, stream in previous.items()
+                if uid in self._tracked and uid not in polled
+            }
+            by_id.update((str(s["user_id"]), s) for s in fetch.streams)
+
+            if self.scheduler is not None:
+                for uid in polled:
+                    self.scheduler.reschedule(uid, live=uid in by_id)
+
+            # When each entry was last confirmed — a stream event written
+            # after it is newer than anything this snapshot says
+            previous_at = self._snapshot.polled_at if self._snapshot and only is not None else {}
+            polled_at = {uid: at for uid, at in previous_at.items() if uid in self._tracked}
+            polled_at.update((uid, started) for uid in polled)
+
+            streams = {s["user_login"].lower(): s for s in by_id.values()}
+            version = (self._snapshot.version if self._snapshot else 0) + 1
+            snap = LiveSnapshot(
+                streams=MappingProxyType(streams),
+                tracked=frozenset(self._tracked),
+                version=version,
+                fetched_at=time.time(),
+                by_id=MappingProxyType(by_id),
+                polled_at=MappingProxyType(polled_at),
+            )
+
+            async with self._updated:
+                self._snapshot = snap
+                self._updated.notify_all()
+
+        metrics.inc("live_snapshot_refreshes")
+        metrics.inc("live_snapshot_polled", len(polled))
+        metrics.set_gauge("live_snapshot_live", len(streams))
+        logger.debug(
+            f"Live snapshot v{version}: {len(streams)}/{len(self._tracked)} live, "
+            f"{len(polled)} polled",
+            extra={"extra_data": {
+                "chunks":    fetch.chunks,
+                "elapsed_s": round(fetch.elapsed, 2),
+            }},
+        )
+        return snap
@@ -0,0 +1,175 @@
+"""
+services/message_handles.py
+────────────────────────────────────────────────────────────────
+Handles to the announcement messages we edit later.
+
+Every edit path used to read a bare message id from Redis, then
+channel.fetch_message() it before editing — two REST calls per update,
+and the fetch only existed to get an object to call .edit() on (plus,
+for the first-follower shoutout, the current embed).
+
+A MessageHandle stores what an edit needs: channel id, message id and
+the last embed payload we sent. Edits go through a PartialMessage built
+from the handle (no REST call) and the outbox; the first-follower
+shoutout rebuilds the embed from the stored payload. Only when Discord
+answers NotFound — the message was deleted — is anything re-sent, and
+only where the caller asks for it (resend=True).
+
+Handles live in a small local LRU and in Redis under the keys the bot
+already used for message ids:
+
+  stream:msg:{login}:{guild_id}       live announcement
+  stream:offline:{login}:{guild_id}   offline post (VOD refresh edits it)
+
+Values are JSON; a bare id written by an older build still reads,
+given the channel it was posted in.
+
+Loading a handle from Redis also primes the outbox render cache with
+its embed, so a no-op edit after a restart is still skipped.
+
+Env:
+  MESSAGE_HANDLE_TTL   seconds a handle is kept (default 6h)
+"""
+
+import logging
+import os
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+import discord
+
+from services import discord_outbox, metrics
+
+logger = logging.getLogger("message-handles")
+
+HANDLE_TTL       = int(os.getenv("MESSAGE_HANDLE_TTL", "21600"))
+LOCAL_HANDLE_MAX = 1024
+
+
+def live_key(login: str, guild_id: int) -> str:     return f"stream:msg:{login}:{guild_id}"
+def offline_key(login: str, guild_id: int) -> str:  return f"stream:offline:{login}:{guild_id}"
+
+
+@dataclass
+class MessageHandle:
+    channel_id: int
+    message_id: int
+    embed:      Optional[dict] = None      # Embed.to_dict() of the last embed sent
+
+    @classmethod
+    def from_json(cls, value, channel_id: Optional[int] = None) -> Optional["MessageHandle"]:
+        if isinstance(value, dict):
+            return cls(int(value["channel_id"]), int(value["message_id"]), value.get("embed"))
+        if isinstance(value, (int, str)) and str(value).isdigit() and channel_id:
+            return cls(int(channel_id), int(value))     # bare id from an older build
+        return None
+
+    def embed_object(self) -> Optional[discord.Embed]:
+        return discord.Embed.from_dict(self.embed) if self.embed else None
+
+
+class MessageHandleStore:
+
+    def __init__(self, bot, redis=None, ttl: int = HANDLE_TTL):
+        """
+        bot:   discord client (for channels and the outbox)
+        redis: services.redis_client.RedisClient, or None (local only)
+        """
+        self.bot   = bot
+        self.redis = redis
+        self.ttl   = ttl
+        self._local: OrderedDict[str, MessageHandle] = OrderedDict()
+
+    # ──────────────────────────────────────────────────────────
+    # STORE
+    # ──────────────────────────────────────────────────────────
+
+    async def get(self, key: str, channel_id: Optional[int] = None) -> Optional[MessageHandle]:
+        """
+        The handle stored under `key`. `channel_id` is only used to read
+        a bare message id left by an older build.
+        """
+        handle = self._local.get(key)
+        if handle is not None:
+            self._local.move_to_end(key)
+            return handle
+        if self.redis is None:
+            return None
+
+        handle = MessageHandle.from_json(await self.redis.get_json(key), channel_id)
+        if handle is None:
+            return None
+        self._cache(key, handle)
+        outbox = getattr(getattr(self.bot, "app_state", None), "discord_outbox", None)
+        if outbox is not None and handle.embed:
+            outbox.prime(handle.message_id, embed=handle.embed_object())
+        return handle
+
+    async def remember(self, key: str, message, embed: Optional[discord.Embed] = None) -> MessageHandle:
+        """Stores a handle to `message`; keeps the old embed payload if `embed` is None."""
+        previous = self._local.get(key)
+        payload  = embed.to_dict() if embed is not None else None
+        if payload is None and previous and previous.message_id == message.id:
+            payload = previous.embed
+        handle = MessageHandle(message.channel.id, message.id, payload)
+        self._cache(key, handle)
+        if self.redis is not None:
+            await self.redis.set_json(key, asdict(handle), ttl=self.ttl)
+        return handle
+
+    async def forget(self, key: str) -> None:
+        self._local.pop(key, None)
+        if self.redis is not None:
+            await self.redis.delete(key)
+
+    def _cache(self, key: str, handle: MessageHandle) -> None:
+        self._local[key] = handle
+        self._local.move_to_end(key)
+        while len(self._local) > LOCAL_HANDLE_MAX:
+            self._local.popitem(last=False)
+
+    # ──────────────────────────────────────────────────────────
+    # SEND / EDIT
+    # ──────────────────────────────────────────────────────────
+
+    async def send(self, key: str, channel, priority: int, **kwargs):
+        """Sends through the outbox and stores the handle under `key`."""
+        message = await discord_outbox.send(self.bot, channel, priority, **kwargs)
+        await self.remember(key, message, kwargs.get("embed"))
+        return message
+
+    async def edit(
+        self,
+        key: str,
+        priority: int,
+        *,
+        resend: bool = False,
+        channel_id: Optional[int] = None,
+        **kwargs,
+    ):
+        """
+        Edits the message stored under `key` without fetching it. Returns
+        the message, or None if there is no handle — or the message is
+        gone and `resend` is False.
+        """
+        handle = await self.get(key, channel_id)
+        if handle is None:
+            return None
+
+        channel = self.bot.get_channel(handle.channel_id) or self.bot.get_partial_messageable(handle.channel_id)
+        try:
+            message = await discord_outbox.edit(
+                self.bot, channel.get_partial_message(handle.message_id), priority, **kwargs
+            )
+        except discord.NotFound:
+            metrics.inc("message_handles_not_found")
+            await self.forget(key)
+            if not resend:
+                return None
+            logger.info(f"Message behind {key} is gone — sending a new one")
+            return await self.send(key, channel, priority, **kwargs)
+
+        metrics.inc("message_handles_edits")
+        await self.remember(key, message, kwargs.get("embed"))
+        return message
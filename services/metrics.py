@@ -19,5 +19,29 @@ def inc(name: str, value: int = 1):
         logger.warning(f"Metrics inc failed: {e}")
 
 
+def set_gauge(name: str, value: float):
+    """
+    Point-in-time value (queue depth, in-flight count, ...)
+    """
+
+    _metrics[name] = value
+
+
+def observe(name: str, value: float):
+    """
+    Records a timing/size sample as count / sum / max under
+    `{name}_count`, `{name}_sum` and `{name}_max`.
+    """
+
+    try:
+        _metrics[f"{name}_count"] = _metrics.get(f"{name}_count", 0) + 1
+        _metrics[f"{name}_sum"]   = _metrics.get(f"{name}_sum", 0.0) + value
+        if value > _metrics.get(f"{name}_max", 0.0):
+            _metrics[f"{name}_max"] = value
+
+    except Exception as e:
+        logger.warning(f"Metrics observe failed: {e}")
+
+
 def get_metrics():
     return _metrics
@@ -8,6 +8,7 @@ import discord
  
 from core.event_bus import event_bus
 from db.guild_settings import get_guild_config
+from services import discord_outbox
  
 logger = logging.getLogger("notifier")
  
@@ -166,9 +167,9 @@ async def handle_free_games(
 
             for i in range(0, len(embeds), 10):
                 chunk = embeds[i:i + 10]
-                await retry_async(lambda c=chunk: channel.send(embeds=c))
+                await retry_async(lambda c=chunk: discord_outbox.send(bot, channel, discord_outbox.DEALS, embeds=c))
 
-            await retry_async(lambda: channel.send(summary))
+            await retry_async(lambda: discord_outbox.send(bot, channel, discord_outbox.DEALS, content=summary))
             logger.info(f"✅ Notified {guild.name} — {count} {label}")
  
         except discord.Forbidden:
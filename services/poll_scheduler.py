@@ -0,0 +1,280 @@
+"""
+services/poll_scheduler.py
+────────────────────────────────────────────────────────────────
+Adaptive per-broadcaster polling schedule.
+
+Polling every tracked streamer at one fixed cadence spends most of the
+Helix budget on channels that have not streamed in months, while the
+ones that matter — live right now, or without a working EventSub
+subscription — wait as long as everyone else.
+
+PollScheduler gives every broadcaster its own next-due time, kept in a
+min-heap (stale heap entries are skipped lazily), and picks the next
+interval from what it knows about them:
+
+  live                                  LIVE_INTERVAL      60s
+  EventSub missing / revoked            UNCOVERED_INTERVAL 60s
+  inside a likely go-live window        WINDOW_INTERVAL    60s
+  streamed within ACTIVE_DAYS           ACTIVE_INTERVAL    120s
+  no stream within DORMANT_DAYS         DORMANT_INTERVAL   15min
+  anyone else                           IDLE_INTERVAL      5min
+
+Likely go-live windows come from two sources, refreshed every
+HINTS_REFRESH:
+  - stream_history: starts over the last HISTORY_DAYS bucketed by hour
+    of the week; an hour (±1) holding WINDOW_MIN_STARTS or more starts
+    is a window
+  - the Twitch schedule: WINDOW_LEAD before to WINDOW_LEAD after each
+    upcoming segment
+
+due() hands back everything that is due; the caller fetches those in
+100-id batches (TwitchAPI.fetch_streams) and reports each result back
+through reschedule(). Used by services/live_snapshot.LiveSnapshotService.
+EventSub go-lives and offlines reach it through mark(), which makes the
+broadcaster due at once.
+"""
+
+import asyncio
+import heapq
+import logging
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, Optional
+
+from services import helix_ratelimit, metrics
+
+logger = logging.getLogger("poll-scheduler")
+
+LIVE_INTERVAL      = 60
+UNCOVERED_INTERVAL = 60
+WINDOW_INTERVAL    = 60
+ACTIVE_INTERVAL    = 120
+IDLE_INTERVAL      = 5 * 60
+DORMANT_INTERVAL   = 15 * 60
+
+ACTIVE_DAYS        = 7
+DORMANT_DAYS       = 30
+HISTORY_DAYS       = 56        # eight weeks of start times
+WINDOW_MIN_STARTS  = 2         # starts in an hour-of-week bucket to call it a window
+WINDOW_LEAD        = 30 * 60   # seconds around a scheduled segment start
+HINTS_REFRESH      = 6 * 3600
+SCHEDULE_CONCURRENCY = 4
+
+HOURS_PER_WEEK = 7 * 24
+
+
+def _hour_of_week(dt: datetime) -> int:
+    return dt.weekday() * 24 + dt.hour
+
+
+class PollScheduler:
+
+    def __init__(self, uncovered: Optional[Callable[[], set[str]]] = None):
+        """
+        uncovered: returns broadcaster ids without a working EventSub
+                   subscription (revoked, or failed to create)
+        """
+        self.uncovered = uncovered or (lambda: set())
+
+        self._heap: list[tuple[float, str]] = []
+        self._due:  dict[str, float] = {}    # authoritative next-due time per id
+        self._live: set[str] = set()
+
+        # Hints, refreshed by refresh_hints()
+        self._last_start:   dict[str, datetime] = {}
+        self._hot_hours:    dict[str, set[int]] = {}
+        self._segments:     dict[str, list[float]] = {}   # upcoming starts, unix
+        self.hints_refreshed_at = 0.0
+
+    # ──────────────────────────────────────────────────────────
+    # QUEUE
+    # ──────────────────────────────────────────────────────────
+
+    def sync(self, broadcaster_ids: Iterable[str]) -> None:
+        """Adds new broadcasters (due now) and forgets removed ones."""
+        wanted = set(broadcaster_ids)
+        now    = time.time()
+        for bid in wanted - self._due.keys():
+            self._push(bid, now)
+        for bid in self._due.keys() - wanted:
+            del self._due[bid]          # heap entry is skipped when popped
+            self._live.discard(bid)
+        metrics.set_gauge("poll_scheduler_tracked", len(self._due))
+
+    def due(self, now: Optional[float] = None) -> list[str]:
+        """Pops every broadcaster whose time has come."""
+        now = now or time.time()
+        ready = []
+        while self._heap and self._heap[0][0] <= now:
+            at, bid = heapq.heappop(self._heap)
+            if self._due.get(bid) == at:
+                ready.append(bid)
+                # Stays known until rescheduled; a lost result re-polls soon
+                self._due[bid] = now + IDLE_INTERVAL
+                heapq.heappush(self._heap, (self._due[bid], bid))
+        return ready
+
+    def reschedule(self, bid: str, live: bool, now: Optional[float] = None) -> float:
+        """Records a poll result for `bid` and returns its next interval."""
+        if bid not in self._due:
+            return 0.0
+        now = now or time.time()
+        if live:
+            self._live.add(bid)
+        else:
+            self._live.discard(bid)
+        interval = self.interval_for(bid, now)
+        # A little jitter keeps a big startup cohort from staying in lockstep
+        self._push(bid, now + interval * random.uniform(0.9, 1.0))
+        return interval
+
+    def mark(self, bid: str, live: Optional[bool] = None) -> None:
+        """
+        An EventSub online / offline for `bid`: records the state (None
+        keeps it) and makes it due now, so the snapshot entry is
+        replaced next tick rather than at the end of a dormant interval.
+        """
+        if bid not in self._due:
+            return
+        if live is True:
+            self._live.add(bid)
+        elif live is False:
+            self._live.discard(bid)
+        self._push(bid, time.time())
+        metrics.inc("poll_scheduler_marked")
+
+    def next_due_in(self) -> Optional[float]:
+        """Seconds until the earliest broadcaster is due, or None if empty."""
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return max(0.0, self._heap[0][0] - time.time()) if self._heap else None
+
+    def _push(self, bid: str, at: float) -> None:
+        self._due[bid] = at
+        heapq.heappush(self._heap, (at, bid))
+
+    # ──────────────────────────────────────────────────────────
+    # INTERVALS
+    # ──────────────────────────────────────────────────────────
+
+    def interval_for(self, bid: str, now: Optional[float] = None) -> int:
+        now = now or time.time()
+        if bid in self._live:
+            return LIVE_INTERVAL
+        if bid in self.uncovered():
+            return UNCOVERED_INTERVAL
+        if self._in_window(bid, now):
+            return WINDOW_INTERVAL
+
+        last = self._last_start.get(bid)
+        if last is None:
+            # Never seen live: dormant once we have history to judge by
+            return DORMANT_INTERVAL if self.hints_refreshed_at else IDLE_INTERVAL
+        days = (datetime.fromtimestamp(now, timezone.utc) - last).days
+        if days < ACTIVE_DAYS:
+            return ACTIVE_INTERVAL
+        if days >= DORMANT_DAYS:
+            return DORMANT_INTERVAL
+        return IDLE_INTERVAL
+
+    def _in_window(self, bid: str, now: float) -> bool:
+        if any(abs(now - start) <= WINDOW_LEAD for start in self._segments.get(bid, ())):
+            return True
+        hot = self._hot_hours.get(bid)
+        if not hot:
+            return False
+        hour = _hour_of_week(datetime.fromtimestamp(now, timezone.utc))
+        return bool(hot & {hour, (hour + 1) % HOURS_PER_WEEK})
+
+    def stats(self) -> dict:
+        counts: dict[int, int] = defaultdict(int)
+        now = time.time()
+        for bid in self._due:
+            counts[self.interval_for(bid, now)] += 1
+        return {"tracked": len(self._due), "live": len(self._live), "by_interval": dict(counts)}
+
+    # ──────────────────────────────────────────────────────────
+    # HINTS
+    # ──────────────────────────────────────────────────────────
+
+    async def refresh_hints(self, db, twitch_api=None) -> None:
+        """Reloads stream_history windows and, if given an API, Twitch schedules."""
+        await self._load_history(db)
+        if twitch_api is not None:
+            await self._load_schedules(twitch_api)
+        self.hints_refreshed_at = time.time()
+        logger.info(
+            "Poll scheduler hints refreshed",
+            extra={"extra_data": {
+                "with_history":  len(self._last_start),
+                "with_windows":  sum(1 for h in self._hot_hours.values() if h),
+                "with_schedule": sum(1 for s in self._segments.values() if s),
+            }},
+        )
+
+    async def _load_history(self, db) -> None:
+        rows = await db.fetch(
+            """
+            SELECT DISTINCT s.twitch_user_id, h.started_at
+            FROM stream_history h
+            JOIN streamers s ON lower(s.twitch_login) = lower(h.twitch_login)
+            WHERE h.started_at > NOW() - make_interval(days => $1)
+            """,
+            HISTORY_DAYS,
+        )
+
+        last:  dict[str, datetime] = {}
+        seen:  set[tuple[str, str, int]] = set()
+        hours: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        for r in rows:
+            bid, started = str(r["twitch_user_id"]), r["started_at"]
+            if not bid or started is None:
+                continue
+            if started.tzinfo is None:
+                started = started.replace(tzinfo=timezone.utc)
+            if bid not in last or started > last[bid]:
+                last[bid] = started
+            # One start per streamer per day+hour — each guild writes its own row
+            key = (bid, started.date().isoformat(), started.hour)
+            if key in seen:
+                continue
+            seen.add(key)
+            hours[bid][_hour_of_week(started)] += 1
+
+        self._last_start = last
+        self._hot_hours = {
+            bid: {h for h, n in buckets.items() if n >= WINDOW_MIN_STARTS}
+            for bid, buckets in hours.items()
+        }
+
+    async def _load_schedules(self, twitch_api) -> None:
+        """Upcoming schedule segments — background priority, one call each."""
+        horizon = datetime.now(timezone.utc) + timedelta(seconds=HINTS_REFRESH + WINDOW_LEAD)
+        sem     = asyncio.Semaphore(SCHEDULE_CONCURRENCY)
+
+        async def load(bid: str) -> tuple[str, list[float]]:
+            async with sem:
+                try:
+                    data = await twitch_api.request(
+                        "schedule", params=[("broadcaster_id", bid), ("first", 5)],
+                    )
+                except Exception as e:
+                    logger.debug(f"Schedule lookup failed for {bid}: {e}")
+                    return bid, []
+            starts = []
+            for seg in ((data or {}).get("data") or {}).get("segments") or []:
+                if seg.get("canceled_until"):
+                    continue
+                try:
+                    start = datetime.fromisoformat(seg["start_time"].replace("Z", "+00:00"))
+                except (KeyError, ValueError):
+                    continue
+                if start <= horizon:
+                    starts.append(start.timestamp())
+            return bid, starts
+
+        with helix_ratelimit.priority(helix_ratelimit.BACKGROUND):
+            results = await asyncio.gather(*(load(bid) for bid in list(self._due)))
+        self._segments = {bid: starts for bid, starts in results if starts}
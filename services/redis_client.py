@@ -60,6 +60,23 @@ class RedisClient:
             )
             return False
 
+    async def set_nx(self, key: str, value: Any, ttl: int = 300) -> Optional[bool]:
+        """
+        SET key value NX EX ttl — atomic "claim this key".
+        Returns True if the key was created, False if it already existed,
+        None on error / no-op so callers can decide whether to fail open.
+        """
+        if not self.redis:
+            return None
+        try:
+            return bool(await self.redis.set(key, value, ex=ttl, nx=True))
+        except Exception as e:
+            logger.warning(
+                "Redis SET NX failed",
+                extra={"extra_data": {"key": key, "error": str(e)}},
+            )
+            return None
+
     async def delete(self, *keys: str) -> int:
         """
         Deletes one or more keys.
@@ -140,6 +157,119 @@ class RedisClient:
             )
             return False
 
+    # ──────────────────────────────────────────────────────────
+    # HASH HELPERS
+    # ──────────────────────────────────────────────────────────
+
+    async def hgetall(self, key: str) -> dict[str, str]:
+        """All fields of a hash as decoded strings; {} if missing or on error."""
+        if not self.redis:
+            return {}
+        try:
+            raw = await self.redis.hgetall(key)
+            return {
+                (k.decode("utf-8") if isinstance(k, bytes) else k):
+                (v.decode("utf-8") if isinstance(v, bytes) else v)
+                for k, v in (raw or {}).items()
+            }
+        except Exception as e:
+            logger.warning(
+                "Redis HGETALL failed",
+                extra={"extra_data": {"key": key, "error": str(e)}},
+            )
+            return {}
+
+    async def mget(self, keys: list[str]) -> list[Optional[str]]:
+        """Decoded values for `keys` in one round trip; None for missing keys or on error."""
+        if not self.redis or not keys:
+            return [None] * len(keys)
+        try:
+            values = await self.redis.mget(keys)
+            return [v.decode("utf-8") if isinstance(v, bytes) else v for v in values]
+        except Exception as e:
+            logger.warning(
+                "Redis MGET failed",
+                extra={"extra_data": {"keys": len(keys), "error": str(e)}},
+            )
+            return [None] * len(keys)
+
+    async def hgetall_many(self, keys: list[str]) -> list[dict[str, str]]:
+        """hgetall for every key, pipelined into one round trip."""
+        if not self.redis or not keys:
+            return [{} for _ in keys]
+        try:
+            pipe = self.redis.pipeline()
+            for key in keys:
+                pipe.hgetall(key)
+            raw = await pipe.execute()
+            return [
+                {
+                    (k.decode("utf-8") if isinstance(k, bytes) else k):
+                    (v.decode("utf-8") if isinstance(v, bytes) else v)
+                    for k, v in (h or {}).items()
+                }
+                for h in raw
+            ]
+        except Exception as e:
+            logger.warning(
+                "Redis pipelined HGETALL failed",
+                extra={"extra_data": {"keys": len(keys), "error": str(e)}},
+            )
+            return [{} for _ in keys]
+
+    async def hset(self, key: str, mapping: dict, ttl: int = 300) -> bool:
+        """Replaces the hash at `key` with `mapping`, expiring after `ttl`."""
+        if not self.redis or not mapping:
+            return False
+        try:
+            pipe = self.redis.pipeline()
+            pipe.delete(key)
+            pipe.hset(key, mapping=mapping)
+            pipe.expire(key, ttl)
+            await pipe.execute()
+            return True
+        except Exception as e:
+            logger.warning(
+                "Redis HSET failed",
+                extra={"extra_data": {"key": key, "error": str(e)}},
+            )
+            return False
+
+    # ──────────────────────────────────────────────────────────
+    # SET HELPERS
+    # ──────────────────────────────────────────────────────────
+
+    async def sadd(self, key: str, *members: str, ttl: int = 300) -> bool:
+        """Adds `members` to the set at `key` and (re)sets its TTL."""
+        if not self.redis or not members:
+            return False
+        try:
+            pipe = self.redis.pipeline()
+            pipe.sadd(key, *members)
+            pipe.expire(key, ttl)
+            await pipe.execute()
+            return True
+        except Exception as e:
+            logger.warning(
+                "Redis SADD failed",
+                extra={"extra_data": {"key": key, "error": str(e)}},
+            )
+            return False
+
+    async def spop(self, key: str, count: int) -> list[str]:
+        """Removes and returns up to `count` members; [] if empty or on error."""
+        if not self.redis:
+            return []
+        try:
+            raw = await self.redis.spop(key, count)
+            return [m.decode("utf-8") if isinstance(m, bytes) else m for m in (raw or [])]
+        except Exception as e:
+            logger.warning(
+                "Redis SPOP failed",
+                extra={"extra_data": {"key": key, "error": str(e)}},
+            )
+            return []
+
     # ──────────────────────────────────────────────────────────
     # HEALTHCHECK
     # ──────────────────────────────────────────────────────────
@@ -185,6 +315,10 @@ class _RedisProxy:
         c = self._client()
         return await c.set(key, value, ttl=ttl) if c else False
 
+    async def set_nx(self, key: str, value, ttl: int = 300):
+        c = self._client()
+        return await c.set_nx(key, value, ttl=ttl) if c else None
+
     async def delete(self, *keys: str) -> int:
         c = self._client()
         return await c.delete(*keys) if c else 0
@@ -0,0 +1,178 @@
+"""
+services/replica_ring.py
+────────────────────────────────────────────────────────────────
+Splits the tracked broadcasters between bot replicas.
+
+Every replica heartbeats into one Redis sorted set (member = instance
+id, score = last beat) and reads the set back; members that haven't
+beaten for HEARTBEAT_TTL are dropped. Each broadcaster id belongs to
+the member with the highest hash(member, id) — rendezvous hashing — so
+when a replica joins or leaves only the ids it gains or held move, and
+every other assignment stays put.
+
+Handoff: replicas notice a membership change up to one heartbeat apart.
+For HANDOFF_GRACE after a change a replica keeps only the ids it owns
+under both the old and the new membership — the losing side lets go at
+once, the gaining side waits out the grace, so no id is handled twice.
+Moving ids go unchecked for at most the grace period; nothing is
+dropped for longer.
+
+A replica that can't reach Redis for HEARTBEAT_TTL owns nothing: by
+then the others have dropped it and taken over its ids. Without Redis
+there is one replica and it owns everything.
+
+TwitchMonitor filters its watchdog pass through owns(), so watchdog
+cost per replica shrinks with the number of replicas.
+
+Env:
+  REPLICA_HEARTBEAT_INTERVAL   seconds between heartbeats (default 5)
+  REPLICA_HEARTBEAT_TTL        seconds until a silent replica is dropped (default 15)
+  REPLICA_HANDOFF_GRACE        seconds a gained id waits after a change (default 10)
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from typing import Iterable, Optional
+
+from services import metrics
+
+logger = logging.getLogger("replica-ring")
+
+HEARTBEAT_INTERVAL = float(os.getenv("REPLICA_HEARTBEAT_INTERVAL", "5"))
+HEARTBEAT_TTL      = float(os.getenv("REPLICA_HEARTBEAT_TTL", "15"))
+HANDOFF_GRACE      = float(os.getenv("REPLICA_HANDOFF_GRACE", "10"))
+
+RING_KEY = "twitch-monitor:replicas"
+
+
+def _score(member: str, key: str) -> int:
+    digest = hashlib.blake2b(f"{member}|{key}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def owner(key: str, members: Iterable[str]) -> Optional[str]:
+    """The member `key` is assigned to (rendezvous hashing)."""
+    return max(members, key=lambda m: _score(m, key), default=None)
+
+
+class ReplicaRing:
+
+    def __init__(
+        self,
+        redis,
+        instance_id: str,
+        key: str = RING_KEY,
+        interval: float = HEARTBEAT_INTERVAL,
+        ttl: float = HEARTBEAT_TTL,
+        grace: float = HANDOFF_GRACE,
+    ):
+        """
+        redis: raw redis.asyncio client, or None for a single replica
+        """
+        self.redis       = redis
+        self.instance_id = instance_id
+        self.key         = key
+        self.interval    = interval
+        self.ttl         = ttl
+        self.grace       = grace
+
+        self.members:  frozenset = frozenset({instance_id})
+        self._previous: frozenset = self.members
+        self._changed_at = 0.0      # monotonic
+        self._beat_at    = 0.0      # monotonic, last successful heartbeat
+        self._task: Optional[asyncio.Task] = None
+
+    # ──────────────────────────────────────────────────────────
+    # OWNERSHIP
+    # ──────────────────────────────────────────────────────────
+
+    def owns(self, key: str) -> bool:
+        if self.redis is None:
+            return True
+        now = time.monotonic()
+        if now - self._beat_at > self.ttl:
+            return False
+        if owner(key, self.members) != self.instance_id:
+            return False
+        if now - self._changed_at < self.grace:
+            return owner(key, self._previous) == self.instance_id
+        return True
+
+    def shard(self, keys: Iterable[str]) -> list[str]:
+        """The subset of `keys` this replica handles right now."""
+        return [k for k in keys if self.owns(k)]
+
+    def stats(self) -> dict:
+        return {
+            "instance":  self.instance_id,
+            "members":   sorted(self.members),
+            "in_grace":  time.monotonic() - self._changed_at < self.grace,
+        }
+
+    # ──────────────────────────────────────────────────────────
+    # HEARTBEAT
+    # ──────────────────────────────────────────────────────────
+
+    async def start(self) -> None:
+        if self.redis is None:
+            return
+        if self._task:
+            logger.warning("ReplicaRing already running — ignoring start()")
+            return
+        try:
+            await self.beat()
+        except Exception as e:
+            logger.warning(f"Replica heartbeat failed: {e}")
+        # Joining is a handoff too: others still own our ids until their
+        # next heartbeat shows us, so take nothing until the grace is over
+        self._previous   = frozenset()
+        self._changed_at = time.monotonic()
+        self._task = asyncio.create_task(self._run(), name="replica-ring")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.redis is not None:
+            try:
+                # Leave now rather than after HEARTBEAT_TTL
+                await self.redis.zrem(self.key, self.instance_id)
+            except Exception as e:
+                logger.warning(f"Replica deregistration failed: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.beat()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Replica heartbeat failed: {e}")
+
+    async def beat(self) -> None:
+        """Heartbeats, drops silent replicas and reloads the membership."""
+        now = time.time()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zadd(self.key, {self.instance_id: now})
+            pipe.zremrangebyscore(self.key, "-inf", now - self.ttl)
+            pipe.zrange(self.key, 0, -1)
+            _, _, raw = await pipe.execute()
+        self._beat_at = time.monotonic()
+
+        members = frozenset(m.decode() if isinstance(m, bytes) else m for m in raw)
+        if members != self.members:
+            joined, left = members - self.members, self.members - members
+            self._previous   = self.members
+            self.members     = members
+            self._changed_at = time.monotonic()
+            metrics.inc("replica_ring_changes")
+            logger.info(
+                f"Replica ring now {len(members)} member(s)",
+                extra={"extra_data": {"joined": sorted(joined), "left": sorted(left)}},
+            )
+        metrics.set_gauge("replica_ring_members", len(members))
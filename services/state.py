@@ -20,6 +20,7 @@ class AppState:
         # =========================
         self.db: Optional[Any] = None
         self.cache: Optional[Any] = None
+        self.streamer_index = None      # streamer → subscribed guilds
 
         # =========================
         # REDIS / CACHE CLIENT
@@ -29,13 +30,32 @@ class AppState:
         # =========================
         # API CLIENTS
         # =========================
+        self.twitch_auth = None
         self.twitch_api = None
+        self.user_cache = None
+        self.live_snapshot = None
+        self.leader = None
+        self.replica_ring = None
         self.eventsub_manager = None
+        self.eventsub_reconciler = None
+
+        # =========================
+        # EVENTSUB INTAKE
+        # (bounded worker pool fed by the webhook)
+        # =========================
+        self.eventsub_dispatcher = None
+        self.eventsub_dedup = None
+        self.eventsub_journal = None
+        self.eventsub_revocations = None
 
         # =========================
         # DISCORD BOT REFERENCE
+        # (outbox: prioritised send / edit lanes;
+        #  message_handles: edit targets without fetches)
         # =========================
         self.bot = None
+        self.discord_outbox = None
+        self.message_handles = None
 
         # =========================
         # EVENT SYSTEM (ASYNC)
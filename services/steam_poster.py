@@ -15,6 +15,7 @@ from services.steam import fetch_steam_discounts
 from services.diff_engine import diff_games
 from constants import PLATFORM_COLORS, STEAM_UPDATE_INTERVAL, STEAM_MIN_DISCOUNT
 from db.guild_settings import get_guild_config
+from services import discord_outbox
 
 logger = logging.getLogger("steam-poster")
 
@@ -140,7 +141,7 @@ async def _notify_guilds(bot: discord.Client, new_games: List[Dict]) -> None:
             if not channel:
                 continue
 
-            await channel.send(embed=embed)
+            await discord_outbox.send(bot, channel, discord_outbox.DEALS, embed=embed)
             logger.info(
                 f"Steam: posted {len(qualifying)} deals to {guild.name}"
             )
@@ -0,0 +1,281 @@
+"""
+services/streamer_index.py
+────────────────────────────────────────────────────────────────
+Which guilds to notify for a broadcaster.
+
+The stream.online / stream.offline / channel.update handlers used to
+walk bot.guilds on every event, awaiting a config read (and, going
+live, a streamers upsert) per guild — O(guilds) database work per
+event, most of it for guilds that don't track the streamer at all.
+
+StreamerIndex inverts the `streamers` table: broadcaster id and login
+→ the guilds tracking it, each as a Subscription carrying what the
+handlers need from the guild's config (channel, ping role, flags).
+It is read once at startup and then kept current by:
+
+  /live add, /live remove   write-through (add / remove)
+  guild config changes      db.guild_settings config listener
+  streamers table changes   a trigger (see db/migrations) NOTIFYs
+                            STREAMERS_CHANNEL with the guild id —
+                            from any replica, the seeder or a manual
+                            edit — and that guild's rows are re-read
+
+Until load() has run, or while the listener connection is down,
+loaded is False and callers fall back to walking bot.guilds.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Mapping, Optional
+
+from db.guild_settings import add_config_listener, get_guild_config
+from services import metrics
+
+logger = logging.getLogger("streamer-index")
+
+STREAMERS_CHANNEL = "streamers_changed"
+
+
+@dataclass(frozen=True)
+class Subscription:
+    guild_id:       int
+    login:          str
+    twitch_user_id: Optional[str]
+    channel_id:     Optional[int]     # streamer's target channel, else the guild's announce channel
+    ping_role_id:   Optional[int]
+    enable_ping:    bool = True
+    notify_enabled: bool = True
+
+    @classmethod
+    def build(
+        cls,
+        guild_id: int,
+        login: str,
+        twitch_user_id: Optional[str],
+        config: Mapping,
+        target_channel_id: Optional[int] = None,
+    ) -> "Subscription":
+        return cls(
+            guild_id       = guild_id,
+            login          = login,
+            twitch_user_id = twitch_user_id or None,
+            channel_id     = target_channel_id or config.get("announce_channel_id"),
+            ping_role_id   = config.get("ping_role_id"),
+            enable_ping    = bool(config.get("enable_ping", True)),
+            notify_enabled = bool(config.get("notify_enabled", True)),
+        )
+
+
+@dataclass(frozen=True)
+class _Tracked:
+    login:             str
+    twitch_user_id:    Optional[str]
+    target_channel_id: Optional[int]
+
+
+class StreamerIndex:
+
+    def __init__(self, db):
+        """
+        db: services.db.Database
+        """
+        self.db = db
+        self.loaded = False
+
+        # Source rows: guild_id → {login: _Tracked}
+        self._tracked: dict[int, dict[str, _Tracked]] = {}
+        # Guild configs seen, so a config change can rebuild one guild
+        self._configs: dict[int, Mapping] = {}
+
+        self._by_id:    dict[str, tuple[Subscription, ...]] = {}
+        self._by_login: dict[str, tuple[Subscription, ...]] = {}
+
+        self._listener = None
+        self._tasks: set = set()
+        add_config_listener(self._on_config_changed)
+
+    # ──────────────────────────────────────────────────────────
+    # LOOKUP
+    # ──────────────────────────────────────────────────────────
+
+    def lookup(self, broadcaster_id: Optional[str], login: str) -> list[Subscription]:
+        """
+        The guilds tracking this broadcaster. Rows stored without an id
+        (or under an old login) are still found through the other key.
+        """
+        subs  = list(self._by_id.get(str(broadcaster_id), ())) if broadcaster_id else []
+        seen  = {s.guild_id for s in subs}
+        subs += [s for s in self._by_login.get(login.lower(), ()) if s.guild_id not in seen]
+        metrics.observe("streamer_index_fanout", len(subs))
+        return subs
+
+    def stats(self) -> dict:
+        return {
+            "loaded":       self.loaded,
+            "guilds":       len(self._tracked),
+            "broadcasters": len(self._by_id),
+            "logins":       len(self._by_login),
+        }
+
+    # ──────────────────────────────────────────────────────────
+    # LOAD
+    # ──────────────────────────────────────────────────────────
+
+    async def load(self) -> int:
+        """Reads every tracked streamer; returns the number of rows indexed."""
+        rows = await self.db.fetch(
+            "SELECT guild_id, twitch_user_id, twitch_login, target_channel_id FROM streamers"
+        )
+        tracked: dict[int, dict[str, _Tracked]] = {}
+        for row in rows:
+            tracked.setdefault(row["guild_id"], {})[row["twitch_login"].lower()] = _Tracked(
+                row["twitch_login"].lower(), row["twitch_user_id"] or None, row["target_channel_id"],
+            )
+
+        configs = {}
+        for guild_id in tracked:
+            config = await get_guild_config(guild_id)
+            if config is not None:
+                configs[guild_id] = config
+
+        self._tracked = tracked
+        self._configs = configs
+        self._rebuild()
+        self.loaded = True
+        logger.info(
+            "Streamer index loaded",
+            extra={"extra_data": {"rows": len(rows), **self.stats()}},
+        )
+        return len(rows)
+
+    async def refresh_guild(self, guild_id: int) -> None:
+        """Re-reads one guild's tracked streamers."""
+        rows = await self.db.fetch(
+            "SELECT twitch_user_id, twitch_login, target_channel_id FROM streamers WHERE guild_id = $1",
+            guild_id,
+        )
+        tracked = {
+            row["twitch_login"].lower(): _Tracked(
+                row["twitch_login"].lower(), row["twitch_user_id"] or None, row["target_channel_id"],
+            )
+            for row in rows
+        }
+        if tracked:
+            self._tracked[guild_id] = tracked
+            if guild_id not in self._configs:
+                config = await get_guild_config(guild_id)
+                if config is not None:
+                    self._configs[guild_id] = config
+        else:
+            self._tracked.pop(guild_id, None)
+        self._rebuild()
+
+    # ──────────────────────────────────────────────────────────
+    # WRITE-THROUGH
+    # ──────────────────────────────────────────────────────────
+
+    async def add(
+        self,
+        guild_id: int,
+        login: str,
+        twitch_user_id: Optional[str] = None,
+        target_channel_id: Optional[int] = None,
+    ) -> None:
+        """Call after inserting / updating a streamers row."""
+        login = login.lower()
+        self._tracked.setdefault(guild_id, {})[login] = _Tracked(login, twitch_user_id or None, target_channel_id)
+        if guild_id not in self._configs:
+            config = await get_guild_config(guild_id)
+            if config is not None:
+                self._configs[guild_id] = config
+        self._rebuild()
+
+    def remove(self, guild_id: int, login: str) -> None:
+        """Call after deleting a streamers row."""
+        tracked = self._tracked.get(guild_id)
+        if tracked and tracked.pop(login.lower(), None) is not None:
+            if not tracked:
+                del self._tracked[guild_id]
+            self._rebuild()
+
+    def _on_config_changed(self, guild_id: int, config: Optional[Mapping]) -> None:
+        if config is None:
+            if self._configs.pop(guild_id, None) is not None:
+                self._rebuild()
+        elif guild_id in self._tracked:
+            self._configs[guild_id] = config
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        # A few hundred rows at most — rebuilding both maps beats patching them
+        by_id:    dict[str, list[Subscription]] = {}
+        by_login: dict[str, list[Subscription]] = {}
+        for guild_id, tracked in self._tracked.items():
+            config = self._configs.get(guild_id)
+            if config is None:
+                continue            # unconfigured guilds were never notified
+            for t in tracked.values():
+                sub = Subscription.build(guild_id, t.login, t.twitch_user_id, config, t.target_channel_id)
+                by_login.setdefault(t.login, []).append(sub)
+                if t.twitch_user_id:
+                    by_id.setdefault(str(t.twitch_user_id), []).append(sub)
+        self._by_id    = {k: tuple(v) for k, v in by_id.items()}
+        self._by_login = {k: tuple(v) for k, v in by_login.items()}
+        metrics.set_gauge("streamer_index_broadcasters", len(self._by_id))
+
+    # ──────────────────────────────────────────────────────────
+    # INVALIDATION
+    # ──────────────────────────────────────────────────────────
+
+    async def start_listener(self) -> None:
+        """LISTENs for STREAMERS_CHANNEL so rows changed anywhere reach the index."""
+        if self._listener is not None:
+            return
+        self._listener = await self.db.listen(STREAMERS_CHANNEL, self._on_notify, self._on_listener_lost)
+
+    async def stop_listener(self) -> None:
+        if self._listener is not None:
+            conn, self._listener = self._listener, None
+            await conn.close()
+        for task in list(self._tasks):
+            task.cancel()
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _on_notify(self, conn, pid, channel, payload) -> None:
+        try:
+            guild_id = int(payload)
+        except (TypeError, ValueError):
+            return
+        self._spawn(self._refresh_logged(guild_id))
+
+    async def _refresh_logged(self, guild_id: int) -> None:
+        try:
+            await self.refresh_guild(guild_id)
+        except Exception as e:
+            logger.warning(f"Streamer index refresh failed for guild {guild_id}: {e}")
+
+    def _on_listener_lost(self, conn) -> None:
+        # Without notifications the index can go stale — fall back instead
+        if self._listener is conn:
+            self._listener = None
+            self.loaded    = False
+            logger.warning("Streamer index listener lost — falling back to guild scans")
+            self._spawn(self._resume())
+
+    async def _resume(self, delay: float = 5.0) -> None:
+        """Re-LISTENs and reloads, backing off until the database is back."""
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await self.start_listener()
+                await self.load()
+                logger.info("Streamer index listener restored")
+                return
+            except Exception as e:
+                logger.warning(f"Streamer index listener reconnect failed: {e}")
+                delay = min(delay * 2, 300)
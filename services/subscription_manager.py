@@ -1,7 +1,8 @@
 import os
-import aiohttp
 import logging
 
+from core.state_manager import state
+
 logger = logging.getLogger("subscription-manager")
 
 # ---------------------------------------------------
@@ -27,24 +28,9 @@ def build_endpoint(public_base_url: str) -> str:
 # ---------------------------------------------------
 
 async def get_app_token(client_id: str, client_secret: str) -> str:
-
-    url = "https://id.twitch.tv/oauth2/token"
-
-    params = {
-        "client_id": client_id,
-        "client_secret": client_secret,
-        "grant_type": "client_credentials",
-    }
-
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, params=params) as resp:
-            data = await resp.json()
-
-            if "access_token" not in data:
-                logger.error("Failed to get app token: %s", data)
-                raise RuntimeError("Twitch token error")
-
-            return data["access_token"]
+    # Shared, proactively refreshed token (services/twitch_auth.py) —
+    # no token request or new ClientSession per call
+    return await state.get_twitch_auth().get_token()
 
 
 async def get_existing_subscriptions(token: str, client_id: str):
@@ -56,9 +42,9 @@ async def get_existing_subscriptions(token: str, client_id: str):
         "Authorization": f"Bearer {token}",
     }
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers) as resp:
-            return await resp.json()
+    session = state.get_twitch_auth().session
+    async with session.get(url, headers=headers) as resp:
+        return await resp.json()
 
 
 async def create_subscription(
@@ -90,11 +76,11 @@ async def create_subscription(
         },
     }
 
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, headers=headers, json=payload) as resp:
-            data = await resp.json()
-            logger.info("Subscription response: %s", data)
-            return data
+    session = state.get_twitch_auth().session
+    async with session.post(url, headers=headers, json=payload) as resp:
+        data = await resp.json()
+        logger.info("Subscription response: %s", data)
+        return data
 
 
 # ---------------------------------------------------
@@ -1,59 +1,196 @@
-import os
-import time
 import asyncio
 import logging
+import os
+import random
+import re
+import time
 import aiohttp
-from typing import List, Optional, Dict, Any
+from dataclasses import dataclass, field
+from typing import AsyncIterator, List, Optional, Dict, Any
+
+from services import helix_ratelimit, metrics
+from services.helix_batcher import HelixBatcher, HelixUnavailable
+from services.helix_ratelimit import HelixRateLimiter
+from services.twitch_auth import TwitchAuth
 
 logger = logging.getLogger("twitch-api")
 
-TOKEN_URL = "https://id.twitch.tv/oauth2/token"
 HELIX     = "https://api.twitch.tv/helix"
 
+MAX_RETRIES = 3      # 429 / 5xx / network retries per request
+RETRY_BASE  = 0.5    # seconds; full-jitter backoff for 5xx and network errors
+RETRY_CAP   = 8.0
+
+STREAMS_CONCURRENCY = int(os.getenv("HELIX_STREAMS_CONCURRENCY", "4"))   # 100-id chunks in flight
+
+# What Helix accepts — anything else fails the whole batched request with a 400
+_LOGIN_RE   = re.compile(r"^[a-z0-9_]{1,25}$")
+_USER_ID_RE = re.compile(r"^[0-9]{1,20}$")
+
+
+@dataclass
+class StreamsFetch:
+    """Result of fetch_streams: the merged streams and where the time went."""
+    streams:       List[Dict]  = field(default_factory=list)
+    chunks:        int         = 0
+    pages:         int         = 0
+    elapsed:       float       = 0.0
+    chunk_seconds: List[float] = field(default_factory=list)
+
+
+def _request_key(endpoint: str, params) -> tuple:
+    """
+    (endpoint, params) normalized so equivalent calls collide: dict and
+    list-of-tuples forms, param order and int vs str values all match.
+    """
+    if not params:
+        return (endpoint, ())
+    items = params.items() if isinstance(params, dict) else params
+    return (endpoint, tuple(sorted((str(k), str(v)) for k, v in items)))
+
+
+def _valid_login(login: str) -> bool:
+    return _LOGIN_RE.fullmatch(login) is not None
+
+
+def _valid_user_id(user_id: str) -> bool:
+    return _USER_ID_RE.fullmatch(user_id) is not None
+
+
+def _rank(level: str) -> int:
+    """0 for live — lower is more urgent."""
+    return helix_ratelimit.PRIORITIES.index(level)
+
+
 class TwitchAPI:
-    def __init__(self, session: aiohttp.ClientSession):
+    def __init__(self, session: aiohttp.ClientSession, auth: Optional[TwitchAuth] = None):
         self.session = session
-        self.client_id     = os.getenv("TWITCH_CLIENT_ID")
-        self.client_secret = os.getenv("TWITCH_CLIENT_SECRET")
+        # Shared token service (AppState.twitch_auth); a private one if
+        # constructed standalone, e.g. from a script
+        self.auth      = auth or TwitchAuth(session)
+        self.client_id = self.auth.client_id
+        # One bucket per app token — EventSubManager shares it in webhook mode
+        self.ratelimit = HelixRateLimiter("helix")
+        # Single flight: identical GETs in progress, keyed by _request_key,
+        # with the priority each one is waiting at
+        self._inflight: Dict[tuple, tuple[asyncio.Task, str]] = {}
 
-        if not self.client_id or not self.client_secret:
-            raise RuntimeError("TWITCH_CLIENT_ID and TWITCH_CLIENT_SECRET must be set")
+        self._users_by_login   = HelixBatcher(
+            self, "users", "login", "login", normalize=str.lower, validate=_valid_login,
+        )
+        self._users_by_id      = HelixBatcher(self, "users", "id", "id", validate=_valid_user_id)
+        # /streams pages at 20 by default; 100 keys need first=100 to fit one page
+        self._streams_by_login = HelixBatcher(
+            self, "streams", "user_login", "user_login",
+            normalize=str.lower, validate=_valid_login, extra_params=[("first", 100)],
+        )
 
-        self._token  = None
-        self._expiry = 0
-        self._lock   = asyncio.Lock()
+        # services.user_cache.UserCache, attached by main once Redis is up
+        self.user_cache = None
 
     async def get_token(self) -> str:
-        """Fetches and caches the OAuth2 token for Twitch API access."""
-        async with self._lock:
-            now = time.time()
-            if self._token and now < self._expiry:
-                return self._token
+        """Returns the shared, proactively refreshed app access token."""
+        return await self.auth.get_token()
+
+    async def request(
+        self,
+        endpoint: str,
+        params: Optional[List[tuple]] = None,
+        priority: Optional[str] = None,
+    ) -> Any:
+        """
+        Authorized GET against Helix. Returns the JSON body, or None if
+        Twitch kept answering 429/5xx after MAX_RETRIES retries.
+
+        Identical requests already in flight are not sent again: every
+        caller awaits the same round trip and gets the same parsed body,
+        so treat the result as read-only.
+
+        Waits on the shared rate limiter first; `priority` overrides the
+        class set by helix_ratelimit.priority() for this call only.
+        """
+        key   = _request_key(endpoint, params)
+        level = priority or helix_ratelimit.current_priority()
+        entry = self._inflight.get(key)
+        # Join it unless it waits at a lower priority than ours — a live
+        # handler must not queue behind a background fan-out's request
+        if entry is not None and _rank(entry[1]) <= _rank(level):
+            task = entry[0]
+            metrics.inc("helix_coalesced_hits")
+        else:
+            metrics.inc("helix_coalesced_misses")
+            task = asyncio.create_task(self._request(endpoint, params, level))
+            self._inflight[key] = (task, level)
+            task.add_done_callback(lambda t: self._forget(key, t))
+        # shield(): one caller giving up must not cancel it for the rest
+        return await asyncio.shield(task)
+
+    def _forget(self, key: tuple, task: asyncio.Task) -> None:
+        entry = self._inflight.get(key)
+        if entry is not None and entry[0] is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()   # retrieved even if every caller was cancelled
+
+    def stats(self) -> dict:
+        snapshot = metrics.get_metrics()
+        return {
+            "coalesced": snapshot.get("helix_coalesced_hits", 0),
+            "sent":      snapshot.get("helix_coalesced_misses", 0),
+            "inflight":  len(self._inflight),
+            **self.ratelimit.stats(),
+        }
+
+    async def _request(self, endpoint: str, params, priority: Optional[str]) -> Any:
+        url    = f"{HELIX}/{endpoint}"
+        metric = "helix_" + endpoint.replace("/", "_")
+        token  = await self.get_token()
+        refreshed = False
+        attempt   = 0
+
+        while True:
+            await self.ratelimit.acquire(priority)
+            headers = {"Client-ID": self.client_id, "Authorization": f"Bearer {token}"}
+            started = time.monotonic()
             try:
-                async with self.session.post(
-                    TOKEN_URL,
-                    data={
-                        "client_id":     self.client_id,
-                        "client_secret": self.client_secret,
-                        "grant_type":    "client_credentials",
-                    },
-                    timeout=aiohttp.ClientTimeout(total=10),
-                ) as resp:
-                    data = await resp.json()
-                    self._token  = data["access_token"]
-                    self._expiry = now + data["expires_in"] - 60
-                    return self._token
-            except Exception as e:
-                logger.error(f"Failed to fetch Twitch token: {e}")
-                raise
-
-    async def request(self, endpoint: str, params: Optional[List[tuple]] = None) -> Any:
-        """Helper to perform authorized requests to Twitch Helix API."""
-        token = await self.get_token()
-        headers = {"Client-ID": self.client_id, "Authorization": f"Bearer {token}"}
-        url = f"{HELIX}/{endpoint}"
-        async with self.session.get(url, params=params, headers=headers) as resp:
-            return await resp.json()
+                async with self.session.get(url, params=params, headers=headers) as resp:
+                    self.ratelimit.update(resp.headers)
+                    if resp.status == 401 and not refreshed:
+                        # Revoked early — one refresh shared by every caller that saw it
+                        refreshed = True
+                        token = await self.auth.invalidate(token)
+                        continue
+                    if resp.status == 429:
+                        # The limiter holds every caller until Ratelimit-Reset
+                        self.ratelimit.exhausted(resp.headers.get("Ratelimit-Reset"))
+                        metrics.inc(f"{metric}_throttled")
+                        delay = 0.0
+                    elif resp.status >= 500:
+                        delay = random.uniform(0, min(RETRY_CAP, RETRY_BASE * 2 ** attempt))
+                    else:
+                        return await resp.json()
+                    reason = f"HTTP {resp.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt >= MAX_RETRIES:
+                    metrics.inc(f"{metric}_errors")
+                    raise
+                delay  = random.uniform(0, min(RETRY_CAP, RETRY_BASE * 2 ** attempt))
+                reason = f"{type(e).__name__}: {e}"
+            finally:
+                metrics.observe(f"{metric}_seconds", time.monotonic() - started)
+
+            if attempt >= MAX_RETRIES:
+                metrics.inc(f"{metric}_errors")
+                logger.warning(
+                    f"Helix {endpoint} failed after {attempt + 1} attempts — {reason}",
+                    extra={"extra_data": {"params": str(params)[:200]}},
+                )
+                return None
+
+            attempt += 1
+            metrics.inc(f"{metric}_retries")
+            logger.debug(f"Helix {endpoint} {reason} — retry {attempt}/{MAX_RETRIES} in {delay:.1f}s")
+            await asyncio.sleep(delay)
 
     # ──────────────────────────────────────────────────────────
     # WATCHDOG BATCH FETCHING
@@ -63,49 +200,114 @@ class TwitchAPI:
         Fetch live stream data for a list of user IDs in batches of 100.
         Optimized for the Watchdog loop to check multiple streamers at once.
         """
-        if not user_ids:
-            return []
-        
-        all_live = []
-        # Twitch API limits to 100 IDs per request; process in chunks
-        for i in range(0, len(user_ids), 100):
-            chunk = user_ids[i:i + 100]
-            params = [("user_id", uid) for uid in chunk]
-            
-            data = await self.request("streams", params=params)
-            if data and "data" in data:
-                all_live.extend(data["data"])
-                
-        return all_live
+        return (await self.fetch_streams(user_ids)).streams
+
+    async def fetch_streams(self, user_ids: List[str]) -> StreamsFetch:
+        """get_streams_by_ids plus a timing breakdown of the fetch."""
+        result  = StreamsFetch()
+        started = time.monotonic()
+        async for streams, pages, seconds in self._stream_chunks(user_ids):
+            result.streams.extend(streams)
+            result.chunks += 1
+            result.pages  += pages
+            result.chunk_seconds.append(seconds)
+        result.elapsed = time.monotonic() - started
+        if result.chunks:
+            metrics.observe("helix_streams_fetch_seconds", result.elapsed)
+        return result
+
+    async def iter_streams_by_ids(self, user_ids: List[str]) -> AsyncIterator[List[Dict]]:
+        """
+        Streaming get_streams_by_ids: yields each chunk's live streams as
+        soon as it arrives (in completion order), so consumers can start
+        diffing before the slowest chunk lands.
+        """
+        async for streams, _, _ in self._stream_chunks(user_ids):
+            yield streams
+
+    async def _stream_chunks(self, user_ids: List[str]) -> AsyncIterator[tuple]:
+        """(streams, pages, seconds) per 100-id chunk, STREAMS_CONCURRENCY at a time."""
+        # Twitch API limits to 100 IDs per request; fetch chunks in parallel
+        ids    = list(dict.fromkeys(str(uid) for uid in user_ids if uid))
+        chunks = [ids[i:i + 100] for i in range(0, len(ids), 100)]
+        if not chunks:
+            return
+
+        sem = asyncio.Semaphore(STREAMS_CONCURRENCY)
+
+        async def run(chunk: List[str]) -> tuple:
+            async with sem:
+                return await self._fetch_stream_chunk(chunk)
+
+        tasks = [asyncio.create_task(run(chunk)) for chunk in chunks]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Consumer stopped early or a chunk failed — drop the rest
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _fetch_stream_chunk(self, chunk: List[str]) -> tuple:
+        # /streams pages even when filtered by user_id, so follow the cursor
+        started = time.monotonic()
+        streams: List[Dict] = []
+        cursor  = None
+        pages   = 0
+        while True:
+            params = [("user_id", uid) for uid in chunk] + [("first", 100)]
+            if cursor:
+                params.append(("after", cursor))
+            data   = await self.request("streams", params=params)
+            pages += 1
+            if data is None or "data" not in data:
+                # A failed call must not read as "nobody in this chunk is live"
+                raise HelixUnavailable("Helix streams gave up after retries")
+            if not data["data"]:
+                break
+            streams.extend(data["data"])
+            cursor = (data.get("pagination") or {}).get("cursor")
+            if not cursor:
+                break
+        return streams, pages, time.monotonic() - started
 
     # ──────────────────────────────────────────────────────────
     # MISSING METHODS ADDED FOR LIVE COMMANDS
     # ──────────────────────────────────────────────────────────
+    # Single-key lookups go through micro-batchers (services/helix_batcher):
+    # concurrent callers within a few ms share one /users or /streams call.
     async def get_stream_metadata(self, username: str) -> Optional[Dict]:
-        """Fetches live stream metadata for a specific user login."""
-        data = await self.request("streams", params=[("user_login", username)])
-        if data and data.get("data"):
-            # Return the first stream object if they are live
-            return data["data"][0]
-        return None
+        """Fetches live stream metadata for a specific user login (None if offline)."""
+        return await self._streams_by_login.load(username)
 
     async def get_user(self, username: str) -> Optional[Dict]:
         """Fetches a single user's profile data."""
-        data = await self.request("users", params=[("login", username)])
-        if data and data.get("data"):
-            return data["data"][0]
-        return None
+        if self.user_cache is not None:
+            return await self.user_cache.get_by_login(username)
+        return await self._users_by_login.load(username)
+
+    async def get_user_by_login(self, login: str) -> Optional[Dict]:
+        """Alias of get_user — the name most commands call."""
+        return await self.get_user(login)
+
+    async def get_user_by_id(self, user_id: str) -> Optional[Dict]:
+        """Fetches a single user's profile data by Twitch user id."""
+        if self.user_cache is not None:
+            return await self.user_cache.get_by_id(user_id)
+        return await self._users_by_id.load(user_id)
 
     async def get_users_by_logins(self, logins: List[str]) -> Dict[str, Dict]:
-        """Fetches user data by logins and returns a dict mapped by login name."""
+        """Fetches user data by logins and returns a dict mapped by lowercase login."""
         if not logins:
             return {}
-        params = [("login", login) for login in logins]
-        data = await self.request("users", params=params)
-        
-        result = {}
-        if data and data.get("data"):
-            for user in data["data"]:
-                # Map the user data to their lowercase login name for easy dictionary lookups
-                result[user["login"].lower()] = user
-        return result
+        if self.user_cache is not None:
+            return await self.user_cache.get_many_by_logins(logins)
+        return await self.fetch_users_by_logins(logins)
+
+    # Uncached — what services/user_cache.UserCache itself calls
+    async def fetch_users_by_logins(self, logins: List[str]) -> Dict[str, Dict]:
+        return await self._users_by_login.load_many(logins)
+
+    async def fetch_users_by_ids(self, user_ids: List[str]) -> Dict[str, Dict]:
+        return await self._users_by_id.load_many(user_ids)
@@ -0,0 +1,192 @@
+"""
+services/twitch_auth.py
+────────────────────────────────────────────────────────────────
+One Twitch app access token for the whole process.
+
+There used to be three token flows: TwitchAPI.get_token (cached under a
+lock), EventSubManager._refresh_token (a static TWITCH_ACCESS_TOKEN,
+refreshed only after a 401) and subscription_manager.get_app_token (a
+new ClientSession and a new token on every call).
+
+TwitchAuth replaces them:
+  - get_token() is a plain attribute read while the token is fresh —
+    no lock, no await on I/O, zero added latency for Helix callers
+  - refreshes proactively, REFRESH_MARGIN before expiry, in a
+    background task, so callers never wait on the token endpoint
+  - single-flight: concurrent refreshes (a burst of 401s, or a caller
+    racing the background task) share one POST to /oauth2/token
+  - validates the token against /oauth2/validate every hour, as Twitch
+    requires, and refreshes if it was revoked early
+  - invalidate(token) for 401 handlers — only refreshes if `token` is
+    still the current one, so N callers hitting 401 cause one refresh
+
+Shared via AppState.twitch_auth and core.state_manager.state.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+import aiohttp
+
+from services import metrics
+
+logger = logging.getLogger("twitch-auth")
+
+TOKEN_URL    = "https://id.twitch.tv/oauth2/token"
+VALIDATE_URL = "https://id.twitch.tv/oauth2/validate"
+
+REFRESH_MARGIN    = 15 * 60   # refresh this long before expiry
+VALIDATE_INTERVAL = 60 * 60   # Twitch asks apps to validate hourly
+RETRY_DELAY       = 30        # after a failed background refresh
+
+
+class TwitchAuth:
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        client_id: Optional[str] = None,
+        client_secret: Optional[str] = None,
+    ):
+        self.session       = session
+        self.client_id     = client_id or os.getenv("TWITCH_CLIENT_ID")
+        self.client_secret = client_secret or os.getenv("TWITCH_CLIENT_SECRET")
+
+        if not self.client_id or not self.client_secret:
+            raise RuntimeError("TWITCH_CLIENT_ID and TWITCH_CLIENT_SECRET must be set")
+
+        self._token:  Optional[str] = None
+        self._expiry: float = 0.0           # unix seconds
+        self._last_validated: float = 0.0
+
+        self._inflight: Optional[asyncio.Task] = None
+        self._task:     Optional[asyncio.Task] = None
+
+    # ──────────────────────────────────────────────────────────
+    # PUBLIC API
+    # ──────────────────────────────────────────────────────────
+
+    async def get_token(self) -> str:
+        """A valid app access token. Only waits on I/O when none is cached."""
+        if self._token and time.time() < self._expiry:
+            return self._token
+        return await self._refresh()
+
+    async def invalidate(self, token: Optional[str]) -> str:
+        """
+        Called after a 401 with the token that was rejected. Refreshes
+        only if it is still current — otherwise someone already did.
+        """
+        if token and token != self._token:
+            return await self.get_token()
+        self._expiry = 0.0
+        return await self._refresh()
+
+    async def headers(self) -> dict:
+        """Client-ID + Bearer headers for a Helix request."""
+        return {
+            "Client-ID":     self.client_id,
+            "Authorization": f"Bearer {await self.get_token()}",
+        }
+
+    # ──────────────────────────────────────────────────────────
+    # LIFECYCLE
+    # ──────────────────────────────────────────────────────────
+
+    async def start(self) -> None:
+        """Fetches the first token and starts the refresh/validate loop."""
+        try:
+            await self.get_token()
+        except Exception as e:
+            # Not fatal — the loop keeps retrying, callers retry on demand
+            logger.error(f"Initial Twitch token fetch failed: {e}")
+        if not self._task:
+            self._task = asyncio.create_task(self._maintain(), name="twitch-auth")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _maintain(self) -> None:
+        while True:
+            now = time.time()
+            refresh_in  = self._expiry - REFRESH_MARGIN - now
+            validate_in = self._last_validated + VALIDATE_INTERVAL - now
+            await asyncio.sleep(max(1.0, min(refresh_in, validate_in)))
+
+            try:
+                if time.time() >= self._expiry - REFRESH_MARGIN:
+                    await self._refresh()
+                elif time.time() >= self._last_validated + VALIDATE_INTERVAL:
+                    if not await self._validate():
+                        await self.invalidate(self._token)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Background token maintenance failed: {e} — retrying in {RETRY_DELAY}s")
+                await asyncio.sleep(RETRY_DELAY)
+
+    # ──────────────────────────────────────────────────────────
+    # TOKEN ENDPOINTS
+    # ──────────────────────────────────────────────────────────
+
+    async def _refresh(self) -> str:
+        # Single flight: everyone awaits the same task. shield() so one
+        # cancelled caller doesn't abort the refresh for the others.
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._fetch_token())
+        return await asyncio.shield(self._inflight)
+
+    async def _fetch_token(self) -> str:
+        async with self.session.post(
+            TOKEN_URL,
+            data={
+                "client_id":     self.client_id,
+                "client_secret": self.client_secret,
+                "grant_type":    "client_credentials",
+            },
+            timeout=aiohttp.ClientTimeout(total=10),
+        ) as resp:
+            data = await resp.json()
+
+        token = data.get("access_token")
+        if resp.status != 200 or not token:
+            metrics.inc("twitch_token_refresh_failures")
+            logger.error(f"Failed to fetch Twitch token — HTTP {resp.status}: {str(data)[:200]}")
+            raise RuntimeError("Twitch token error")
+
+        now = time.time()
+        self._token          = token
+        self._expiry         = now + data.get("expires_in", 3600)
+        self._last_validated = now
+        metrics.inc("twitch_token_refreshes")
+        logger.info(
+            "Twitch app access token refreshed",
+            extra={"extra_data": {"expires_in": data.get("expires_in")}},
+        )
+        return token
+
+    async def _validate(self) -> bool:
+        """True if Twitch still accepts the current token."""
+        token = self._token
+        if not token:
+            return False
+        async with self.session.get(
+            VALIDATE_URL,
+            headers={"Authorization": f"OAuth {token}"},
+            timeout=aiohttp.ClientTimeout(total=10),
+        ) as resp:
+            if resp.status == 401:
+                logger.warning("Twitch token failed validation — refreshing")
+                return False
+            data = await resp.json()
+
+        self._last_validated = time.time()
+        if "expires_in" in data:
+            self._expiry = self._last_validated + data["expires_in"]
+        return True
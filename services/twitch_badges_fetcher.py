@@ -85,7 +85,10 @@ async def badge_fetcher_loop(app_state) -> None:
     Background task. Fetches badges once at startup, then every 24 hours.
     Waits for the bot to be ready before the first fetch.
     """
-    from services.twitch_api import TwitchAPI
+    from services import helix_ratelimit
+
+    # Everything below is refresh work — never compete with live posts
+    helix_ratelimit.set_priority(helix_ratelimit.BACKGROUND)
 
     # Wait until the bot and Twitch API are initialised
     while not app_state.is_ready:
@@ -0,0 +1,316 @@
+"""
+services/user_cache.py
+────────────────────────────────────────────────────────────────
+Tiered cache for Twitch user profiles (id, login, display_name,
+profile_image_url, ...).
+
+Profiles barely change, yet every go-live, offline, title change and
+embed refresh used to fetch them from Helix again. Lookups now go:
+
+  1. in-process LRU with TTL        no I/O
+  2. Redis hash  twitch:user:{id}   shared across restarts / replicas
+  3. Helix via TwitchAPI's batchers (100 keys per call)
+
+plus:
+  - a bidirectional login ↔ user_id index (locally and in Redis as
+    twitch:user:login:{login} → id), so either key finds the profile
+  - negative caching: a login Helix answered without is remembered for
+    USER_NEGATIVE_TTL so a typo in /schedule or a banned account is not
+    looked up on every event (a failed call caches nothing)
+  - renames: storing a profile whose id already maps to another login
+    drops the old login from the index
+
+warm(db) preloads everything in the streamers table at startup with
+100-id batches, fills in ids that are missing there or in
+KNOWN_STREAMERS (e.g. r1sky_90: None), and records renames in the DB.
+
+TwitchAPI.get_user / get_user_by_login / get_user_by_id /
+get_users_by_logins read through this cache once it is attached as
+TwitchAPI.user_cache (see main).
+
+Env:
+  USER_CACHE_TTL      seconds a profile is trusted (default 6h)
+  USER_NEGATIVE_TTL   seconds an unknown login is remembered (default 600)
+  USER_CACHE_MAX      in-process entries (default 5000)
+"""
+
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from services import metrics
+
+logger = logging.getLogger("user-cache")
+
+USER_CACHE_TTL    = int(os.getenv("USER_CACHE_TTL", str(6 * 3600)))
+USER_NEGATIVE_TTL = int(os.getenv("USER_NEGATIVE_TTL", "600"))
+USER_CACHE_MAX    = int(os.getenv("USER_CACHE_MAX", "5000"))
+
+# Helix user fields worth keeping (view_count is deprecated)
+PROFILE_FIELDS = (
+    "id", "login", "display_name", "type", "broadcaster_type",
+    "description", "profile_image_url", "offline_image_url", "created_at",
+)
+
+_MISSING = object()   # "known not to exist" marker in the local LRU
+
+
+def _user_key(user_id: str) -> str:  return f"twitch:user:{user_id}"
+def _login_key(login: str) -> str:   return f"twitch:user:login:{login}"
+
+
+class UserCache:
+
+    def __init__(
+        self,
+        api,
+        redis=None,
+        ttl: int = USER_CACHE_TTL,
+        negative_ttl: int = USER_NEGATIVE_TTL,
+        max_entries: int = USER_CACHE_MAX,
+    ):
+        """
+        api:   services.twitch_api.TwitchAPI — only its uncached
+               fetch_users_by_* methods are used
+        redis: services.redis_client.RedisClient, or None (local tier only)
+        """
+        self.api          = api
+        self.redis        = redis
+        self.ttl          = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries  = max_entries
+
+        # user_id -> (expires_at, profile); login -> (expires_at, user_id | _MISSING)
+        self._profiles: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._logins:   OrderedDict[str, tuple[float, object]] = OrderedDict()
+
+    # ──────────────────────────────────────────────────────────
+    # LOOKUPS
+    # ──────────────────────────────────────────────────────────
+
+    async def get_by_login(self, login: str) -> Optional[dict]:
+        return (await self.get_many_by_logins([login])).get(login.lower())
+
+    async def get_by_id(self, user_id: str) -> Optional[dict]:
+        return (await self.get_many_by_ids([user_id])).get(str(user_id))
+
+    async def get_many_by_logins(self, logins: Iterable[str]) -> dict[str, dict]:
+        """{lowercase login: profile} for the logins that exist."""
+        found: dict[str, dict] = {}
+        wanted = {login.lower() for login in logins if login}
+
+        misses = set()
+        for login in wanted:
+            hit = self._local_login(login)
+            if hit is _MISSING:
+                metrics.inc("user_cache_negative_hits")
+            elif hit is not None:
+                found[login] = hit
+            else:
+                misses.add(login)
+
+        misses -= await self._load_redis_logins(misses, found)
+        if misses:
+            # Raises HelixUnavailable if Twitch didn't answer — nothing is
+            # cached then, so an outage never reads as "no such user"
+            fetched = await self.api.fetch_users_by_logins(list(misses))
+            for login in misses:
+                user = fetched.get(login)
+                if user:
+                    found[login] = await self._store(user)
+                else:
+                    await self._store_missing(login)
+
+        self._count(len(wanted), len(misses))
+        return found
+
+    async def get_many_by_ids(self, user_ids: Iterable[str]) -> dict[str, dict]:
+        """{user_id: profile} for the ids that exist."""
+        found: dict[str, dict] = {}
+        wanted = {str(uid) for uid in user_ids if uid}
+
+        misses = set()
+        for uid in wanted:
+            hit = self._local_profile(uid)
+            if hit is not None:
+                found[uid] = hit
+            else:
+                misses.add(uid)
+
+        if misses and self.redis:
+            ordered  = list(misses)
+            profiles = await self.redis.hgetall_many([_user_key(uid) for uid in ordered])
+            for uid, profile in zip(ordered, profiles):
+                if profile:
+                    self._remember(profile)
+                    found[uid] = profile
+                    misses.discard(uid)
+
+        if misses:
+            fetched = await self.api.fetch_users_by_ids(list(misses))
+            for uid, user in fetched.items():
+                found[uid] = await self._store(user)
+
+        self._count(len(wanted), len(misses))
+        return found
+
+    def invalidate(self, login: Optional[str] = None, user_id: Optional[str] = None) -> None:
+        """Drops local entries, e.g. after a user.update notification."""
+        if login:
+            self._logins.pop(login.lower(), None)
+        if user_id:
+            self._profiles.pop(str(user_id), None)
+
+    # ──────────────────────────────────────────────────────────
+    # STARTUP WARM-UP
+    # ──────────────────────────────────────────────────────────
+
+    async def warm(self, db) -> int:
+        """
+        Loads every tracked streamer in 100-id batches. Resolves ids that
+        are missing in the DB or KNOWN_STREAMERS and picks up renames.
+        Returns the number of profiles cached.
+        """
+        rows = await db.fetch("SELECT DISTINCT twitch_user_id, twitch_login FROM streamers")
+        by_id     = {str(r["twitch_user_id"]): r["twitch_login"] for r in rows if r["twitch_user_id"]}
+        no_id     = {r["twitch_login"].lower() for r in rows if not r["twitch_user_id"]}
+
+        from commands import live_commands
+        from events import stream_events
+        known = [live_commands.KNOWN_STREAMERS, stream_events.KNOWN_STREAMERS]
+        for mapping in known:
+            no_id.update(login for login, uid in mapping.items() if not uid)
+
+        profiles = await self.get_many_by_ids(by_id)
+
+        # Renamed since they were added: the id is stable, the login is not
+        for uid, profile in profiles.items():
+            old = by_id[uid].lower()
+            if profile["login"] != old:
+                metrics.inc("user_cache_renames")
+                logger.info(f"Twitch user {uid} renamed {old} → {profile['login']}")
+                await db.execute(
+                    "UPDATE streamers SET twitch_login = $1 WHERE twitch_user_id = $2",
+                    profile["login"], uid,
+                )
+
+        resolved = await self.get_many_by_logins(no_id)
+        for login, profile in resolved.items():
+            await db.execute(
+                "UPDATE streamers SET twitch_user_id = $1 "
+                "WHERE lower(twitch_login) = $2 AND (twitch_user_id IS NULL OR twitch_user_id = '')",
+                profile["id"], login,
+            )
+            for mapping in known:
+                if login in mapping and not mapping[login]:
+                    mapping[login] = profile["id"]
+            logger.info(f"Resolved missing Twitch id for {login}: {profile['id']}")
+
+        for login in no_id - set(resolved):
+            logger.warning(f"Twitch user {login} not found — still without an id")
+
+        logger.info(
+            "User cache warmed",
+            extra={"extra_data": {
+                "profiles": len(profiles) + len(resolved),
+                "ids_filled": len(resolved),
+            }},
+        )
+        return len(profiles) + len(resolved)
+
+    # ──────────────────────────────────────────────────────────
+    # TIERS
+    # ──────────────────────────────────────────────────────────
+
+    def _local_profile(self, user_id: str) -> Optional[dict]:
+        entry = self._profiles.get(user_id)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._profiles[user_id]
+            return None
+        self._profiles.move_to_end(user_id)
+        return entry[1]
+
+    def _local_login(self, login: str):
+        """Profile, _MISSING, or None if the local tier doesn't know."""
+        entry = self._logins.get(login)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._logins[login]
+            return None
+        self._logins.move_to_end(login)
+        if entry[1] is _MISSING:
+            return _MISSING
+        return self._local_profile(entry[1])
+
+    async def _load_redis_logins(self, logins: set[str], found: dict) -> set[str]:
+        """Fills `found` from Redis; returns the logins it resolved."""
+        if not self.redis or not logins:
+            return set()
+        resolved = set()
+        ordered  = list(logins)
+        uids     = await self.redis.mget([_login_key(login) for login in ordered])
+
+        indexed = []
+        for login, uid in zip(ordered, uids):
+            if uid == "":
+                # Negative entry written by _store_missing
+                self._set_login(login, _MISSING, self.negative_ttl)
+                metrics.inc("user_cache_negative_hits")
+                resolved.add(login)
+            elif uid:
+                indexed.append((login, uid))
+
+        profiles = await self.redis.hgetall_many([_user_key(uid) for _, uid in indexed])
+        for (login, _), profile in zip(indexed, profiles):
+            if profile and profile.get("login") == login:
+                self._remember(profile)
+                found[login] = profile
+                resolved.add(login)
+        return resolved
+
+    async def _store(self, user: dict) -> dict:
+        profile = {f: str(user[f]) for f in PROFILE_FIELDS if user.get(f) is not None}
+        profile["login"] = profile.get("login", "").lower()
+        uid, login = profile["id"], profile["login"]
+
+        # Rename: the id used to belong to another login
+        previous = self._profiles.get(uid)
+        if previous and previous[1].get("login") != login:
+            self._logins.pop(previous[1]["login"], None)
+            if self.redis:
+                await self.redis.delete(_login_key(previous[1]["login"]))
+
+        self._remember(profile)
+        if self.redis:
+            await self.redis.hset(_user_key(uid), profile, ttl=self.ttl)
+            await self.redis.set(_login_key(login), uid, ttl=self.ttl)
+        return profile
+
+    async def _store_missing(self, login: str) -> None:
+        metrics.inc("user_cache_negative_stores")
+        self._set_login(login, _MISSING, self.negative_ttl)
+        if self.redis:
+            await self.redis.set(_login_key(login), "", ttl=self.negative_ttl)
+
+    def _remember(self, profile: dict) -> None:
+        expires = time.monotonic() + self.ttl
+        self._profiles[profile["id"]] = (expires, profile)
+        self._profiles.move_to_end(profile["id"])
+        self._set_login(profile["login"], profile["id"], self.ttl)
+        while len(self._profiles) > self.max_entries:
+            self._profiles.popitem(last=False)
+
+    def _set_login(self, login: str, value, ttl: int) -> None:
+        self._logins[login] = (time.monotonic() + ttl, value)
+        self._logins.move_to_end(login)
+        while len(self._logins) > self.max_entries:
+            self._logins.popitem(last=False)
+
+    def _count(self, wanted: int, fetched: int) -> None:
+        metrics.inc("user_cache_lookups", wanted)
+        metrics.inc("user_cache_helix_fetches", fetched)
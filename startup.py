@@ -2,11 +2,9 @@
 
 import asyncio
 import logging
-import os
 
 import discord
 
-from events.stream_events import KNOWN_STREAMERS
 
 logger = logging.getLogger("startup")
 
@@ -117,56 +115,29 @@ async def startup_sync(bot) -> None:
                 logger.warning(f"Could not fetch streamers for {guild.name}: {e}")
                 streamers = []
 
-            # EventSub (optional)
-            eventsub = getattr(app_state, "eventsub_manager", None)
-
-            if eventsub:
-                callback_url = (
-                    os.getenv("TWITCH_EVENTSUB_CALLBACK_URL")
-                    or (
-                        os.getenv("PUBLIC_BASE_URL", "").rstrip("/") + "/twitch/eventsub"
-                        if os.getenv("PUBLIC_BASE_URL") else None
-                    )
-                    or (
-                        f"https://{os.getenv('RAILWAY_PUBLIC_DOMAIN')}/eventsub"
-                        if os.getenv("RAILWAY_PUBLIC_DOMAIN") else None
-                    )
-                )
-
-                if not callback_url:
-                    logger.warning("No EventSub callback URL configured")
-                else:
-                    # Build subscription list: DB rows take priority,
-                    # then fill in any KNOWN_STREAMERS not yet in the DB.
-                    db_logins = {s["twitch_login"]: s["twitch_user_id"] for s in streamers}
-                    to_subscribe: dict[str, str] = {}
-
-                    # Add all DB streamers
-                    for login, uid in db_logins.items():
-                        if uid:
-                            to_subscribe[uid] = login
-
-                    # Add KNOWN_STREAMERS that aren't in the DB yet
-                    for login, uid in KNOWN_STREAMERS.items():
-                        if uid and login not in db_logins:
-                            to_subscribe[uid] = login
-                            logger.info(
-                                f"Known streamer not in DB — subscribing anyway: {login}"
-                            )
-
-                    for uid, login in to_subscribe.items():
-                        try:
-                            await eventsub.ensure_subscriptions(uid, callback_url)
-                            logger.info(f"EventSub subscribed: {login}")
-                        except Exception as e:
-                            logger.warning(f"EventSub failed for {login}: {e}")
-            else:
-                logger.info("EventSub not configured — using StreamMonitor polling")
-
         except Exception as e:
             logger.error(
                 f"Startup error in guild {guild.id} ({guild.name}): {e}",
                 exc_info=True,
             )
 
+    # ── EventSub — one reconcile pass for every guild ──────────
+    reconciler = getattr(app_state, "eventsub_reconciler", None)
+    eventsub   = getattr(app_state, "eventsub_manager", None)
+
+    if not reconciler or not eventsub:
+        logger.info("EventSub not configured — using StreamMonitor polling")
+    elif eventsub.transport == "websocket":
+        # Subscriptions follow the WebSocket session — see
+        # main._subscribe_tracked_streamers
+        pass
+    elif not eventsub.callback_url:
+        logger.warning("No EventSub callback URL configured")
+    else:
+        try:
+            summary = await reconciler.reconcile()
+            logger.info(f"EventSub subscriptions reconciled: {summary}")
+        except Exception as e:
+            logger.error(f"EventSub reconcile failed: {e}", exc_info=True)
+
     logger.info("✅ Startup sync completed")